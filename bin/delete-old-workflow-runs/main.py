@@ -3,8 +3,20 @@
 from __future__ import annotations
 
 import argparse
+import copy
 import datetime
-from typing import Iterable
+import itertools
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Self
+from urllib.parse import parse_qs, urlparse
 
 import requests
 import logging
@@ -12,16 +24,367 @@ import logging
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
+GITHUB_API = "https://api.github.com"
+REQUEST_TIMEOUT = 30
+DEFAULT_WORKERS = 8
+MAX_ATTEMPTS = 5  # per request, counting retries after rate limiting
+# GitHub asks for at least a minute's pause after a secondary rate limit that
+# comes without a Retry-After header, growing exponentially if it persists
+SECONDARY_RATE_LIMIT_WAIT = 60
+MAX_RATE_LIMIT_WAIT = 15 * 60
+PROGRESS_INTERVAL = 10  # seconds between progress lines
+PER_PAGE = 100  # The most runs the API returns per page
+MAX_LISTED = 1000  # The most runs the API lists for a query filtered by date
+LIST_WORKERS = 4  # Pages fetched concurrently
+QUEUE_SIZE = 1000  # Listed runs waiting to be deleted before listing pauses
+DEFAULT_PARALLEL_REPOS = 4
+RATE_LIMIT_RESERVE = 50  # Requests left unspent each window, for other uses of the token
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS purges (
+    repo TEXT PRIMARY KEY,
+    created_before TEXT NOT NULL,
+    workflow_filter TEXT,
+    listed_all INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS runs (
+    repo TEXT NOT NULL,
+    run_id INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    state TEXT NOT NULL,  -- listed, deleted or failed
+    PRIMARY KEY (repo, run_id)
+);
+"""
+
 
 class WorkflowRunError(RuntimeError):
     """Raised when workflow run operations fail."""
 
 
-def list_workflows(gh_token: str, repo_owner: str, repo_name: str) -> list[dict[str, str]]:
+def rate_limit_wait(response: requests.Response, attempt: int) -> float | None:
+    """Seconds to pause after a rate-limited response, or None if it wasn't one."""
+    if response.status_code not in {403, 429}:
+        return None
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        return float(retry_after)
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = float(response.headers.get("X-RateLimit-Reset", 0))
+        return max(1.0, reset - time.time())
+    if response.status_code == 429 or "rate limit" in response.text.lower():
+        return min(MAX_RATE_LIMIT_WAIT, SECONDARY_RATE_LIMIT_WAIT * 2 ** (attempt - 1))
+    # A plain 403 is a permissions problem, retrying won't help
+    return None
+
+
+class Throttle:
+    """Holds every request back until a rate-limit pause has passed, or `cancelled` is set."""
+
+    def __init__(self, cancelled: threading.Event | None = None) -> None:
+        self._cancelled = cancelled or threading.Event()
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+        self.throttled_seconds = 0.0  # Wall-clock time spent paused
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            resume_at = now + seconds
+            if resume_at > self._resume_at:
+                self.throttled_seconds += resume_at - max(now, self._resume_at)
+                self._resume_at = resume_at
+
+    def wait(self) -> None:
+        while not self._cancelled.is_set():
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            self._cancelled.wait(delay)
+
+
+class RequestScheduler:
+    """
+    Splits the token's rate-limit budget evenly among the repos being purged.
+
+    Every response tells how many requests are left until the limit resets.
+    The window's budget is what the repos have spent in it plus what is left.
+    Each repo being purged may spend an equal part of it, then waits for the
+    reset, so one big repo can't starve the rest. A repo that finishes hands
+    its part back to the others. Once `cancelled` is set, nothing waits.
+    """
+
+    def __init__(self, cancelled: threading.Event | None = None) -> None:
+        self._cancelled = cancelled or threading.Event()
+        self._condition = threading.Condition()
+        self._remaining: int | None = None  # Unknown until the first response
+        self._reset = 0.0
+        self._spent: Counter[str | None] = Counter()  # In this window
+        self._active: set[str] = set()
+        self.requests: Counter[str | None] = Counter()  # Overall, by repo
+        self.held: Counter[str | None] = Counter()  # Requests that waited for budget, by repo
+
+    def start(self, repo: str) -> None:
+        with self._condition:
+            self._active.add(repo)
+
+    def finish(self, repo: str) -> None:
+        with self._condition:
+            self._active.discard(repo)
+            self._condition.notify_all()
+
+    def cancel(self) -> None:
+        """Set the cancel event and wake every waiting request."""
+        with self._condition:
+            self._cancelled.set()
+            self._condition.notify_all()
+
+    def _may_send(self, repo: str | None) -> bool:
+        if self._remaining is None or self._cancelled.is_set():
+            return True
+        if self._remaining <= RATE_LIMIT_RESERVE:
+            return False
+        if repo not in self._active:
+            return True
+        budget = sum(self._spent.values()) + self._remaining - RATE_LIMIT_RESERVE
+        return self._spent[repo] < budget / len(self._active)
+
+    def acquire(self, repo: str | None) -> None:
+        """Wait until `repo` may send a request (None for requests outside any repo)."""
+        with self._condition:
+            if not self._may_send(repo):
+                self.held[repo] += 1
+            while not self._may_send(repo):
+                # The reset time is in whole seconds, so allow one more
+                self._condition.wait(timeout=max(1.0, self._reset + 1 - time.time()))
+                if time.time() >= self._reset + 1:
+                    # A new window, whose budget the next response will tell
+                    self._remaining = None
+                    self._spent.clear()
+            self._spent[repo] += 1
+            self.requests[repo] += 1
+            if self._remaining is not None:
+                self._remaining -= 1
+
+    def update(self, response: requests.Response) -> None:
+        """Take in the rate limit a response reports."""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        with self._condition:
+            if float(reset) != self._reset:
+                self._reset = float(reset)
+                self._spent.clear()
+                self._remaining = int(remaining)
+            elif self._remaining is None or int(remaining) < self._remaining:
+                # Requests still in flight were already counted, so only trust lower counts
+                self._remaining = int(remaining)
+            self._condition.notify_all()
+
+    def remaining(self) -> tuple[int | None, float]:
+        """The requests left and when the window resets, as far as known."""
+        with self._condition:
+            return self._remaining, self._reset
+
+
+class GitHubClient:
+    """
+    GitHub REST API client sharing one pool of keep-alive connections.
+
+    Safe to use from several threads. When GitHub answers with a rate limit
+    (429, or a 403 saying so), every request pauses for as long as GitHub asks,
+    or with exponential backoff if it doesn't say, and the request is retried.
+    Requests made through `for_repo()` copies also share the rate-limit budget
+    through the scheduler.
+    """
+
+    def __init__(self, gh_token: str, pool_size: int = DEFAULT_WORKERS) -> None:
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "Authorization": f"token {gh_token}",
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+            }
+        )
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._cancelled = threading.Event()
+        self.throttle = Throttle(self._cancelled)
+        self.scheduler = RequestScheduler(self._cancelled)
+        self.repo: str | None = None
+
+    def for_repo(self, repo: str) -> GitHubClient:
+        """A client sharing this one's connections and budget, whose requests count against `repo`."""
+        client = copy.copy(self)
+        client.repo = repo
+        return client
+
+    @property
+    def cancelled(self) -> threading.Event:
+        """Set once the client is cancelled."""
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """Make every request fail from now on, including those waiting, to wind down all threads."""
+        self.scheduler.cancel()
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a request to an API path (or full URL), retrying after rate limits."""
+        url = path if path.startswith(("https://", "http://")) else f"{GITHUB_API}/{path.lstrip('/')}"
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.throttle.wait()
+            self.scheduler.acquire(self.repo)
+            if self._cancelled.is_set():
+                raise WorkflowRunError("Cancelled")
+            response = self.session.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+            self.scheduler.update(response)
+            delay = rate_limit_wait(response, attempt)
+            if delay is None or attempt == MAX_ATTEMPTS:
+                return response
+            logger.warning(
+                "Rate limited (HTTP %s), pausing all requests for %.0fs",
+                response.status_code,
+                delay,
+            )
+            self.throttle.pause(delay)
+        return response
+
+    def close(self) -> None:
+        self.session.close()
+
+
+@dataclass
+class DeletionStats:
+    """Counts and timings of a deletion run."""
+
+    deleted: int = 0
+    already_deleted: int = 0  # Gone by the time they were deleted, e.g. on resuming
+    failed: Counter[str] = field(default_factory=Counter)  # By status code or error
+    elapsed: float = 0.0
+    throttled: float = 0.0
+
+    @property
+    def attempted(self) -> int:
+        return self.deleted + self.already_deleted + sum(self.failed.values())
+
+    @property
+    def rate(self) -> float:
+        """Runs deleted per second."""
+        return self.deleted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        failures = ", ".join(f"{reason}: {count}" for reason, count in sorted(self.failed.items()))
+        return (
+            f"Deleted {self.deleted} run(s) in {self.elapsed:.1f}s ({self.rate:.1f} runs/sec), "
+            f"{f'{self.already_deleted} already deleted, ' if self.already_deleted else ''}"
+            f"{sum(self.failed.values())} failed{f' ({failures})' if failures else ''}, "
+            f"{self.throttled:.0f}s throttled"
+        )
+
+
+@dataclass
+class Purge:
+    """What a journaled purge of a repo was asked to delete."""
+
+    created_before: datetime.datetime
+    workflow_filter: str | None
+    listed_all: bool
+
+
+def default_journal_path() -> str:
+    base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, "delete-old-workflow-runs", "journal.db")
+
+
+class Journal:
+    """
+    SQLite journal of the runs listed for deletion, keyed by repo and run id.
+
+    Each listed run is written down before it is deleted, and marked deleted
+    or failed once GitHub answers, so an interrupted purge can resume with
+    the runs still pending instead of listing everything again. Safe to use
+    from the listing and deleting threads at once.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(JOURNAL_SCHEMA)
+
+    def start(self, repo: str, created_before: datetime.datetime, workflow_filter: str | None) -> None:
+        """Begin a new purge of `repo`, forgetting any earlier one."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM runs WHERE repo = ?", (repo,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO purges (repo, created_before, workflow_filter) VALUES (?, ?, ?)",
+                (repo, created_before.isoformat(), workflow_filter),
+            )
+
+    def purge(self, repo: str) -> Purge | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT created_before, workflow_filter, listed_all FROM purges WHERE repo = ?",
+                (repo,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Purge(datetime.datetime.fromisoformat(row[0]), row[1], bool(row[2]))
+
+    def listed_all(self, repo: str) -> None:
+        """Note that every run to delete has been listed."""
+        with self._lock, self._db:
+            self._db.execute("UPDATE purges SET listed_all = 1 WHERE repo = ?", (repo,))
+
+    def track(self, repo: str, runs: Iterable[dict[str, str]]) -> Iterator[dict[str, str]]:
+        """Writes down listed runs, a page at a time, before passing them on."""
+        runs = iter(runs)
+        while page := list(itertools.islice(runs, PER_PAGE)):
+            with self._lock, self._db:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO runs (repo, run_id, created_at, state) VALUES (?, ?, ?, 'listed')",
+                    [(repo, run["id"], run["created_at"]) for run in page],
+                )
+            yield from page
+
+    def pending(self, repo: str) -> Iterator[dict[str, str]]:
+        """Yields the runs listed but not deleted yet, including failed ones."""
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT run_id, created_at FROM runs WHERE repo = ? AND state != 'deleted' AND run_id > ? ORDER BY run_id LIMIT ?",
+                    (repo, last_id, PER_PAGE),
+                ).fetchall()
+            if not rows:
+                return
+            for run_id, created_at in rows:
+                yield {"id": run_id, "created_at": created_at}
+            last_id = rows[-1][0]
+
+    def pending_count(self, repo: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM runs WHERE repo = ? AND state != 'deleted'", (repo,)).fetchone()[0]
+
+    def mark(self, repo: str, run_ids: list[int], state: str) -> None:
+        if not run_ids:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE runs SET state = ? WHERE repo = ? AND run_id = ?",
+                [(state, repo, run_id) for run_id in run_ids],
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def list_workflows(client: GitHubClient, repo_owner: str, repo_name: str) -> list[dict[str, str]]:
     """List all workflows in the repository to help identify workflow IDs/names."""
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/actions/workflows"
-    headers = {"Authorization": f"token {gh_token}"}
-    response = requests.get(url, headers=headers, timeout=30)
+    response = client.request("GET", f"repos/{repo_owner}/{repo_name}/actions/workflows")
 
     if response.status_code != 200:
         raise WorkflowRunError(f"Error fetching workflows: {response.status_code} - {response.text}")
@@ -40,60 +403,295 @@ def list_workflows(gh_token: str, repo_owner: str, repo_name: str) -> list[dict[
     return workflows
 
 
-def fetch_workflow_runs(
-    gh_token: str,
+def list_repos(client: GitHubClient, owner: str) -> list[str]:
+    """Names of the owner's repositories, an organization's or a user's, skipping archived ones."""
+    response = client.request("GET", f"orgs/{owner}/repos", params={"per_page": PER_PAGE, "type": "all"})
+    if response.status_code == 404:
+        response = client.request("GET", f"users/{owner}/repos", params={"per_page": PER_PAGE, "type": "owner"})
+
+    names: list[str] = []
+    archived = 0
+    while True:
+        if response.status_code != 200:
+            raise WorkflowRunError(f"Error listing repositories: {response.status_code} - {response.text}")
+        for repo in response.json():
+            # Archived repositories are read-only, so their runs can't be deleted
+            if repo.get("archived"):
+                archived += 1
+            else:
+                names.append(repo["name"])
+        if "next" not in response.links:
+            break
+        response = client.request("GET", response.links["next"]["url"])
+
+    logger.info("Found %s repositories of %s (skipping %s archived)", len(names), owner, archived)
+    return names
+
+
+def read_repos(path: str, owner: str) -> list[tuple[str, str]]:
+    """(owner, name) of the repositories listed in a file; names without an owner belong to `owner`."""
+    repos = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                repo_owner, _, repo_name = line.rpartition("/")
+                repos.append((repo_owner or owner, repo_name))
+    return repos
+
+
+def runs_path(repo_owner: str, repo_name: str, workflow_filter: str | None = None) -> str:
+    if workflow_filter:
+        return f"repos/{repo_owner}/{repo_name}/actions/workflows/{workflow_filter}/runs"
+    return f"repos/{repo_owner}/{repo_name}/actions/runs"
+
+
+def fetch_runs_page(
+    client: GitHubClient,
+    path: str,
+    created_before: datetime.datetime,
+    page: int,
+    per_page: int = PER_PAGE,
+) -> requests.Response:
+    # Only runs from days before the cutoff's, which are all older than it
+    params = {"created": f"<{created_before:%Y-%m-%d}", "per_page": per_page, "page": page}
+    response = client.request("GET", path, params=params)
+
+    if response.status_code != 200:
+        raise WorkflowRunError(f"Error fetching workflow runs: {response.status_code} - {response.text}")
+
+    return response
+
+
+def page_count(response: requests.Response) -> int:
+    """Number of pages, from the Link header's last page or else total_count."""
+    last = response.links.get("last")
+    if last:
+        return int(parse_qs(urlparse(last["url"]).query)["page"][0])
+    return max(1, math.ceil(response.json().get("total_count", 0) / PER_PAGE))
+
+
+def count_workflow_runs(
+    client: GitHubClient,
     repo_owner: str,
     repo_name: str,
+    created_before: datetime.datetime,
     workflow_filter: str | None = None,
-) -> list[dict[str, str]]:
-    page = 1
-    workflow_runs: list[dict[str, str]] = []
+) -> int:
+    """Counts the runs created before `created_before`, in one request."""
+    path = runs_path(repo_owner, repo_name, workflow_filter)
+    return fetch_runs_page(client, path, created_before, 1, per_page=1).json().get("total_count", 0)
 
-    while True:
-        logger.info("Fetching page %s of workflow runs...", page)
 
-        if workflow_filter:
-            url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/actions/workflows/{workflow_filter}/runs?per_page=500&page={page}"
-        else:
-            url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/actions/runs?per_page=500&page={page}"
+def iter_workflow_runs(
+    client: GitHubClient,
+    repo_owner: str,
+    repo_name: str,
+    created_before: datetime.datetime,
+    workflow_filter: str | None = None,
+) -> Iterator[dict[str, str]]:
+    """
+    Yields up to MAX_LISTED runs created before `created_before`, a page at a time.
 
-        headers = {"Authorization": f"token {gh_token}"}
-        response = requests.get(url, headers=headers, timeout=30)
+    The cutoff is sent to GitHub, so only old runs are listed. The API lists
+    no more than MAX_LISTED of them per query; once those are deleted, list
+    again for the next ones.
 
-        if response.status_code != 200:
-            raise WorkflowRunError(f"Error fetching workflow runs: {response.status_code} - {response.text}")
+    GitHub lists runs newest first. Pages are yielded from the last one back,
+    so deleting the runs already yielded never shifts the pages still to
+    come. The first page gives the page count, then the rest are fetched
+    LIST_WORKERS at a time.
+    """
+    path = runs_path(repo_owner, repo_name, workflow_filter)
+    first = fetch_runs_page(client, path, created_before, 1)
+    total = first.json().get("total_count", 0)
+    pages = min(page_count(first), MAX_LISTED // PER_PAGE)
+    logger.info(
+        "Listing %s of %s old workflow run(s) in %s/%s, in %s page(s)",
+        min(total, pages * PER_PAGE),
+        total,
+        repo_owner,
+        repo_name,
+        pages,
+    )
 
-        runs = response.json().get("workflow_runs", [])
-        if not runs:
-            break
+    def fetch(page: int) -> dict:
+        return fetch_runs_page(client, path, created_before, page).json()
+
+    with ThreadPoolExecutor(max_workers=LIST_WORKERS, thread_name_prefix="list") as executor:
+        bodies = itertools.chain(executor.map(fetch, range(pages, 1, -1)), [first.json()])
+        for page, body in zip(range(pages, 0, -1), bodies, strict=True):
+            runs = body.get("workflow_runs", [])
+            logger.info("Fetched page %s of %s in %s/%s: %s run(s) to delete", page, pages, repo_owner, repo_name, len(runs))
+            yield from runs
+
+
+class RunStream:
+    """
+    Lists runs on a background thread, handing them over through a bounded queue.
+
+    Deletion starts with the first page instead of after the last, and listing
+    waits whenever `maxsize` runs are queued up, so memory stays flat however
+    long the history. Errors while listing are raised by the iteration. Once
+    `cancelled` is set, neither side waits on the queue any longer.
+    """
+
+    _DONE = object()
+    _POLL = 0.5  # Seconds between checks for cancellation while waiting on the queue
+
+    def __init__(
+        self,
+        runs: Iterable[dict[str, str]],
+        maxsize: int = QUEUE_SIZE,
+        cancelled: threading.Event | None = None,
+    ) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._closed = threading.Event()
+        self._cancelled = cancelled or threading.Event()
+        self._error: Exception | None = None
+        self._thread = threading.Thread(target=self._produce, args=(runs,), name="list-runs", daemon=True)
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[dict[str, str]]:
+        while True:
+            try:
+                run = self._queue.get(timeout=self._POLL)
+            except queue.Empty:
+                if self._cancelled.is_set():
+                    raise WorkflowRunError("Cancelled") from None
+                continue
+            if run is self._DONE:
+                break
+            yield run
+        if self._error is not None:
+            raise self._error
+
+    def close(self) -> None:
+        """Stop listing, e.g. once enough runs were taken."""
+        self._closed.set()
+        self._thread.join()
 
-        workflow_runs.extend(runs)
-        page += 1
+    def _put(self, item: object) -> bool:
+        while not self._closed.is_set() and not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=self._POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
 
-    return workflow_runs
+    def _produce(self, runs: Iterable[dict[str, str]]) -> None:
+        try:
+            for run in runs:
+                if not self._put(run):
+                    return
+        except Exception as exc:  # Handed over to the consuming thread
+            self._error = exc
+        finally:
+            # Whatever stopped listing, don't leave the consumer waiting
+            self._put(self._DONE)
+
+
+def delete_run(client: GitHubClient, repo_owner: str, repo_name: str, run: dict[str, str]) -> requests.Response:
+    logger.debug("Deleting run %s, created at %s", run["id"], run["created_at"])
+    return client.request("DELETE", f"repos/{repo_owner}/{repo_name}/actions/runs/{run['id']}")
 
 
 def delete_runs(
     runs_to_delete: Iterable[dict[str, str]],
-    gh_token: str,
+    client: GitHubClient,
     repo_owner: str,
     repo_name: str,
-) -> None:
-    """Deletes a list of workflow runs."""
-    headers = {"Authorization": f"token {gh_token}"}
-    for run in runs_to_delete:
-        run_id = run["id"]
-        logger.info("Deleting run %s, created at %s", run_id, run["created_at"])
-        url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/actions/runs/{run_id}"
-        response = requests.delete(url, headers=headers, timeout=30)
-        if response.status_code not in {204, 202}:
-            logger.warning(
-                "Failed to delete run %s: %s - %s",
-                run_id,
-                response.status_code,
-                response.text,
+    workers: int = DEFAULT_WORKERS,
+    stats: DeletionStats | None = None,
+    journal: Journal | None = None,
+) -> DeletionStats:
+    """
+    Deletes workflow runs, `workers` at a time, logging progress as it goes.
+
+    Runs are taken from `runs_to_delete` only as workers free up, so it can be
+    a generator. Failed deletions are logged and counted, not raised. Counts
+    and timings are added to `stats`, if given, and outcomes to `journal`.
+    """
+    stats = stats or DeletionStats()
+    start = time.monotonic()
+    throttled_before = client.throttle.throttled_seconds
+    last_progress = start
+
+    def record(done: Iterable[Future], runs: dict[Future, dict[str, str]]) -> None:
+        nonlocal last_progress
+        deleted, failed = [], []
+        for future in done:
+            run = runs.pop(future)
+            try:
+                response = future.result()
+            except requests.RequestException as exc:
+                stats.failed[type(exc).__name__] += 1
+                failed.append(run["id"])
+                logger.warning("Failed to delete run %s: %s", run["id"], exc)
+                continue
+            if response.status_code in {204, 202}:
+                stats.deleted += 1
+                deleted.append(run["id"])
+            elif response.status_code == 404:
+                stats.already_deleted += 1
+                deleted.append(run["id"])
+                logger.debug("Run %s was already deleted", run["id"])
+            else:
+                stats.failed[str(response.status_code)] += 1
+                failed.append(run["id"])
+                logger.warning(
+                    "Failed to delete run %s: %s - %s",
+                    run["id"],
+                    response.status_code,
+                    response.text,
+                )
+        if journal is not None:
+            repo = f"{repo_owner}/{repo_name}"
+            journal.mark(repo, deleted, "deleted")
+            journal.mark(repo, failed, "failed")
+
+        now = time.monotonic()
+        if now - last_progress >= PROGRESS_INTERVAL:
+            last_progress = now
+            logger.info(
+                "Deleted %s run(s) from %s/%s so far (%.1f runs/sec), %s failed, %.0fs throttled",
+                stats.deleted,
+                repo_owner,
+                repo_name,
+                stats.deleted / (stats.elapsed + now - start),
+                sum(stats.failed.values()),
+                stats.throttled + client.throttle.throttled_seconds - throttled_before,
             )
 
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="delete") as executor:
+        in_flight: dict[Future, dict[str, str]] = {}
+        try:
+            for run in runs_to_delete:
+                in_flight[executor.submit(delete_run, client, repo_owner, repo_name, run)] = run
+                # Keep every worker busy without queueing up the whole list
+                if len(in_flight) >= 2 * workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    record(done, in_flight)
+            record(wait(in_flight).done, in_flight)
+        except KeyboardInterrupt:
+            # Leaving the block waits for the workers; don't make that wait for
+            # the queued deletions or a rate-limit pause
+            client.cancel()
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    stats.elapsed += time.monotonic() - start
+    stats.throttled += client.throttle.throttled_seconds - throttled_before
+    return stats
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Delete old GitHub Actions workflow runs.")
@@ -107,7 +705,23 @@ def parse_args() -> argparse.Namespace:
         help="GitHub token with actions:read and actions:write",
     )
     parser.add_argument("--repo-owner", required=True, help="Repository owner")
-    parser.add_argument("--repo-name", required=True, help="Repository name")
+    repos = parser.add_mutually_exclusive_group(required=True)
+    repos.add_argument("--repo-name", help="Repository name")
+    repos.add_argument(
+        "--all-repos",
+        action="store_true",
+        help="Purge every repository of the owner, except archived ones",
+    )
+    repos.add_argument(
+        "--repos-file",
+        help="Purge the repositories listed in this file, one name or owner/name per line",
+    )
+    parser.add_argument(
+        "--parallel-repos",
+        type=int,
+        default=DEFAULT_PARALLEL_REPOS,
+        help=f"Repositories to purge concurrently with --all-repos or --repos-file (default: {DEFAULT_PARALLEL_REPOS})",
+    )
     parser.add_argument(
         "--days-old",
         type=int,
@@ -118,82 +732,337 @@ def parse_args() -> argparse.Namespace:
         "--workflow-filter",
         help="Workflow ID or filename to filter runs",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Runs to delete concurrently (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Delete the runs; without it, only count the runs that would be deleted",
+    )
+    parser.add_argument(
+        "--max-delete",
+        type=int,
+        help="Delete at most this many runs from each repository",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the last purge of each repository from its journal, keeping its cutoff and workflow filter",
+    )
+    parser.add_argument(
+        "--journal",
+        default=default_journal_path(),
+        help="Journal of listed and deleted runs (default: %(default)s)",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.command == "list-workflows" and not args.repo_name:
+        parser.error("list-workflows needs --repo-name")
+    return args
 
 
-def run_list_workflows(gh_token: str, repo_owner: str, repo_name: str) -> int:
-    list_workflows(gh_token, repo_owner, repo_name)
+def run_list_workflows(client: GitHubClient, repo_owner: str, repo_name: str) -> int:
+    list_workflows(client, repo_owner, repo_name)
     return 0
 
 
+def purge_repo(
+    client: GitHubClient,
+    repo_owner: str,
+    repo_name: str,
+    created_before: datetime.datetime,
+    workflow_filter: str | None,
+    workers: int = DEFAULT_WORKERS,
+    max_delete: int | None = None,
+    journal: Journal | None = None,
+    resume: Purge | None = None,
+) -> DeletionStats:
+    """
+    Deletes the repo's runs created before `created_before`.
+
+    Runs are listed and deleted a window of MAX_LISTED at a time, as the API
+    lists no more. If `resume` is given, the journal's pending runs of that
+    purge come first, and listing only continues if it hadn't finished.
+    """
+    repo = f"{repo_owner}/{repo_name}"
+    stats = DeletionStats()
+    listed_all = resume is not None and resume.listed_all
+
+    def limit_reached() -> bool:
+        return max_delete is not None and stats.attempted >= max_delete
+
+    if resume is not None and journal is not None:
+        # The runs listed last time but not deleted come first, without listing
+        logger.info("%s run(s) of %s from the journal still to delete", journal.pending_count(repo), repo)
+        with RunStream(journal.pending(repo), cancelled=client.cancelled) as stream:
+            delete_runs(itertools.islice(stream, max_delete), client, repo_owner, repo_name, workers, stats, journal)
+    elif journal is not None:
+        journal.start(repo, created_before, workflow_filter)
+
+    while not listed_all and not limit_reached():
+        remaining = None if max_delete is None else max_delete - stats.attempted
+        attempted_before = stats.attempted
+        gone_before = stats.deleted + stats.already_deleted
+        runs = iter_workflow_runs(client, repo_owner, repo_name, created_before, workflow_filter)
+        if journal is not None:
+            runs = journal.track(repo, runs)
+        with RunStream(runs, cancelled=client.cancelled) as stream:
+            delete_runs(itertools.islice(stream, remaining), client, repo_owner, repo_name, workers, stats, journal)
+
+        # A listing holds at most MAX_LISTED runs; list again while deleting
+        # a full one made progress
+        if stats.attempted - attempted_before < MAX_LISTED and not limit_reached():
+            if journal is not None:
+                journal.listed_all(repo)
+            break
+        if stats.deleted + stats.already_deleted == gone_before:
+            break
+
+    if limit_reached():
+        logger.info("Stopped at --max-delete %s in %s; rerun with --resume to delete more.", max_delete, repo)
+    return stats
+
+
+def count_runs_to_delete(
+    client: GitHubClient,
+    repo_owner: str,
+    repo_name: str,
+    created_before: datetime.datetime,
+    workflow_filter: str | None,
+    max_delete: int | None = None,
+    journal: Journal | None = None,
+    resume: Purge | None = None,
+) -> int:
+    """Counts the runs `purge_repo` would delete: the journal's pending ones, if it listed them all."""
+    if resume is not None and resume.listed_all and journal is not None:
+        count = journal.pending_count(f"{repo_owner}/{repo_name}")
+    else:
+        count = count_workflow_runs(client, repo_owner, repo_name, created_before, workflow_filter)
+    return count if max_delete is None else min(count, max_delete)
+
+
 def run_delete_workflow_runs(
-    gh_token: str,
+    client: GitHubClient,
     repo_owner: str,
     repo_name: str,
     days_old: int,
     workflow_filter: str | None,
+    workers: int = DEFAULT_WORKERS,
+    assume_yes: bool = False,
+    max_delete: int | None = None,
+    journal: Journal | None = None,
+    resume: bool = False,
 ) -> int:
+    repo = f"{repo_owner}/{repo_name}"
     date_threshold = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days_old)
+    purge = None
+
+    if resume:
+        purge = journal.purge(repo) if journal is not None else None
+        if purge is None:
+            raise WorkflowRunError(f"No purge of {repo} to resume")
+        date_threshold, workflow_filter = purge.created_before, purge.workflow_filter
+        logger.info("Resuming the purge of %s", repo)
 
     if workflow_filter is not None:
         logger.info(
-            "Deleting workflow runs older than %s days from %s/%s for workflow: %s",
-            days_old,
+            "Deleting workflow runs created before %s from %s/%s for workflow: %s",
+            date_threshold,
             repo_owner,
             repo_name,
             workflow_filter,
         )
     else:
         logger.info(
-            "Deleting workflow runs older than %s days from %s/%s",
-            days_old,
+            "Deleting workflow runs created before %s from %s/%s",
+            date_threshold,
             repo_owner,
             repo_name,
         )
-    logger.info("Date threshold: %s", date_threshold)
 
-    workflow_runs = fetch_workflow_runs(gh_token, repo_owner, repo_name, workflow_filter)
-    logger.info("Fetched %s workflow runs.", len(workflow_runs))
-
-    runs_to_delete = []
-    for run in workflow_runs:
-        created_at = datetime.datetime.strptime(run["created_at"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=datetime.timezone.utc)
-        if created_at < date_threshold:
-            runs_to_delete.append(run)
+    if not assume_yes:
+        count = count_runs_to_delete(client, repo_owner, repo_name, date_threshold, workflow_filter, max_delete, journal, purge)
+        logger.info("Found %s workflow run(s) to delete. Rerun with --yes to delete them.", count)
+        return 0
 
-    if not runs_to_delete:
+    stats = purge_repo(client, repo_owner, repo_name, date_threshold, workflow_filter, workers, max_delete, journal, purge)
+    if not stats.attempted:
         logger.info("No workflow runs found older than the threshold. Nothing to delete.")
         return 0
+    logger.info("%s", stats.summary())
+    return 1 if stats.failed else 0
 
-    logger.info("Found %s workflow run(s) to delete.", len(runs_to_delete))
-    confirm = input("Are you sure you want to permanently delete these workflow runs? (yes/no): ")
-    if confirm.lower() != "yes":
-        logger.info("Deletion cancelled by user.")
-        return 0
 
-    delete_runs(runs_to_delete, gh_token, repo_owner, repo_name)
-    return 0
+def run_purge_repos(
+    client: GitHubClient,
+    repos: list[tuple[str, str]],
+    days_old: int,
+    workflow_filter: str | None,
+    workers: int = DEFAULT_WORKERS,
+    assume_yes: bool = False,
+    max_delete: int | None = None,
+    journal: Journal | None = None,
+    resume: bool = False,
+    parallel_repos: int = DEFAULT_PARALLEL_REPOS,
+) -> int:
+    """
+    Purges several repositories, `parallel_repos` at a time.
+
+    They share the client, so its scheduler splits the token's rate-limit
+    budget among the repositories in progress. With `resume`, repositories
+    with a purge in the journal continue it, and the rest start one.
+    """
+    date_threshold = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days_old)
+    logger.info(
+        "Deleting workflow runs created before %s from %s repositories, %s at a time",
+        date_threshold,
+        len(repos),
+        parallel_repos,
+    )
+
+    def purge_one(repo_owner: str, repo_name: str) -> tuple[int | DeletionStats, float]:
+        repo = f"{repo_owner}/{repo_name}"
+        repo_client = client.for_repo(repo)
+        purge = journal.purge(repo) if resume and journal is not None else None
+        created_before = purge.created_before if purge else date_threshold
+        run_filter = purge.workflow_filter if purge else workflow_filter
+        start = time.monotonic()
+        client.scheduler.start(repo)
+        try:
+            if not assume_yes:
+                count = count_runs_to_delete(repo_client, repo_owner, repo_name, created_before, run_filter, max_delete, journal, purge)
+                return count, time.monotonic() - start
+            stats = purge_repo(repo_client, repo_owner, repo_name, created_before, run_filter, workers, max_delete, journal, purge)
+            return stats, time.monotonic() - start
+        finally:
+            client.scheduler.finish(repo)
+
+    results: dict[str, tuple[int | DeletionStats, float]] = {}
+    errors: dict[str, str] = {}
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=parallel_repos, thread_name_prefix="repo")
+    try:
+        futures = {executor.submit(purge_one, repo_owner, repo_name): f"{repo_owner}/{repo_name}" for repo_owner, repo_name in repos}
+        for future in as_completed(futures):
+            repo = futures[future]
+            try:
+                results[repo] = future.result()
+            except (WorkflowRunError, requests.RequestException) as exc:
+                errors[repo] = str(exc)
+                logger.error("%s: %s", repo, exc)
+    except KeyboardInterrupt:
+        client.cancel()
+        raise
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    logger.info("Per-repository results:")
+    total = DeletionStats(elapsed=time.monotonic() - start, throttled=client.throttle.throttled_seconds)
+    to_delete = 0
+    for repo in sorted(results):
+        result, duration = results[repo]
+        if isinstance(result, int):
+            logger.info("%s: %s run(s) to delete", repo, result)
+            to_delete += result
+            continue
+        logger.info(
+            "%s: %s deleted, %s failed in %.1fs (%s requests, %s held back for rate-limit budget)",
+            repo,
+            result.deleted,
+            sum(result.failed.values()),
+            duration,
+            client.scheduler.requests[repo],
+            client.scheduler.held[repo],
+        )
+        total.deleted += result.deleted
+        total.already_deleted += result.already_deleted
+        total.failed.update(result.failed)
+    for repo in sorted(errors):
+        logger.info("%s: error: %s", repo, errors[repo])
+
+    remaining, reset = client.scheduler.remaining()
+    if remaining is not None:
+        logger.info(
+            "%s request(s) left for the token until %s",
+            remaining,
+            datetime.datetime.fromtimestamp(reset, datetime.timezone.utc).strftime("%H:%M:%S UTC"),
+        )
+    if not assume_yes:
+        logger.info("Found %s workflow run(s) to delete. Rerun with --yes to delete them.", to_delete)
+        return 1 if errors else 0
+    logger.info("%s", total.summary())
+    return 1 if total.failed or errors else 0
 
 
 def main() -> int:
     """Console script entrypoint."""
     args = parse_args()
+    if args.workers < 1:
+        logger.error("--workers must be at least 1")
+        return 1
+    if args.max_delete is not None and args.max_delete < 1:
+        logger.error("--max-delete must be at least 1")
+        return 1
+    if args.parallel_repos < 1:
+        logger.error("--parallel-repos must be at least 1")
+        return 1
+    parallel_repos = 1 if args.repo_name else args.parallel_repos
+    # Runs are listed while they are deleted, so leave connections for both
+    client = GitHubClient(args.gh_token, pool_size=parallel_repos * (args.workers + LIST_WORKERS))
+    # Only deleting (or resuming) needs the journal; listing workflows and
+    # dry runs leave no trace
+    journal = None
+    if args.command != "list-workflows" and (args.yes or args.resume):
+        journal = Journal(args.journal)
 
     try:
         if args.command == "list-workflows":
-            return run_list_workflows(args.gh_token, args.repo_owner, args.repo_name)
+            return run_list_workflows(client, args.repo_owner, args.repo_name)
 
-        return run_delete_workflow_runs(
-            args.gh_token,
-            args.repo_owner,
-            args.repo_name,
+        if args.repo_name:
+            return run_delete_workflow_runs(
+                client,
+                args.repo_owner,
+                args.repo_name,
+                args.days_old,
+                args.workflow_filter,
+                args.workers,
+                args.yes,
+                args.max_delete,
+                journal,
+                args.resume,
+            )
+
+        if args.repos_file:
+            repos = read_repos(args.repos_file, args.repo_owner)
+        else:
+            repos = [(args.repo_owner, name) for name in list_repos(client, args.repo_owner)]
+        return run_purge_repos(
+            client,
+            repos,
             args.days_old,
             args.workflow_filter,
+            args.workers,
+            args.yes,
+            args.max_delete,
+            journal,
+            args.resume,
+            parallel_repos,
         )
-    except WorkflowRunError as exc:
+    except (WorkflowRunError, OSError) as exc:
         logger.error("%s", exc)
         return 1
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; rerun with --resume to continue where this left off.")
+        return 130
+    finally:
+        client.close()
+        if journal is not None:
+            journal.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1 @@
+# Tests for delete-old-workflow-runs
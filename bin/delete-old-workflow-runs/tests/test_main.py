@@ -0,0 +1,608 @@
+"""
+Tests for delete-old-workflow-runs, against a fake requests.Session.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from urllib.parse import urlparse
+
+import requests
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from main import (
+    RATE_LIMIT_RESERVE,
+    DeletionStats,
+    GitHubClient,
+    Journal,
+    RequestScheduler,
+    RunStream,
+    Throttle,
+    WorkflowRunError,
+    delete_runs,
+    iter_workflow_runs,
+    rate_limit_wait,
+    run_delete_workflow_runs,
+    run_purge_repos,
+)
+
+OLD = "2020-01-01T00:00:00Z"
+RECENT = "2099-01-01T00:00:00Z"
+
+
+def make_response(status: int, body: object = None, headers: dict[str, str] | None = None, text: str | None = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    if text is not None:
+        response._content = text.encode()
+    else:
+        response._content = b"" if body is None else json.dumps(body).encode()
+    return response
+
+
+def make_runs(count: int, created_at: str = OLD, first_id: int = 1) -> list[dict[str, str]]:
+    """Runs newest first, the way GitHub lists them."""
+    return [{"id": first_id + count - 1 - i, "created_at": created_at} for i in range(count)]
+
+
+class FakeGitHub:
+    """
+    A stand-in for requests.Session serving the workflow run endpoints from memory.
+
+    `runs` maps "owner/name" to its runs, newest first. `fail` maps run ids to
+    the status their deletion answers with, or to an exception to raise.
+    """
+
+    def __init__(self, runs: dict[str, list[dict[str, str]]] | None = None, fail: dict[int, object] | None = None, delay: float = 0.0):
+        self.headers: dict[str, str] = {}
+        self.runs = runs or {}
+        self.fail = fail or {}
+        self.delay = delay
+        self.calls: list[tuple[str, str, dict]] = []
+        self.listed: list[int] = []  # Ids of the runs listed, in order
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def mount(self, prefix: str, adapter: object) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def request(self, method: str, url: str, timeout: float | None = None, params: dict | None = None) -> requests.Response:
+        path = urlparse(url).path.strip("/").split("/")
+        params = params or {}
+        with self.lock:
+            self.calls.append((method, "/".join(path), params))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            return self._handle(method, path, params)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _handle(self, method: str, path: list[str], params: dict) -> requests.Response:
+        repo = "/".join(path[1:3])
+        if method == "DELETE":
+            run_id = int(path[-1])
+            outcome = self.fail.get(run_id)
+            if isinstance(outcome, Exception):
+                raise outcome
+            if outcome is not None:
+                return make_response(outcome, {"message": "nope"})
+            with self.lock:
+                before = len(self.runs[repo])
+                self.runs[repo] = [run for run in self.runs[repo] if run["id"] != run_id]
+                return make_response(204 if len(self.runs[repo]) < before else 404)
+
+        with self.lock:
+            runs = list(self.runs.get(repo, []))
+        created = params.get("created")
+        if created:
+            runs = [run for run in runs if run["created_at"][:10] < created[1:]]
+        per_page, page = int(params.get("per_page", 30)), int(params.get("page", 1))
+        last = max(1, -(-len(runs) // per_page))
+        headers = {"Link": f'<https://api.github.com/x?page={last}>; rel="last"'} if last > 1 else {}
+        body = {"total_count": len(runs), "workflow_runs": runs[(page - 1) * per_page : page * per_page]}
+        with self.lock:
+            self.listed.extend(run["id"] for run in body["workflow_runs"])
+        return make_response(200, body, headers)
+
+    def deletes(self) -> list[int]:
+        return [int(path.rsplit("/", 1)[1]) for method, path, _ in self.calls if method == "DELETE"]
+
+    def lists(self) -> list[dict]:
+        return [params for method, path, params in self.calls if method == "GET" and path.endswith("/runs")]
+
+
+def make_client(session: object) -> GitHubClient:
+    client = GitHubClient("token")
+    client.session = session
+    return client
+
+
+class TestRateLimitWait(unittest.TestCase):
+    """Test how long rate-limited responses make requests pause."""
+
+    def test_not_rate_limited(self):
+        """Test that other errors, and plain 403s, aren't retried."""
+        self.assertIsNone(rate_limit_wait(make_response(404), 1))
+        self.assertIsNone(rate_limit_wait(make_response(500), 1))
+        self.assertIsNone(rate_limit_wait(make_response(403, {"message": "Resource not accessible"}), 1))
+
+    def test_retry_after(self):
+        """Test that Retry-After is followed."""
+        self.assertEqual(rate_limit_wait(make_response(429, headers={"Retry-After": "7"}), 1), 7.0)
+
+    def test_primary_rate_limit_waits_for_reset(self):
+        """Test that an exhausted primary limit waits until it resets."""
+        response = make_response(403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(time.time()) + 120)})
+        self.assertAlmostEqual(rate_limit_wait(response, 1), 120, delta=2)
+        response.headers["X-RateLimit-Reset"] = "0"
+        self.assertEqual(rate_limit_wait(response, 1), 1.0)
+
+    def test_secondary_rate_limit_backs_off(self):
+        """Test exponential backoff from a minute when GitHub doesn't say how long."""
+        response = make_response(403, text='{"message": "You have exceeded a secondary rate limit"}')
+        self.assertEqual(rate_limit_wait(response, 1), 60)
+        self.assertEqual(rate_limit_wait(response, 3), 240)
+        self.assertEqual(rate_limit_wait(make_response(429), 10), main.MAX_RATE_LIMIT_WAIT)
+
+
+class TestThrottle(unittest.TestCase):
+    """Test the shared rate-limit pause."""
+
+    def test_overlapping_pauses_count_once(self):
+        """Test that throttled time is wall-clock time, not the sum of pauses."""
+        throttle = Throttle()
+        throttle.pause(0.2)
+        throttle.pause(0.1)
+        self.assertAlmostEqual(throttle.throttled_seconds, 0.2, delta=0.05)
+        throttle.pause(0.3)
+        self.assertAlmostEqual(throttle.throttled_seconds, 0.3, delta=0.05)
+
+    def test_wait_holds_until_the_pause_passes(self):
+        """Test that wait() returns once the pause is over."""
+        throttle = Throttle()
+        throttle.wait()
+        throttle.pause(0.1)
+        start = time.monotonic()
+        throttle.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+def rate_limit_headers(remaining: int, reset: float) -> requests.Response:
+    return make_response(200, headers={"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": str(int(reset))})
+
+
+def start_thread(target, *args) -> threading.Thread:
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Test how the rate-limit budget is split among repos."""
+
+    def setUp(self):
+        """A scheduler knowing of 150 requests left this hour, 100 above the reserve."""
+        self.scheduler = RequestScheduler()
+        self.scheduler.update(rate_limit_headers(RATE_LIMIT_RESERVE + 100, time.time() + 3600))
+
+    def test_repos_get_equal_shares(self):
+        """Test that a repo that spent its share waits, until another finishes."""
+        self.scheduler.start("o/a")
+        self.scheduler.start("o/b")
+        for _ in range(50):
+            self.scheduler.acquire("o/a")
+
+        blocked = start_thread(self.scheduler.acquire, "o/a")
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+        # The other repo still has its share
+        self.scheduler.acquire("o/b")
+
+        self.scheduler.finish("o/b")
+        blocked.join(1)
+        self.assertFalse(blocked.is_alive())
+        self.assertEqual(self.scheduler.requests["o/a"], 51)
+        self.assertEqual(self.scheduler.held["o/a"], 1)
+        self.assertEqual(self.scheduler.remaining()[0], RATE_LIMIT_RESERVE + 48)
+
+    def test_reserve_holds_everyone(self):
+        """Test that no request is sent once only the reserve is left."""
+        self.scheduler.update(rate_limit_headers(RATE_LIMIT_RESERVE, self.scheduler.remaining()[1]))
+
+        blocked = start_thread(self.scheduler.acquire, None)
+        blocked.join(0.2)
+
+        self.assertTrue(blocked.is_alive())
+        self.scheduler.cancel()
+        blocked.join(1)
+        self.assertFalse(blocked.is_alive())
+
+    def test_lower_counts_only_within_a_window(self):
+        """Test that in-window updates only lower the count, and a new window replaces it."""
+        _, reset = self.scheduler.remaining()
+        self.scheduler.update(rate_limit_headers(RATE_LIMIT_RESERVE + 500, reset))
+        self.assertEqual(self.scheduler.remaining()[0], RATE_LIMIT_RESERVE + 100)
+
+        self.scheduler.update(rate_limit_headers(5000, reset + 3600))
+        self.assertEqual(self.scheduler.remaining(), (5000, int(reset + 3600)))
+
+
+class TestCancel(unittest.TestCase):
+    """Test that cancelling wakes requests waiting for budget or a rate-limit pause."""
+
+    def request_in_thread(self, client: GitHubClient) -> tuple[threading.Thread, list[Exception]]:
+        """Start a request on another thread, checking that it blocks."""
+        errors: list[Exception] = []
+
+        def request():
+            try:
+                client.request("GET", "repos/o/r/actions/runs")
+            except WorkflowRunError as exc:
+                errors.append(exc)
+
+        thread = start_thread(request)
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        return thread, errors
+
+    def test_cancel_wakes_requests_waiting_for_budget(self):
+        """Test that a request parked until the window resets fails at once on cancel."""
+        session = FakeGitHub()
+        client = make_client(session)
+        client.scheduler.update(rate_limit_headers(0, time.time() + 3600))
+        thread, errors = self.request_in_thread(client.for_repo("o/r"))
+
+        client.cancel()
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(session.calls, [])
+
+    def test_cancel_cuts_a_rate_limit_pause_short(self):
+        """Test that a request waiting out a long pause fails at once on cancel."""
+        session = FakeGitHub()
+        client = make_client(session)
+        client.throttle.pause(600)
+        thread, errors = self.request_in_thread(client)
+
+        client.cancel()
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(session.calls, [])
+
+
+class TestGitHubClient(unittest.TestCase):
+    """Test retries in GitHubClient.request."""
+
+    def test_retries_after_429_and_rate_limited_403(self):
+        """Test that rate-limited responses are retried after a pause."""
+        responses = [
+            make_response(429, headers={"Retry-After": "0"}),
+            make_response(403, text="secondary rate limit"),
+            make_response(200, {"ok": True}),
+        ]
+        session = FakeGitHub()
+        session._handle = lambda method, path, params: responses.pop(0)
+        client = make_client(session)
+
+        with patch.object(main, "SECONDARY_RATE_LIMIT_WAIT", 0.01):
+            response = client.request("GET", "repos/o/r/actions/runs")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(session.calls), 3)
+
+    def test_plain_403_is_not_retried(self):
+        """Test that a permissions failure is returned at once."""
+        session = FakeGitHub()
+        session._handle = lambda method, path, params: make_response(403, {"message": "Must have admin rights"})
+
+        response = make_client(session).request("DELETE", "repos/o/r/actions/runs/1")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(session.calls), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        """Test that the last rate-limited response is returned after MAX_ATTEMPTS."""
+        session = FakeGitHub()
+        session._handle = lambda method, path, params: make_response(429, headers={"Retry-After": "0"})
+
+        response = make_client(session).request("GET", "repos/o/r/actions/runs")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(session.calls), main.MAX_ATTEMPTS)
+
+
+class TestDeleteRuns(unittest.TestCase):
+    """Test concurrent deletion."""
+
+    def test_deletes_concurrently_and_counts_failures(self):
+        """Test that runs are deleted in parallel and each outcome is counted."""
+        runs = make_runs(40)
+        session = FakeGitHub(
+            {"o/r": list(runs)},
+            fail={3: 500, 4: 500, 5: 403, 6: requests.ConnectionError("reset")},
+            delay=0.01,
+        )
+        session.runs["o/r"] = [run for run in runs if run["id"] != 7]  # Deleted already
+
+        stats = delete_runs(iter(runs), make_client(session), "o", "r", workers=4)
+
+        self.assertEqual(stats.deleted, 35)
+        self.assertEqual(stats.already_deleted, 1)
+        self.assertEqual(stats.failed, {"500": 2, "403": 1, "ConnectionError": 1})
+        self.assertEqual(stats.attempted, 40)
+        self.assertGreater(session.max_in_flight, 1)
+        self.assertLessEqual(session.max_in_flight, 4)
+        self.assertEqual(sorted(session.deletes()), sorted(run["id"] for run in runs))
+
+    def test_adds_to_given_stats(self):
+        """Test that counts and timings accumulate across calls."""
+        stats = DeletionStats(deleted=5, elapsed=1.0)
+        session = FakeGitHub({"o/r": make_runs(3)})
+
+        delete_runs(make_runs(3), make_client(session), "o", "r", workers=2, stats=stats)
+
+        self.assertEqual(stats.deleted, 8)
+        self.assertGreater(stats.elapsed, 1.0)
+
+    def test_failures_set_the_exit_code(self):
+        """Test that a purge with failed deletions exits with 1, and 0 otherwise."""
+        session = FakeGitHub({"o/r": make_runs(5, RECENT, first_id=100) + make_runs(10)}, fail={2: 500})
+
+        self.assertEqual(run_delete_workflow_runs(make_client(session), "o", "r", 180, None, workers=3, assume_yes=True), 1)
+        self.assertEqual([run["id"] for run in session.runs["o/r"]], [104, 103, 102, 101, 100, 2])
+
+        session.fail.clear()
+        self.assertEqual(run_delete_workflow_runs(make_client(session), "o", "r", 180, None, workers=3, assume_yes=True), 0)
+        self.assertEqual(len(session.runs["o/r"]), 5)
+
+    def test_interrupt_cancels_queued_and_paused_deletions(self):
+        """Test that Ctrl-C doesn't wait out a rate-limit pause or the queued deletions."""
+        session = FakeGitHub({"o/r": make_runs(10)})
+        client = make_client(session)
+        client.throttle.pause(3600)
+        interrupted: list[bool] = []
+
+        def purge():
+            try:
+                delete_runs(make_runs(10), client, "o", "r", workers=2)
+            except KeyboardInterrupt:
+                interrupted.append(True)
+
+        # Ctrl-C lands while the main thread waits for the first deletions
+        with patch.object(main, "wait", side_effect=KeyboardInterrupt):
+            thread = start_thread(purge)
+            thread.join(2)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(interrupted, [True])
+        self.assertTrue(client.cancelled.is_set())
+        self.assertEqual(session.deletes(), [])
+
+
+class TestRunStream(unittest.TestCase):
+    """Test handing listed runs over through the bounded queue."""
+
+    def test_hands_over_every_run(self):
+        """Test that runs come out in order."""
+        with RunStream(iter(make_runs(25)), maxsize=3) as stream:
+            self.assertEqual([run["id"] for run in stream], list(range(25, 0, -1)))
+
+    def test_listing_errors_are_raised_by_the_iteration(self):
+        """Test that an error on the listing thread reaches the consumer."""
+
+        def runs():
+            yield from make_runs(2)
+            raise WorkflowRunError("Error fetching workflow runs: 502")
+
+        with RunStream(runs()) as stream, self.assertRaisesRegex(WorkflowRunError, "502"):
+            list(stream)
+
+    def test_close_stops_a_producer_blocked_on_a_full_queue(self):
+        """Test that taking fewer runs than listed doesn't leave listing stuck."""
+        stream = RunStream(iter(make_runs(10)), maxsize=1)
+        with stream:
+            self.assertEqual(next(iter(stream))["id"], 10)
+            time.sleep(0.1)
+            self.assertTrue(stream._thread.is_alive())
+        self.assertFalse(stream._thread.is_alive())
+
+    def test_cancel_stops_a_producer_blocked_on_a_full_queue(self):
+        """Test that cancelling frees a producer waiting for room, and the consumer."""
+        cancelled = threading.Event()
+        stream = RunStream(iter(make_runs(10)), maxsize=1, cancelled=cancelled)
+        with stream:
+            time.sleep(0.1)
+            self.assertTrue(stream._thread.is_alive())
+
+            cancelled.set()
+            stream._thread.join(2)
+
+            self.assertFalse(stream._thread.is_alive())
+            with self.assertRaisesRegex(WorkflowRunError, "Cancelled"):
+                list(stream)
+
+
+class TestListing(unittest.TestCase):
+    """Test listing old runs with the server-side date filter."""
+
+    cutoff = datetime.datetime(2021, 3, 4, 12, 0, tzinfo=datetime.UTC)
+
+    def test_created_filter_and_pages_from_the_last(self):
+        """Test that the cutoff day is sent as created=<date and pages come last first."""
+        session = FakeGitHub({"o/r": make_runs(3, "2021-03-04T01:00:00Z", first_id=1000) + make_runs(250)})
+
+        runs = list(iter_workflow_runs(make_client(session), "o", "r", self.cutoff, "ci.yml"))
+
+        # Runs from the cutoff day itself wait for the next invocation
+        self.assertEqual(len(runs), 250)
+        self.assertEqual([run["id"] for run in runs[:2]], [50, 49])
+        self.assertEqual(runs[-1]["id"], 151)
+        self.assertEqual({path for _, path, _ in session.calls}, {"repos/o/r/actions/workflows/ci.yml/runs"})
+        lists = session.lists()
+        self.assertEqual({params["created"] for params in lists}, {"<2021-03-04"})
+        self.assertEqual({params["per_page"] for params in lists}, {main.PER_PAGE})
+        self.assertEqual(lists[0]["page"], 1)
+        self.assertEqual(sorted(params["page"] for params in lists[1:]), [2, 3])
+
+    def test_listing_is_capped_at_max_listed(self):
+        """Test that one listing stops at the MAX_LISTED runs the API can return."""
+        session = FakeGitHub({"o/r": make_runs(2500)})
+
+        runs = list(iter_workflow_runs(make_client(session), "o", "r", self.cutoff))
+
+        self.assertEqual(len(runs), main.MAX_LISTED)
+        self.assertEqual(max(params["page"] for params in session.lists()), main.MAX_LISTED // main.PER_PAGE)
+        # The newest thousand, the only ones GitHub lets us page to
+        self.assertEqual({run["id"] for run in runs}, set(range(1501, 2501)))
+
+    def test_purge_lists_again_after_each_full_window(self):
+        """Test that a purge larger than MAX_LISTED lists again until a window comes back short."""
+        session = FakeGitHub({"o/r": make_runs(5, RECENT, first_id=5000) + make_runs(2500)})
+
+        self.assertEqual(run_delete_workflow_runs(make_client(session), "o", "r", 180, None, workers=8, assume_yes=True), 0)
+
+        self.assertEqual(len(session.deletes()), 2500)
+        self.assertEqual(len(session.runs["o/r"]), 5)
+        windows = [params for params in session.lists() if params["page"] == 1]
+        self.assertEqual(len(windows), 3)
+
+    def test_purge_stops_when_a_window_deletes_nothing(self):
+        """Test that a full window of failures isn't listed again forever."""
+        runs = make_runs(1200)
+        session = FakeGitHub({"o/r": runs}, fail={run["id"]: 403 for run in runs})
+
+        self.assertEqual(run_delete_workflow_runs(make_client(session), "o", "r", 180, None, workers=8, assume_yes=True), 1)
+
+        self.assertEqual(len(session.deletes()), main.MAX_LISTED)
+        self.assertEqual(len([params for params in session.lists() if params["page"] == 1]), 1)
+
+
+class TestDryRun(unittest.TestCase):
+    """Test the counts reported without --yes."""
+
+    def setUp(self):
+        """A journal holding a fully listed purge of o/r with two runs left."""
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.journal = Journal(os.path.join(tmpdir.name, "journal.db"))
+        self.addCleanup(self.journal.close)
+        cutoff = datetime.datetime(2021, 1, 1, tzinfo=datetime.UTC)
+        self.journal.start("o/r", cutoff, None)
+        list(self.journal.track("o/r", make_runs(5)))
+        self.journal.mark("o/r", [1, 2, 3], "deleted")
+        self.journal.listed_all("o/r")
+        # GitHub has more old runs than the journal knows about
+        self.session = FakeGitHub({"o/r": make_runs(10), "o/s": make_runs(4)})
+        self.client = make_client(self.session)
+
+    def found(self, logs) -> list[str]:
+        return [line for line in logs.output if "Found" in line]
+
+    def test_single_and_multi_repo_counts_agree(self):
+        """Test that both modes count a fully listed resumed purge from the journal."""
+        with self.assertLogs("main", level="INFO") as single:
+            run_delete_workflow_runs(self.client, "o", "r", 180, None, journal=self.journal, resume=True)
+        with self.assertLogs("main", level="INFO") as multi:
+            run_purge_repos(self.client, [("o", "r"), ("o", "s")], 180, None, journal=self.journal, resume=True)
+
+        self.assertIn("Found 2 workflow run(s)", self.found(single)[0])
+        self.assertIn("o/r: 2 run(s) to delete", "\n".join(multi.output))
+        self.assertIn("o/s: 4 run(s) to delete", "\n".join(multi.output))
+        self.assertIn("Found 6 workflow run(s)", self.found(multi)[0])
+        self.assertEqual(self.session.deletes(), [])
+
+    def test_counts_from_github_without_resume(self):
+        """Test that a new purge asks GitHub, in one request, capped by max_delete."""
+        with self.assertLogs("main", level="INFO") as logs:
+            run_delete_workflow_runs(self.client, "o", "r", 180, None, max_delete=7, journal=self.journal)
+
+        self.assertIn("Found 7 workflow run(s)", self.found(logs)[0])
+        self.assertEqual(len(self.session.lists()), 1)
+
+
+class TestJournal(unittest.TestCase):
+    """Test resuming purges from the journal."""
+
+    def setUp(self):
+        """A journal in a temporary directory and 250 old runs under 5 recent ones."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "state", "journal.db")
+        self.session = FakeGitHub({"o/r": make_runs(5, RECENT, first_id=1000) + make_runs(250)})
+        self.client = make_client(self.session)
+
+    def purge(self, **kwargs) -> int:
+        journal = Journal(self.path)
+        try:
+            return run_delete_workflow_runs(self.client, "o", "r", 180, None, workers=4, assume_yes=True, journal=journal, **kwargs)
+        finally:
+            journal.close()
+
+    def test_resume_deletes_only_the_remaining_runs(self):
+        """Test that --resume picks up after --max-delete without listing the journaled runs again."""
+        self.assertEqual(self.purge(max_delete=100), 0)
+        self.assertEqual(len(self.session.deletes()), 100)
+        journal = Journal(self.path)
+        pending = {run["id"] for run in journal.pending("o/r")}
+        journal.close()
+        self.assertGreater(len(pending), 0)
+        first_calls, first_listed = len(self.session.calls), len(self.session.listed)
+
+        self.assertEqual(self.purge(resume=True), 0)
+
+        resumed = self.session.calls[first_calls:]
+        # The journal's pending runs are deleted before anything is listed,
+        # and later listings don't return them again
+        self.assertTrue(all(method == "DELETE" for method, _, _ in resumed[: len(pending)]))
+        self.assertFalse(pending.intersection(self.session.listed[first_listed:]))
+        deletes = self.session.deletes()
+        self.assertEqual(len(deletes), 250)
+        self.assertEqual(len(set(deletes)), 250)
+        self.assertEqual([run["id"] for run in self.session.runs["o/r"]], [1004, 1003, 1002, 1001, 1000])
+
+    def test_resume_without_a_purge_fails(self):
+        """Test that there is nothing to resume in a fresh journal."""
+        with self.assertRaises(WorkflowRunError):
+            self.purge(resume=True)
+
+    def test_only_deleting_opens_the_journal(self):
+        """Test that listing workflows and dry runs don't create the journal."""
+        argv = ["main.py", "--gh-token", "x", "--repo-owner", "o", "--repo-name", "r", "--journal", self.path]
+
+        with patch.object(main.requests, "Session", return_value=self.session):
+            with patch.object(sys, "argv", [*argv, "list-workflows"]):
+                self.assertEqual(main.main(), 0)
+            with patch.object(sys, "argv", argv):
+                self.assertEqual(main.main(), 0)
+            self.assertFalse(os.path.exists(self.path))
+
+            with patch.object(sys, "argv", [*argv, "--yes", "--max-delete", "10"]):
+                self.assertEqual(main.main(), 0)
+        self.assertTrue(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+"""
+On-disk cache of Artifactory query results for the Artifactory Query Tool.
+
+Each cache entry is a newest-first set of artifacts for one query (a Docker
+image's tags, a Helm chart's packages, ...), stored in SQLite under the XDG
+cache directory. Along with the artifacts it records how deep the set goes
+(`depth`, or `complete` if the query ran out of results) and the newest
+`created` timestamp seen (the high-water mark), so that once the TTL expires
+only artifacts created since then need to be fetched and merged in.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from artifact_records import newest_artifacts
+
+DEFAULT_TTL = 300  # seconds before an entry is refreshed incrementally
+DEFAULT_MAX_ARTIFACTS = 100_000  # cached artifacts kept across all entries
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    high_water TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT NOT NULL,
+    ident TEXT NOT NULL,
+    created TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (key, ident)
+);
+CREATE INDEX IF NOT EXISTS artifacts_by_created ON artifacts (key, created DESC);
+"""
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory, honouring XDG_CACHE_HOME."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "query-artifactory"
+
+
+@dataclass
+class CacheEntry:
+    """A cached, newest-first set of artifacts for one query."""
+
+    artifacts: Dict[str, Dict]
+    depth: int
+    complete: bool
+    high_water: str
+    fetched_at: float
+
+    def covers(self, limit: int) -> bool:
+        """Whether the entry holds at least the newest `limit` artifacts."""
+        return self.complete or self.depth >= limit
+
+    def is_fresh(self, ttl: float) -> bool:
+        """Whether the entry was fetched within the last `ttl` seconds."""
+        return time.time() - self.fetched_at < ttl
+
+    def newest(self, limit: int) -> List[Dict]:
+        """Return the newest `limit` artifacts."""
+        return newest_artifacts(self.artifacts, limit)
+
+
+class ArtifactCache:
+    """SQLite-backed cache of query results with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: float = DEFAULT_TTL,
+        max_artifacts: int = DEFAULT_MAX_ARTIFACTS,
+    ):
+        self.path = Path(path) if path else default_cache_dir() / "cache.sqlite3"
+        self.ttl = ttl
+        self.max_artifacts = max_artifacts
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the cached entry for a key, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT depth, complete, high_water, fetched_at FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            rows = self._db.execute(
+                "SELECT ident, data FROM artifacts WHERE key = ?", (key,)
+            ).fetchall()
+            with self._db:
+                self._db.execute(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+
+        depth, complete, high_water, fetched_at = row
+        artifacts = {ident: json.loads(data) for ident, data in rows}
+        return CacheEntry(artifacts, depth, bool(complete), high_water, fetched_at)
+
+    def store(self, key: str, artifacts: Dict[str, Dict], limit: int) -> None:
+        """
+        Replace an entry with a freshly fetched result set.
+
+        `limit` is how many artifacts were asked for; getting fewer back means
+        the set is complete.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            self._write(key, artifacts)
+            now = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    len(artifacts),
+                    int(len(artifacts) < limit),
+                    _high_water(artifacts),
+                    now,
+                    now,
+                ),
+            )
+        self.evict()
+
+    def merge(self, key: str, artifacts: Dict[str, Dict]) -> Optional[CacheEntry]:
+        """
+        Merge artifacts created since an entry's high-water mark into it.
+
+        New artifacts are all newer than the cached ones, so they extend the
+        covered depth by however many were not already cached.
+        """
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT depth, high_water FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            depth, high_water = row
+            known = {
+                ident
+                for (ident,) in self._db.execute(
+                    "SELECT ident FROM artifacts WHERE key = ?", (key,)
+                )
+            }
+            added = sum(1 for ident in artifacts if ident not in known)
+            self._write(key, artifacts)
+            self._db.execute(
+                "UPDATE entries SET depth = ?, high_water = ?, fetched_at = ? WHERE key = ?",
+                (
+                    depth + added,
+                    max(high_water, _high_water(artifacts)),
+                    time.time(),
+                    key,
+                ),
+            )
+        self.evict()
+        return self.get(key)
+
+    def _write(self, key: str, artifacts: Dict[str, Dict]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)",
+            [
+                (key, ident, artifact.get("created", ""), json.dumps(artifact))
+                for ident, artifact in artifacts.items()
+            ],
+        )
+
+    def evict(self) -> int:
+        """Drop least recently used entries until under `max_artifacts`."""
+        evicted = 0
+        with self._lock, self._db:
+            (total,) = self._db.execute("SELECT COUNT(*) FROM artifacts").fetchone()
+            if total <= self.max_artifacts:
+                return 0
+            sizes = self._db.execute(
+                "SELECT e.key, COUNT(a.ident) FROM entries e "
+                "LEFT JOIN artifacts a ON a.key = e.key "
+                "GROUP BY e.key ORDER BY e.last_used ASC"
+            ).fetchall()
+            for key, size in sizes:
+                if total <= self.max_artifacts:
+                    break
+                self._db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        return evicted
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+
+def _high_water(artifacts: Dict[str, Dict]) -> str:
+    return max((a.get("created", "") for a in artifacts.values()), default="")
@@ -0,0 +1,117 @@
+"""
+Typed query results for the Artifactory Query Tool.
+
+Queries return compact `ArtifactRecord`s rather than preformatted strings;
+turning them into text is left to whoever renders them.
+"""
+
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+# Sorts before any real timestamp, for artifacts without a usable `created`
+UNKNOWN_CREATED = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def parse_created(value: str) -> datetime:
+    """Parse an Artifactory `created` timestamp into an aware UTC datetime."""
+    try:
+        created = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return UNKNOWN_CREATED
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return created.astimezone(timezone.utc)
+
+
+def format_created(created: datetime) -> str:
+    """Format a timestamp the way Artifactory does, e.g. 2025-01-01T10:00:00.000Z."""
+    if created == UNKNOWN_CREATED:
+        return ""
+    return (
+        created.strftime("%Y-%m-%dT%H:%M:%S.") + f"{created.microsecond // 1000:03d}Z"
+    )
+
+
+def newest_artifacts(artifacts: Dict[str, Dict], limit: int) -> List[Dict]:
+    """Return the newest `limit` raw artifacts of a set, newest first."""
+    return heapq.nlargest(
+        limit,
+        artifacts.values(),
+        key=lambda artifact: parse_created(artifact.get("created", "")),
+    )
+
+
+def helm_chart_version(filename: str, chart_name: str) -> str:
+    """Return the version from a chart package name like `chart-1.2.3.tgz`."""
+    stem = filename.removesuffix(".tgz")
+    return stem.removeprefix(f"{chart_name}-")
+
+
+def wheel_version(filename: str) -> str:
+    """Return the version from a wheel name like `pkg-1.2.3-py3-none-any.whl`."""
+    parts = filename.split("-")
+    return parts[1] if len(parts) > 1 else filename
+
+
+@dataclass(frozen=True, slots=True)
+class ArtifactRecord:
+    """One query result: a Docker tag, Helm chart or Python wheel."""
+
+    created: datetime
+    repo: str
+    item: str
+    version: str  # Docker tag, or chart / package version
+    sha: str  # JFrog sha1, "" if unknown
+    path: str  # Full artifact path, starting with the repo
+    sha256: str = ""  # "" if unknown
+
+    @classmethod
+    def from_artifact(
+        cls, artifact: Dict, repo: str, item: str, version: str
+    ) -> "ArtifactRecord":
+        """Build a record from a `jf rt s` style artifact dict."""
+        return cls(
+            created=parse_created(artifact.get("created", "")),
+            repo=repo,
+            item=item,
+            version=version,
+            sha=artifact.get("sha1", "") or artifact.get("actualSha1", ""),
+            path=artifact.get("path", ""),
+            sha256=artifact.get("sha256", ""),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ArtifactRecord":
+        """Rebuild a record from `as_dict` output."""
+        return cls(**{**data, "created": parse_created(data.get("created", ""))})
+
+    def as_dict(self) -> Dict[str, str]:
+        """Return the record as JSON-serialisable fields."""
+        return {
+            "created": format_created(self.created),
+            "repo": self.repo,
+            "item": self.item,
+            "version": self.version,
+            "sha": self.sha,
+            "path": self.path,
+            "sha256": self.sha256,
+        }
+
+    @property
+    def filename(self) -> str:
+        """The artifact's file name."""
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def short_sha(self) -> str:
+        """The first 8 characters of the sha, or "unknown"."""
+        return self.sha[:8] or "unknown"
+
+
+def top_records(records: Iterable[ArtifactRecord], limit: int) -> List[ArtifactRecord]:
+    """Return the newest `limit` records, newest first, using a bounded heap."""
+    return heapq.nlargest(
+        limit, records, key=lambda record: (record.created, record.version)
+    )
@@ -0,0 +1,103 @@
+"""
+Watch mode for the Artifactory Query Tool.
+
+`--watch` remembers the newest `created` it has seen (the high-water mark) and
+on each poll asks Artifactory only for artifacts created since then, so a poll
+is one small, usually empty, request rather than a full query. New artifacts
+are reported as soon as a poll finds them. While polls keep coming back empty
+the interval doubles, up to a maximum, dropping back to the base interval as
+soon as something new turns up.
+"""
+
+import random
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from artifact_records import ArtifactRecord, format_created
+
+DEFAULT_INTERVAL = 15.0  # seconds
+DEFAULT_MAX_INTERVAL = 300.0
+# Spread polls by up to this fraction of the interval, so CI jobs watching the
+# same item don't all poll in lockstep
+JITTER = 0.1
+
+
+class PollBackoff:
+    """Poll interval that doubles while polls find nothing, up to a maximum."""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        jitter: float = JITTER,
+    ):
+        if interval <= 0:
+            raise ValueError("The watch interval must be positive")
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.jitter = jitter
+        self._current = interval
+
+    def next_delay(self, changed: bool) -> float:
+        """The pause before the next poll, given whether the last one found anything."""
+        if changed:
+            self._current = self.interval
+        delay = self._current
+        if not changed:
+            self._current = min(self.max_interval, self._current * 2)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+def watch(
+    find_new: Callable[[Optional[str]], List[ArtifactRecord]],
+    baseline: List[ArtifactRecord],
+    backoff: PollBackoff,
+    matches: Optional[Callable[[ArtifactRecord], bool]] = None,
+    timeout: Optional[float] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+) -> Iterator[ArtifactRecord]:
+    """
+    Yield artifacts created after `baseline` as polls find them, oldest first.
+
+    `find_new(created_after)` returns the artifacts created since the mark,
+    inclusive (AQL's `$gte`), or just the newest one given None. Artifacts at
+    exactly the mark are remembered, by path and sha, so they aren't yielded
+    twice; a re-pushed tag has a new sha, so it is. Docker tags must therefore
+    always come back as the same file, their manifest, not whichever layer
+    happens to be newest. Only artifacts passing `matches` are yielded,
+    but every artifact moves the mark on. Stops after `timeout` seconds, if
+    given, otherwise runs until the caller stops.
+    """
+    seen: Dict[Tuple[str, str], str] = {
+        (record.path, record.sha): format_created(record.created) for record in baseline
+    }
+    high_water = max(seen.values(), default="")
+    deadline = None if timeout is None else clock() + timeout
+    delay = backoff.interval
+
+    while True:
+        if deadline is not None:
+            remaining = deadline - clock()
+            if remaining <= 0:
+                return
+            delay = min(delay, remaining)
+        sleep(delay)
+
+        new = []
+        for record in sorted(find_new(high_water or None), key=lambda r: r.created):
+            key = (record.path, record.sha)
+            if key not in seen:
+                seen[key] = format_created(record.created)
+                new.append(record)
+        if new:
+            high_water = max(high_water, *seen.values())
+            # Only artifacts at the mark can come back from the next poll
+            seen = {
+                key: created for key, created in seen.items() if created >= high_water
+            }
+
+        for record in new:
+            if matches is None or matches(record):
+                yield record
+        delay = backoff.next_delay(bool(new))
@@ -0,0 +1,816 @@
+"""
+asyncio client and query tool for the Artifactory Query Tool.
+
+`AsyncJFrogClient` is the asyncio counterpart of `JFrogClient`: `aql`,
+`search` and `curl` are coroutines. They run the regular HTTP backend
+(artifactory_http.py) on worker threads, sharing its pool of keep-alive
+connections, and fall back to running `jf rt` as a subprocess (without
+blocking the event loop) when the HTTP backend is unavailable or fails. Those
+commands are hedged, retried and guarded by the circuit breaker just as the
+sync client's are (see resilience.py). Requests are bounded in two ways:
+
+  * at most `max_in_flight` run at once (a semaphore)
+  * with a `rate_limit`, no more than that many start per second on average,
+    in bursts of up to `burst` (a token bucket)
+
+`AsyncArtifactoryQueryTool` has coroutine versions of the query methods, so
+hundreds of queries can share one event loop, one pool and one rate limit:
+
+    async with AsyncJFrogClient.create(max_in_flight=16, rate_limit=50) as client:
+        tool = AsyncArtifactoryQueryTool("prod", client)
+        async for result in tool.query_batch([("sre-libs", "pypi"), ...]):
+            ...
+
+Settings (use_aql, page sizes, max_scan, cache, digest index, ...) are set on
+`tool.planner`, a `QueryPlanner`, which also holds the cache, paging and
+ranking logic shared with the synchronous tool. Docker tags come from one AQL
+request, or paged searches when AQL isn't available; there is no streamed
+search here, each page is read whole. Only the query methods have async
+versions; watching and item listing are synchronous-only.
+"""
+
+import asyncio
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from artifact_records import ArtifactRecord, top_records
+from artifactory_http import (
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    ArtifactoryHttpBackend,
+    ArtifactoryHttpError,
+    JFrogServerConfig,
+    aql_item_to_jf,
+    load_jf_server_config,
+)
+from query_artifactory import (
+    COMMAND_TIMEOUT,
+    FIRST_PAGE_SIZE,
+    BatchResult,
+    EnvironmentResult,
+    QueryPlanner,
+    docker_tags_aql,
+    logger,
+)
+from query_metrics import Metrics
+from resilience import (
+    DEFAULT_MAX_RETRIES,
+    HEDGE_MIN_SAMPLES,
+    CircuitBreaker,
+    CommandAttempts,
+    JFrogCommandError,
+    hedge_delay,
+)
+
+DEFAULT_MAX_IN_FLIGHT = 16
+
+
+class TokenBucket:
+    """
+    Lets requests start at `rate` per second on average, in bursts of `burst`.
+
+    Waiters are served in arrival order.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate <= 0:
+            raise ValueError(f"Rate limit must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take one token, waiting for it if needed; returns the seconds waited."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class AsyncJFrogClient:
+    """
+    asyncio client for Artifactory, mirroring `JFrogClient`.
+
+    With a server config, requests go through an `ArtifactoryHttpBackend`,
+    each run on a worker thread so the event loop isn't blocked; without one,
+    or when a request fails, `jf rt` is run as a subprocess.
+    """
+
+    def __init__(
+        self,
+        config: Optional[JFrogServerConfig] = None,
+        max_in_flight: Optional[int] = DEFAULT_MAX_IN_FLIGHT,
+        rate_limit: Optional[float] = None,
+        burst: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.base_command = ["jf", "rt"]
+        self.config = config
+        self.metrics = Metrics()
+        self.http_backend: Optional[ArtifactoryHttpBackend] = None
+        self._http_threads: Optional[ThreadPoolExecutor] = None
+        if config is not None:
+            # Enough idle connections, and threads, for every request in flight;
+            # the loop's default executor has only a few threads
+            size = pool_size or max_in_flight or DEFAULT_POOL_SIZE
+            self.http_backend = ArtifactoryHttpBackend(
+                config, pool_size=size, timeout=timeout
+            )
+            self.http_backend.on_bytes = self._http_bytes_received
+            self._http_threads = ThreadPoolExecutor(
+                max_workers=size, thread_name_prefix="async-http"
+            )
+        self._in_flight = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+        self._rate_limiter = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.command_timeout = COMMAND_TIMEOUT
+        self.max_retries = DEFAULT_MAX_RETRIES
+        self.hedge = True  # duplicate jf commands slower than the recent p95
+        self.breaker = CircuitBreaker()
+
+    @classmethod
+    def create(
+        cls, backend: str = "auto", server_id: Optional[str] = None, **kwargs
+    ) -> "AsyncJFrogClient":
+        """
+        Build a client for the requested backend, like `JFrogClient.create`.
+
+        Other keyword arguments (max_in_flight, rate_limit, ...) are passed on.
+        """
+        if backend == "cli":
+            return cls(None, **kwargs)
+        config = load_jf_server_config(server_id)
+        if config is None:
+            if backend == "http":
+                raise ArtifactoryHttpError(
+                    "No usable jf server config found for the HTTP backend"
+                )
+            logger.debug("No usable jf server config, using the jf CLI backend")
+        return cls(config, **kwargs)
+
+    async def __aenter__(self) -> "AsyncJFrogClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Release pooled connections."""
+        if self._http_threads is not None:
+            self._http_threads.shutdown(wait=False, cancel_futures=True)
+        if self.http_backend is not None:
+            self.http_backend.close()
+
+    def _http_bytes_received(self, nbytes: int) -> None:
+        self.metrics.count("bytes_received", nbytes, backend="http")
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """Hold one of the in-flight slots, after waiting for the rate limit."""
+        if self._in_flight is None:
+            await self._throttle()
+            yield
+            return
+        async with self._in_flight:
+            await self._throttle()
+            yield
+
+    async def _throttle(self) -> None:
+        if self._rate_limiter is not None:
+            waited = await self._rate_limiter.acquire()
+            if waited:
+                self.metrics.observe("rate_limited", waited)
+
+    async def _http(self, op: str, request: Callable, *args):
+        """Run a blocking `http_backend` request on one of the client's threads."""
+        loop = asyncio.get_running_loop()
+        with self.metrics.timer("request", op=op, backend="http"):
+            return await loop.run_in_executor(
+                self._http_threads, functools.partial(request, *args)
+            )
+
+    async def _run_command(self, command: List[str]) -> str:
+        """
+        Run a JFrog CLI command and return its output.
+
+        Hedged, retried and guarded by the circuit breaker exactly like
+        `JFrogClient._run_command` (see resilience.py); failures raise
+        `JFrogCommandError`.
+        """
+        op = command[2] if len(command) > 2 else "unknown"
+        deadline = time.monotonic() + self.command_timeout
+        attempts = CommandAttempts(
+            " ".join(command), self.breaker, self.max_retries, deadline
+        )
+        while True:
+            try:
+                attempts.begin()
+            except JFrogCommandError:
+                self.metrics.observe("command", 0.0, op=op, outcome="circuit_open")
+                raise
+            try:
+                output = await self._run_attempt(command, op, deadline)
+            except JFrogCommandError as e:
+                delay = attempts.failed(e)
+                logger.warning(f"{e}; retrying in {delay:.2f}s")
+                self.metrics.count("command_retries", op=op)
+                await asyncio.sleep(delay)
+                continue
+            attempts.succeeded()
+            return output
+
+    async def _run_attempt(self, command: List[str], op: str, deadline: float) -> str:
+        """Run one attempt at a command, hedged if it's slow; returns its stdout."""
+        hedge_at = None
+        if self.hedge:
+            p95 = self.metrics.quantile(
+                "command", 0.95, HEDGE_MIN_SAMPLES, op=op, outcome="ok"
+            )
+            hedge_at = time.monotonic() + hedge_delay(p95)
+
+        running: Dict[asyncio.Task, Tuple[str, asyncio.subprocess.Process]] = {}
+
+        async def launch(role: str) -> None:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            running[asyncio.ensure_future(process.communicate())] = (role, process)
+
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            try:
+                await launch("primary")
+            except FileNotFoundError as e:
+                outcome = "not_found"
+                raise JFrogCommandError(
+                    "'jf' command not found. Please install JFrog CLI.", outcome
+                ) from e
+
+            stderr = b""
+            while running:
+                now = time.monotonic()
+                if now >= deadline:
+                    outcome = "timeout"
+                    raise JFrogCommandError(
+                        f"Command timed out: {' '.join(command)}", outcome
+                    )
+                wake = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(
+                    running, timeout=wake - now, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if hedge_at is not None and time.monotonic() >= hedge_at:
+                        # Maybe stuck on a bad node; a second try may get a good one
+                        logger.debug(f"Hedging slow command: {' '.join(command)}")
+                        self.metrics.count("command_hedges", op=op)
+                        hedge_at = None
+                        await launch("hedge")
+                    continue
+
+                for task in done:
+                    role, process = running.pop(task)
+                    stdout, stderr = task.result()
+                    if process.returncode == 0:
+                        outcome = "ok" if role == "primary" else "hedged"
+                        self.metrics.count("bytes_received", len(stdout), backend="cli")
+                        return stdout.decode(errors="replace")
+
+            raise JFrogCommandError(
+                f"Error running command {' '.join(command)}: "
+                f"{stderr.decode(errors='replace').strip()}",
+                outcome,
+            )
+        finally:
+            # Whichever run lost (or everything, on timeout or cancellation)
+            # isn't needed any more, so don't leave jf running
+            for task, (_, process) in running.items():
+                task.cancel()
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+            self.metrics.observe(
+                "command", time.perf_counter() - start, op=op, outcome=outcome
+            )
+
+    def _decode(self, output, op: str):
+        """Decode JSON output; raises json.JSONDecodeError."""
+        with self.metrics.timer("decode", op=op):
+            return json.loads(output)
+
+    async def curl(self, endpoint: str, silent: bool = True) -> str:
+        """
+        GET an Artifactory REST endpoint, like `jf rt curl`.
+
+        Returns the response body; failures raise `JFrogCommandError`.
+        """
+        async with self._slot():
+            if self.http_backend is not None:
+                try:
+                    ok, output = await self._http(
+                        "curl", self.http_backend.curl, endpoint, silent
+                    )
+                except ArtifactoryHttpError as e:
+                    logger.warning(f"HTTP backend failed, falling back to jf CLI: {e}")
+                else:
+                    if not ok:
+                        raise JFrogCommandError(
+                            f"GET {endpoint} failed: {output.strip()[:200]}", "error"
+                        )
+                    return output
+
+            command = self.base_command + ["curl", endpoint]
+            if silent:
+                command.append("--silent")
+            with self.metrics.timer("request", op="curl", backend="cli"):
+                return await self._run_command(command)
+
+    async def search(
+        self,
+        pattern: str,
+        sort_by: str = "created",
+        sort_order: str = "desc",
+        limit: int = 5,
+        offset: int = 0,
+    ) -> List[Dict]:
+        """Search for artifacts using a `jf rt s` style pattern."""
+        async with self._slot():
+            if self.http_backend is not None:
+                try:
+                    artifacts = await self._http(
+                        "search",
+                        self.http_backend.search,
+                        pattern,
+                        sort_by,
+                        sort_order,
+                        limit,
+                        offset,
+                    )
+                    self.metrics.count("artifacts_parsed", len(artifacts), op="search")
+                    return artifacts
+                except ArtifactoryHttpError as e:
+                    logger.warning(f"HTTP backend failed, falling back to jf CLI: {e}")
+
+            command = self.base_command + [
+                "s",
+                f"--sort-by={sort_by}",
+                f"--sort-order={sort_order}",
+                f"--limit={limit}",
+                f"--offset={offset}",
+                pattern,
+            ]
+            with self.metrics.timer("request", op="search", backend="cli"):
+                output = await self._run_command(command)
+                try:
+                    artifacts = self._decode(output, "search")
+                except json.JSONDecodeError:
+                    logger.error("Error parsing JSON response for search")
+                    return []
+            self.metrics.count("artifacts_parsed", len(artifacts), op="search")
+            return artifacts
+
+    async def aql(self, query: str) -> Optional[Dict]:
+        """
+        Run a raw AQL query.
+
+        Returns the decoded response, or None if AQL isn't available.
+        """
+        async with self._slot():
+            response = None
+            if self.http_backend is not None:
+                try:
+                    response = await self._http("aql", self.http_backend.aql, query)
+                except ArtifactoryHttpError as e:
+                    logger.warning(f"HTTP backend failed, falling back to jf CLI: {e}")
+
+            if response is None:
+                command = self.base_command + [
+                    "curl",
+                    "-XPOST",
+                    "/api/search/aql",
+                    "-H",
+                    "Content-Type: text/plain",
+                    "-d",
+                    query,
+                    "--silent",
+                ]
+                with self.metrics.timer("request", op="aql", backend="cli"):
+                    try:
+                        output = await self._run_command(command)
+                    except JFrogCommandError as e:
+                        logger.warning(f"AQL query failed: {e}")
+                        return None
+                    try:
+                        response = self._decode(output, "aql")
+                    except json.JSONDecodeError:
+                        logger.error("Error parsing JSON response for AQL query")
+                        return None
+
+            if not isinstance(response, dict) or "results" not in response:
+                logger.debug(f"AQL query rejected: {str(response)[:200]}")
+                return None
+            self.metrics.count("artifacts_parsed", len(response["results"]), op="aql")
+            return response
+
+
+def _advance_plan(plan: Generator, sent: Any) -> Tuple[bool, Any]:
+    """
+    Send a value into a cache plan: (False, what it yields next) or (True,
+    what it returns). StopIteration can't cross `asyncio.to_thread`.
+    """
+    try:
+        return False, plan.send(sent)
+    except StopIteration as done:
+        return True, done.value
+
+
+def _timed_query(artifact_type: str) -> Callable:
+    """Record the latency of a query coroutine under the `query` timer."""
+
+    def decorate(method: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        @functools.wraps(method)
+        async def timed(self: "AsyncArtifactoryQueryTool", *args, **kwargs):
+            with self.metrics.timer("query", type=artifact_type):
+                return await method(self, *args, **kwargs)
+
+        return timed
+
+    return decorate
+
+
+class AsyncArtifactoryQueryTool:
+    """
+    Coroutine versions of `ArtifactoryQueryTool`'s queries, for one event loop.
+
+    Settings, and the steps of a query that need no requests, are the
+    `QueryPlanner` in `planner`, just as they are for the synchronous tool;
+    this class only makes the requests, through an `AsyncJFrogClient`. The
+    planner's streaming and prefetching settings don't apply here.
+    """
+
+    def __init__(
+        self, environment: str = "dev", client: Optional[AsyncJFrogClient] = None
+    ):
+        self.client = client or AsyncJFrogClient()
+        self.planner = QueryPlanner(environment, self.client.metrics)
+
+    @property
+    def metrics(self) -> Metrics:
+        """The client's metrics registry, shared by every query on this tool."""
+        return self.client.metrics
+
+    async def _cached_query(
+        self,
+        key: str,
+        limit: int,
+        fetch: Callable[[Optional[str]], Awaitable[Dict[str, Dict]]],
+    ) -> List[Dict]:
+        """
+        Async `ArtifactoryQueryTool._cached_query`, awaiting each fetch.
+
+        The cache plan reads and writes SQLite, so with a cache its steps run
+        on a worker thread rather than blocking the event loop.
+        """
+        plan = self.planner._cache_plan(key, limit)
+
+        async def advance(sent: Any) -> Tuple[bool, Any]:
+            if self.planner.cache is None:
+                return _advance_plan(plan, sent)
+            return await asyncio.to_thread(_advance_plan, plan, sent)
+
+        done, value = await advance(None)
+        while not done:
+            done, value = await advance(await fetch(value))
+        return value
+
+    async def _index_digests(
+        self, artifact_type: str, records: List[ArtifactRecord]
+    ) -> None:
+        """`QueryPlanner._index_digests`, on a worker thread (it writes SQLite)."""
+        if self.planner.digest_index is not None:
+            await asyncio.to_thread(self.planner._index_digests, artifact_type, records)
+
+    async def query(
+        self,
+        artifact_type: str,
+        item_name: str,
+        limit: int = 5,
+        tag_length: int = 7,
+        version_range: Optional[str] = None,
+        prereleases: bool = False,
+    ) -> List[ArtifactRecord]:
+        """Query one item of the given artifact type (docker, helm or pypi)."""
+        if artifact_type == "docker":
+            return await self.query_docker(item_name, limit, tag_length)
+        if artifact_type == "helm":
+            return await self.query_helm(item_name, limit, version_range, prereleases)
+        if artifact_type == "pypi":
+            return await self.query_pypi(item_name, limit, version_range, prereleases)
+        raise ValueError(
+            f"Unsupported artifact type: {artifact_type}. Supported types are: docker, helm, pypi"
+        )
+
+    async def query_batch(
+        self,
+        queries: Iterable[Tuple[str, str]],
+        limit: int = 5,
+        tag_length: int = 7,
+        concurrency: Optional[int] = None,
+        version_range: Optional[str] = None,
+        prereleases: bool = False,
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Run many (item_name, artifact_type) queries on this event loop.
+
+        Results are yielded as each query completes; a failing query is
+        reported in its result rather than raised. Requests are bounded by
+        the client; `concurrency` additionally caps the queries running.
+        """
+        gate = asyncio.Semaphore(concurrency) if concurrency else None
+
+        async def run(item_name: str, artifact_type: str) -> BatchResult:
+            try:
+                if gate is None:
+                    results = await self.query(
+                        artifact_type,
+                        item_name,
+                        limit,
+                        tag_length,
+                        version_range,
+                        prereleases,
+                    )
+                else:
+                    async with gate:
+                        results = await self.query(
+                            artifact_type,
+                            item_name,
+                            limit,
+                            tag_length,
+                            version_range,
+                            prereleases,
+                        )
+                return BatchResult(item_name, artifact_type, results)
+            except Exception as e:
+                return BatchResult(item_name, artifact_type, [], str(e))
+
+        tasks = [
+            asyncio.ensure_future(run(item_name, artifact_type))
+            for item_name, artifact_type in queries
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def for_environment(self, environment: str) -> "AsyncArtifactoryQueryTool":
+        """Return a tool for another environment with the same client and settings."""
+        if environment == self.planner.environment:
+            return self
+        tool = AsyncArtifactoryQueryTool(environment, self.client)
+        self.planner._copy_settings(tool.planner)
+        return tool
+
+    async def query_environments(
+        self,
+        environments: List[str],
+        artifact_type: str,
+        item_name: str,
+        limit: int = 5,
+        tag_length: int = 7,
+    ) -> List[EnvironmentResult]:
+        """Run the same query in several environments at once, in input order."""
+
+        async def run(environment: str) -> EnvironmentResult:
+            try:
+                results = await self.for_environment(environment).query(
+                    artifact_type, item_name, limit, tag_length
+                )
+                return EnvironmentResult(environment, results)
+            except Exception as e:
+                return EnvironmentResult(environment, [], str(e))
+
+        return list(await asyncio.gather(*(run(env) for env in environments)))
+
+    @_timed_query("docker")
+    async def query_docker(
+        self, item_name: str, limit: int = 5, tag_length: int = 7
+    ) -> List[ArtifactRecord]:
+        """Query Docker images and return the newest matches."""
+        logger.info(
+            f"Fetching Docker image tags for {item_name} (filtering for {tag_length}-character tags)..."
+        )
+        artifacts = await self._cached_query(
+            f"docker:{self.planner.docker_repo}/{item_name}:{tag_length}",
+            limit,
+            lambda created_after: self._find_docker_tags(
+                item_name, limit, tag_length, created_after
+            ),
+        )
+        records = self.planner._docker_records(item_name, artifacts, tag_length)
+        await self._index_digests("docker", records)
+        return top_records(records, limit)
+
+    async def _find_docker_tags(
+        self,
+        item_name: str,
+        limit: int,
+        tag_length: int,
+        created_after: Optional[str] = None,
+    ) -> Dict[str, Dict]:
+        """Return the newest artifact for each matching tag, keyed by tag."""
+        tag_artifacts: Dict[str, Dict] = {}
+        all_tags: set = set()
+
+        response = None
+        if self.planner.use_aql:
+            response = await self.client.aql(
+                docker_tags_aql(
+                    self.planner.docker_repo,
+                    item_name,
+                    tag_length,
+                    limit,
+                    created_after,
+                )
+            )
+            self.metrics.count("pages_fetched", search="docker_aql")
+        if response is not None:
+            with self.metrics.timer("filter", search="docker_aql"):
+                self.planner._collect_docker_tags(
+                    [aql_item_to_jf(item) for item in response.get("results", [])],
+                    tag_length,
+                    tag_artifacts,
+                    all_tags,
+                    limit,
+                )
+        else:
+            await self._page_docker_tags(
+                item_name, limit, tag_length, tag_artifacts, all_tags, created_after
+            )
+        logger.debug(
+            f"Found {len(tag_artifacts)} unique {tag_length}-character tags out of {len(all_tags)} total tags"
+        )
+        return tag_artifacts
+
+    async def _page_docker_tags(
+        self,
+        item_name: str,
+        limit: int,
+        tag_length: int,
+        tag_artifacts: Dict[str, Dict],
+        all_tags: set,
+        created_after: Optional[str] = None,
+    ) -> None:
+        """Page through an image's artifacts, sized as `_docker_pager` says."""
+        page_size, take = self.planner._docker_pager(
+            limit, tag_length, tag_artifacts, all_tags, created_after
+        )
+        async with aclosing(
+            self._iter_pages(
+                f"{self.planner.docker_repo}/{item_name}/*",
+                page_size,
+                "docker_paged",
+                f"{tag_length}-character tags",
+            )
+        ) as pages:
+            async for artifacts in pages:
+                if take(artifacts):
+                    return
+
+    async def _search_all(
+        self,
+        pattern: str,
+        search: str,
+        what: str,
+        created_after: Optional[str] = None,
+        first_page_size: int = FIRST_PAGE_SIZE,
+        scan_cap: Optional[Tuple[int, str]] = None,
+    ) -> Dict[str, Dict]:
+        """Return every artifact for a pattern, keyed by path, in doubling pages."""
+        page_size, take, artifacts = self.planner._search_all_pager(
+            created_after, first_page_size
+        )
+        async with aclosing(
+            self._iter_pages(pattern, page_size, search, what, scan_cap)
+        ) as pages:
+            async for page in pages:
+                if take(page):
+                    break
+        return artifacts
+
+    async def _iter_pages(
+        self,
+        pattern: str,
+        page_size: Callable[[], int],
+        search: str,
+        what: str,
+        scan_cap: Optional[Tuple[int, str]] = None,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Yield pages of a newest-first search, in offset order.
+
+        The async counterpart of `ArtifactoryQueryTool._iter_pages`, with the
+        same sizing callback, end-of-results and `max_scan` handling, but no
+        prefetching: pages are awaited one at a time, and concurrency comes
+        from running many queries on the event loop instead.
+        """
+        max_scan, option = scan_cap or (self.planner.max_scan, "--max-scan")
+        offset = 0
+        while offset < max_scan:
+            size = min(page_size(), max_scan - offset)
+            page = await self.client.search(pattern, limit=size, offset=offset)
+            self.metrics.count("pages_fetched", search=search)
+            if not page:
+                return
+            offset += len(page)
+            yield page
+            if len(page) < size:
+                return
+        self.planner._report_scan_cap(search, offset, what, option, max_scan)
+
+    async def _all_artifacts(
+        self, cache_key: str, pattern: str, search: str, what: str
+    ) -> List[Dict]:
+        """Return every artifact for a pattern (up to `max_scan`), through the cache."""
+        scan_cap = self.planner._version_scan_cap()
+        return await self._cached_query(
+            cache_key,
+            scan_cap[0],
+            lambda created_after: self._search_all(
+                pattern, search, what, created_after, scan_cap=scan_cap
+            ),
+        )
+
+    @_timed_query("helm")
+    async def query_helm(
+        self,
+        item_name: str,
+        limit: int = 5,
+        version_range: Optional[str] = None,
+        prereleases: bool = False,
+    ) -> List[ArtifactRecord]:
+        """Query Helm charts and return the highest chart versions (semver)."""
+        search_pattern = f"{self.planner.helm_repo}/{item_name}/*.tgz"
+        artifacts = await self._all_artifacts(
+            f"helm:{search_pattern}", search_pattern, "helm", "chart versions"
+        )
+        records = self.planner._helm_records(item_name, artifacts)
+        await self._index_digests("helm", records)
+        return self.planner._top_versions(
+            "helm", records, limit, version_range, prereleases
+        )
+
+    @_timed_query("pypi")
+    async def query_pypi(
+        self,
+        item_name: str,
+        limit: int = 5,
+        version_range: Optional[str] = None,
+        prereleases: bool = False,
+    ) -> List[ArtifactRecord]:
+        """Query PyPI packages and return the highest package versions (PEP 440)."""
+        search_pattern = f"{self.planner.pypi_repo}/{item_name}/*.whl"
+        artifacts = await self._all_artifacts(
+            f"pypi:{search_pattern}", search_pattern, "pypi", "package versions"
+        )
+        records = self.planner._pypi_records(item_name, artifacts)
+        await self._index_digests("pypi", records)
+        return self.planner._top_versions(
+            "pypi", records, limit, version_range, prereleases
+        )
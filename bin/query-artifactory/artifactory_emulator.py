@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Synthetic Artifactory emulator for benchmarking the Artifactory Query Tool.
+
+Serves one generated Docker, Helm and PyPI repo over the same AQL endpoint
+the HTTP backend uses, and can write a fake `jf` executable that answers
+`jf rt s` / `jf rt curl` from the emulator, so both backends can be measured
+without a real Artifactory.
+
+Artifacts are generated from their index (newest first) rather than stored,
+so repos of a million artifacts cost little more than their tag names:
+
+  * docker: `<item>/<tag>/manifest.json` plus layer files per tag, with tag
+    lengths drawn from a distribution (e.g. 80% 7-character, 20% 10-character)
+  * helm:   `<item>/<item>-<version>.tgz`
+  * pypi:   `<item>/<item_>-<version>-py3-none-any.whl`
+
+Only the subset of AQL the tool sends is understood: field criteria with
+`$match`/`$eq`/`$ne`/`$gt`/`$gte`/`$lt`/`$lte`, `$or`/`$and`, sorting on
+`created`, `.offset()` and `.limit()`. Each repo has one top-level folder, the
+item, which `"type": "folder"` queries and `api/storage/<repo>` list.
+
+Usage:
+    # Serve 100k artifacts per repo with 20ms latency per request
+    ./artifactory_emulator.py --artifacts 100000 --latency-ms 20
+
+    # Then, in another shell
+    JF_URL=http://127.0.0.1:8081/artifactory/ ./query_artifactory.py bench-item docker
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_ITEM = "bench-item"
+DEFAULT_TAG_LENGTHS = {7: 0.8, 10: 0.15, 12: 0.05}
+DEFAULT_FILES_PER_TAG = 5  # manifest.json plus four layers
+BASE_CREATED = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+_SORT = re.compile(r'\.sort\(\{"\$(asc|desc)":\["(\w+)"\]\}\)')
+_OFFSET = re.compile(r"\.offset\((\d+)\)")
+_LIMIT = re.compile(r"\.limit\((\d+)\)")
+
+
+def parse_tag_lengths(spec: str) -> Dict[int, float]:
+    """Parse a tag length distribution like `7:0.8,10:0.2`."""
+    lengths = {}
+    for part in spec.split(","):
+        length, _, weight = part.partition(":")
+        lengths[int(length)] = float(weight or 1)
+    return lengths
+
+
+class SyntheticRepo:
+    """A generated repo of `count` artifacts for one item, newest first."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        item: str = DEFAULT_ITEM,
+        count: int = 10_000,
+        tag_lengths: Optional[Dict[int, float]] = None,
+        files_per_tag: int = DEFAULT_FILES_PER_TAG,
+        seed: int = 0,
+    ):
+        self.name = name
+        self.kind = kind
+        self.item = item
+        self.count = count
+        self.files_per_tag = files_per_tag
+        self.seed = seed
+        self.tags: List[str] = []
+        if kind == "docker":
+            self.tags = self._generate_tags(tag_lengths or DEFAULT_TAG_LENGTHS)
+
+    def _generate_tags(self, tag_lengths: Dict[int, float]) -> List[str]:
+        rng = random.Random(self.seed)
+        lengths = rng.choices(
+            list(tag_lengths),
+            weights=list(tag_lengths.values()),
+            k=-(-self.count // self.files_per_tag),
+        )
+        tags = []
+        for index, length in enumerate(lengths):
+            digest = hashlib.sha1(f"{self.seed}:{index}".encode()).hexdigest()
+            tags.append((digest * (1 + length // len(digest)))[:length])
+        return tags
+
+    def __len__(self) -> int:
+        return self.count
+
+    def item_at(self, index: int) -> Dict:
+        """Return the AQL item for the `index`-th newest artifact."""
+        created = (BASE_CREATED - timedelta(seconds=index)).strftime(
+            "%Y-%m-%dT%H:%M:%S.000Z"
+        )
+        digest = hashlib.sha1(f"{self.name}:{self.seed}:{index}".encode()).hexdigest()
+
+        if self.kind == "docker":
+            tag, file_index = divmod(index, self.files_per_tag)
+            path = f"{self.item}/{self.tags[tag]}"
+            name = "manifest.json" if file_index == 0 else f"sha256__{digest}"
+        else:
+            # Newest artifacts get the highest versions
+            number = self.count - index
+            version = f"{number // 10000}.{number // 100 % 100}.{number % 100}"
+            path = self.item
+            if self.kind == "helm":
+                name = f"{self.item}-{version}.tgz"
+            else:
+                name = f"{self.item.replace('-', '_')}-{version}-py3-none-any.whl"
+
+        return {
+            "repo": self.name,
+            "path": path,
+            "name": name,
+            "type": "file",
+            "size": 1024 + index % 4096,
+            "created": created,
+            "modified": created,
+            "actual_sha1": digest,
+            "actual_md5": digest[:32],
+            "sha256": hashlib.sha256(digest.encode()).hexdigest(),
+        }
+
+    def folder(self) -> Dict:
+        """Return the AQL item for the repo's one top-level folder, the item's."""
+        created = (BASE_CREATED - timedelta(seconds=self.count - 1)).strftime(
+            "%Y-%m-%dT%H:%M:%S.000Z"
+        )
+        return {
+            "repo": self.name,
+            "path": ".",
+            "name": self.item,
+            "type": "folder",
+            "depth": 1,
+            "created": created,
+            "modified": created,
+        }
+
+
+def _matches(criteria: Dict, item: Dict) -> bool:
+    for key, expected in criteria.items():
+        if key == "$or":
+            if not any(_matches(sub, item) for sub in expected):
+                return False
+        elif key == "$and":
+            if not all(_matches(sub, item) for sub in expected):
+                return False
+        elif isinstance(expected, dict):
+            value = item.get(key)
+            for op, operand in expected.items():
+                if not _compare(op, value, operand):
+                    return False
+        elif item.get(key) != expected:
+            return False
+    return True
+
+
+def _compare(op: str, value, operand) -> bool:
+    if op == "$match":
+        return fnmatch.fnmatchcase(str(value), operand)
+    if op == "$nmatch":
+        return not fnmatch.fnmatchcase(str(value), operand)
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported AQL operator: {op}")
+
+
+class Emulator:
+    """Evaluates AQL against a set of synthetic repos."""
+
+    def __init__(self, repos: List[SyntheticRepo]):
+        self.repos = {repo.name: repo for repo in repos}
+
+    @classmethod
+    def create(
+        cls,
+        artifacts: int = 10_000,
+        item: str = DEFAULT_ITEM,
+        environment: str = "dev",
+        tag_lengths: Optional[Dict[int, float]] = None,
+        files_per_tag: int = DEFAULT_FILES_PER_TAG,
+        seed: int = 0,
+    ) -> "Emulator":
+        """Build the Docker, Helm and PyPI repos the tool queries for an environment."""
+        return cls(
+            [
+                SyntheticRepo(
+                    f"dexcom-docker-{environment}-virtual",
+                    "docker",
+                    item,
+                    artifacts,
+                    tag_lengths,
+                    files_per_tag,
+                    seed,
+                ),
+                SyntheticRepo(
+                    f"dexcom-helm-{environment}-virtual", "helm", item, artifacts
+                ),
+                SyntheticRepo(
+                    f"dexcom-pypi-{environment}-local", "pypi", item, artifacts
+                ),
+            ]
+        )
+
+    def aql(self, query: str) -> Dict:
+        """Run an AQL query and return the response Artifactory would send."""
+        start = query.index("items.find(") + len("items.find(")
+        criteria, _ = json.JSONDecoder().raw_decode(query, start)
+        sort = _SORT.search(query)
+        offset = _OFFSET.search(query)
+        limit = _LIMIT.search(query)
+
+        results = list(
+            self._find(
+                criteria,
+                ascending=bool(sort and sort.group(1) == "asc"),
+                offset=int(offset.group(1)) if offset else 0,
+                limit=int(limit.group(1)) if limit else None,
+            )
+        )
+        return {
+            "results": results,
+            "range": {
+                "start_pos": int(offset.group(1)) if offset else 0,
+                "end_pos": (int(offset.group(1)) if offset else 0) + len(results),
+                "total": len(results),
+            },
+        }
+
+    def _find(
+        self, criteria: Dict, ascending: bool, offset: int, limit: Optional[int]
+    ) -> Iterator[Dict]:
+        # Every repo is already sorted by created, newest first
+        if "repo" in criteria:
+            if criteria["repo"] not in self.repos:
+                return
+            repos = [self.repos[criteria["repo"]]]
+        else:
+            repos = list(self.repos.values())
+
+        if limit == 0:
+            return
+        skipped = taken = 0
+        for repo in repos:
+            if criteria.get("type") == "folder":
+                items = iter([repo.folder()])
+            else:
+                indices = (
+                    range(len(repo) - 1, -1, -1) if ascending else range(len(repo))
+                )
+                items = (repo.item_at(index) for index in indices)
+            for item in items:
+                if not _matches(criteria, item):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                yield item
+                taken += 1
+                if limit is not None and taken >= limit:
+                    return
+
+
+class EmulatorServer(ThreadingHTTPServer):
+    """HTTP front end for an Emulator, counting requests and bytes served."""
+
+    daemon_threads = True
+    # Concurrent clients open many connections at once; the default backlog of
+    # 5 drops the rest, which then only connect after a 1s SYN retransmit
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        emulator: Emulator,
+        address: Tuple[str, int] = ("127.0.0.1", 0),
+        latency: float = 0.0,
+        jitter: float = 0.0,
+    ):
+        super().__init__(address, _EmulatorHandler)
+        self.emulator = emulator
+        self.latency = latency
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as the Artifactory URL (JF_URL)."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/artifactory/"
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients that stop reading early (streamed searches) just hang up
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.searches = 0
+            self.bytes_sent = 0
+
+    def record(self, nbytes: int) -> None:
+        with self._lock:
+            self.searches += 1
+            self.bytes_sent += nbytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"searches": self.searches, "bytes": self.bytes_sent}
+
+    def delay(self) -> None:
+        """Sleep for the configured latency, plus up to `jitter` seconds."""
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _EmulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: EmulatorServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = self.rfile.read(length).decode()
+        if self.path == "/_emulator/reset":
+            self.server.reset_stats()
+            self._send(200, b"{}")
+            return
+        if not self.path.endswith("/api/search/aql"):
+            self._send(404, b'{"errors": [{"status": 404, "message": "Not found"}]}')
+            return
+
+        self.server.delay()
+        try:
+            body = json.dumps(self.server.emulator.aql(payload)).encode()
+        except ValueError as e:
+            self._send(400, json.dumps({"error": str(e)}).encode())
+            return
+        self.server.record(len(body))
+        self._send(200, body)
+
+    def do_GET(self):
+        if self.path == "/_emulator/stats":
+            self._send(200, json.dumps(self.server.stats()).encode())
+            return
+        self.server.delay()
+        _, _, repo = self.path.partition("/api/storage/")
+        if repo in self.server.emulator.repos:
+            item = self.server.emulator.repos[repo].item
+            listing = {
+                "repo": repo,
+                "path": "/",
+                "children": [{"uri": f"/{item}", "folder": True}],
+            }
+            self._send(200, json.dumps(listing).encode())
+            return
+        self._send(200, b"{}")
+
+
+def emulator_stats(url: str) -> Dict[str, int]:
+    """Fetch the request and byte counters of a running emulator."""
+    base = url.split("/artifactory/")[0]
+    with urllib.request.urlopen(f"{base}/_emulator/stats") as response:
+        return json.loads(response.read())
+
+
+def reset_emulator_stats(url: str) -> None:
+    """Zero the counters of a running emulator."""
+    base = url.split("/artifactory/")[0]
+    request = urllib.request.Request(f"{base}/_emulator/reset", data=b"", method="POST")
+    urllib.request.urlopen(request).close()
+
+
+FAKE_JF = """#!{python}
+import sys
+sys.path.insert(0, {tool_dir!r})
+from artifactory_emulator import jf_main
+sys.exit(jf_main(sys.argv[1:]))
+"""
+
+
+def write_fake_jf(directory: Path) -> Path:
+    """Write an executable `jf` that talks to the emulator at $JF_URL."""
+    path = Path(directory) / "jf"
+    path.write_text(
+        FAKE_JF.format(python=sys.executable, tool_dir=str(Path(__file__).parent))
+    )
+    path.chmod(0o755)
+    return path
+
+
+def jf_main(argv: List[str]) -> int:
+    """Answer the `jf rt s` and `jf rt curl` calls the tool makes."""
+    from artifactory_http import aql_item_to_jf, pattern_to_aql
+
+    url = os.environ["JF_URL"].rstrip("/") + "/"
+    if argv[:2] == ["rt", "s"]:
+        options = dict(
+            arg[2:].split("=", 1) for arg in argv[2:] if arg.startswith("--")
+        )
+        pattern = next(arg for arg in argv[2:] if not arg.startswith("--"))
+        query = pattern_to_aql(
+            pattern,
+            options.get("sort-by", "created"),
+            options.get("sort-order", "desc"),
+            int(options.get("limit", 0)),
+            int(options.get("offset", 0)),
+        )
+        response = _post_aql(url, query)
+        results = [aql_item_to_jf(item) for item in response["results"]]
+        print(json.dumps(results, indent=2))
+        return 0
+
+    if argv[:2] == ["rt", "curl"]:
+        if "-d" in argv:
+            query = argv[argv.index("-d") + 1]
+            print(json.dumps(_post_aql(url, query)))
+        else:
+            endpoint = next(arg for arg in argv[2:] if not arg.startswith("-"))
+            with urllib.request.urlopen(url + endpoint.lstrip("/")) as response:
+                print(response.read().decode())
+        return 0
+
+    print(f"fake jf: unsupported command {argv}", file=sys.stderr)
+    return 1
+
+
+def _post_aql(url: str, query: str) -> Dict:
+    request = urllib.request.Request(
+        url + "api/search/aql", data=query.encode(), method="POST"
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve synthetic Artifactory repos")
+    parser.add_argument("--port", type=int, default=8081, help="default: 8081")
+    parser.add_argument(
+        "--artifacts",
+        type=int,
+        default=10_000,
+        help="Artifacts per repo (default: 10000)",
+    )
+    parser.add_argument("--item", default=DEFAULT_ITEM, help="Item name in every repo")
+    parser.add_argument("--env", default="dev", help="Environment in repo names")
+    parser.add_argument(
+        "--tag-lengths",
+        default="7:0.8,10:0.15,12:0.05",
+        help="Docker tag length distribution (default: 7:0.8,10:0.15,12:0.05)",
+    )
+    parser.add_argument(
+        "--files-per-tag",
+        type=int,
+        default=DEFAULT_FILES_PER_TAG,
+        help=f"Files in each Docker tag folder (default: {DEFAULT_FILES_PER_TAG})",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    emulator = Emulator.create(
+        args.artifacts,
+        args.item,
+        args.env,
+        parse_tag_lengths(args.tag_lengths),
+        args.files_per_tag,
+        args.seed,
+    )
+    server = EmulatorServer(
+        emulator,
+        ("127.0.0.1", args.port),
+        args.latency_ms / 1000,
+        args.jitter_ms / 1000,
+    )
+    # The first line of output is the URL, so callers using --port 0 can find it
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,437 @@
+"""
+Native HTTP backend for the Artifactory Query Tool.
+
+Talks to the Artifactory REST/AQL API directly over a small pool of keep-alive
+connections instead of forking `jf rt` for every call. Server details are read
+from the same config the jf CLI uses (see `load_jf_server_config`), so
+`jf login` / `jf c add` is still the only setup required.
+
+Results are returned in the same shape `jf rt s` prints, so callers can't tell
+which backend answered.
+"""
+
+import base64
+import http.client
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from json_stream import iter_json_array, iter_text
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 8
+
+# Newest first, same search order as the jf CLI itself
+JF_CONFIG_FILES = ["jfrog-cli.conf.v6", "jfrog-cli.conf.v5", "jfrog-cli.conf"]
+
+# AQL item fields we ask for, and how they map onto `jf rt s` output keys
+AQL_FIELDS = [
+    "repo",
+    "path",
+    "name",
+    "type",
+    "size",
+    "created",
+    "modified",
+    "actual_sha1",
+    "actual_md5",
+    "sha256",
+]
+AQL_TO_JF_KEYS = {"actual_sha1": "sha1", "actual_md5": "md5"}
+
+# Errors that mean a pooled keep-alive connection went stale under us
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class ArtifactoryHttpError(Exception):
+    """Raised when the HTTP backend cannot answer a request."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class JFrogServerConfig:
+    """Connection details for one Artifactory server."""
+
+    artifactory_url: str
+    access_token: str = ""
+    user: str = ""
+    password: str = ""
+    server_id: str = ""
+
+    def auth_header(self) -> Optional[str]:
+        """Return the Authorization header value, if credentials are set."""
+        if self.access_token:
+            return f"Bearer {self.access_token}"
+        if self.user and self.password:
+            token = base64.b64encode(f"{self.user}:{self.password}".encode()).decode()
+            return f"Basic {token}"
+        return None
+
+
+def jf_home_dir() -> Path:
+    """Return the jf CLI home directory (honours JFROG_CLI_HOME_DIR)."""
+    return Path(os.environ.get("JFROG_CLI_HOME_DIR", Path.home() / ".jfrog"))
+
+
+def load_jf_server_config(
+    server_id: Optional[str] = None, home_dir: Optional[Path] = None
+) -> Optional[JFrogServerConfig]:
+    """
+    Load server details the same way the jf CLI does.
+
+    The JF_URL / JF_ACCESS_TOKEN / JF_USER / JF_PASSWORD environment variables
+    win, otherwise the requested (or default) server from the jf config file is
+    used. Returns None when nothing usable is found, including when the config
+    is encrypted with a master key - the caller should fall back to `jf` then.
+    """
+    env_url = os.environ.get("JF_URL")
+    if env_url and server_id is None:
+        return JFrogServerConfig(
+            artifactory_url=_artifactory_url(env_url, ""),
+            access_token=os.environ.get("JF_ACCESS_TOKEN", ""),
+            user=os.environ.get("JF_USER", ""),
+            password=os.environ.get("JF_PASSWORD", ""),
+        )
+
+    home_dir = home_dir or jf_home_dir()
+    for filename in JF_CONFIG_FILES:
+        config_path = home_dir / filename
+        if not config_path.is_file():
+            continue
+        try:
+            config = json.loads(config_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+        if config.get("enc"):
+            return None
+
+        servers = config.get("servers") or config.get("artifactory") or []
+        for server in servers:
+            if server_id is not None:
+                if server.get("serverId") != server_id:
+                    continue
+            elif not server.get("isDefault") and len(servers) > 1:
+                continue
+            return JFrogServerConfig(
+                artifactory_url=_artifactory_url(
+                    server.get("url", ""), server.get("artifactoryUrl", "")
+                ),
+                access_token=server.get("accessToken", ""),
+                user=server.get("user", ""),
+                password=server.get("password", ""),
+                server_id=server.get("serverId", ""),
+            )
+        return None
+
+    return None
+
+
+def _artifactory_url(platform_url: str, artifactory_url: str) -> str:
+    """Work out the Artifactory base URL from the platform URL if needed."""
+    if artifactory_url:
+        return artifactory_url.rstrip("/") + "/"
+    return platform_url.rstrip("/") + "/artifactory/"
+
+
+def pattern_to_aql(
+    pattern: str,
+    sort_by: str = "created",
+    sort_order: str = "desc",
+    limit: int = 5,
+    offset: int = 0,
+) -> str:
+    """
+    Translate a `jf rt s` style pattern into an AQL query.
+
+    Like the CLI, the pattern is recursive: `repo/item/*.tgz` matches files
+    named `*.tgz` directly in `item` or anywhere below it.
+    """
+    repo, _, rest = pattern.partition("/")
+    directory, _, name = rest.rpartition("/")
+    name = name or "*"
+
+    criteria: Dict = {"repo": repo, "type": "file"}
+    if directory:
+        criteria["$or"] = [
+            {"path": {"$match": directory}, "name": {"$match": name}},
+            {"path": {"$match": f"{directory}/*"}, "name": {"$match": name}},
+        ]
+    else:
+        criteria["name"] = {"$match": name}
+
+    fields = ",".join(json.dumps(field) for field in AQL_FIELDS)
+    direction = "$desc" if sort_order == "desc" else "$asc"
+    return (
+        f"items.find({json.dumps(criteria)})"
+        f".include({fields})"
+        f'.sort({{"{direction}":["{sort_by}"]}})'
+        f".offset({offset}).limit({limit})"
+    )
+
+
+def aql_item_to_jf(item: Dict) -> Dict:
+    """Convert an AQL result item into the dict shape `jf rt s` prints."""
+    if item.get("path") in (None, "", "."):
+        path = f"{item.get('repo', '')}/{item.get('name', '')}"
+    else:
+        path = f"{item.get('repo', '')}/{item['path']}/{item.get('name', '')}"
+
+    artifact = {"path": path}
+    for key, value in item.items():
+        if key in ("repo", "path", "name"):
+            continue
+        artifact[AQL_TO_JF_KEYS.get(key, key)] = value
+    return artifact
+
+
+class HttpConnectionPool:
+    """A small thread-safe pool of keep-alive connections to one host."""
+
+    def __init__(
+        self,
+        base_url: str,
+        size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ArtifactoryHttpError(f"Unsupported URL scheme: {base_url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname or ""
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(
+            maxsize=size
+        )
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return a connection and whether it was reused from the pool."""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release(self, connection: http.client.HTTPConnection) -> None:
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send a request on a pooled connection, returning it and the response."""
+        url = f"{self.base_path}/{path.lstrip('/')}"
+
+        # A reused connection may have been closed by the server while idle,
+        # in which case retry exactly once on a fresh one.
+        for attempt in range(2):
+            connection, reused = self._acquire()
+            try:
+                connection.request(method, url, body=body, headers=headers)
+                return connection, connection.getresponse()
+            except STALE_CONNECTION_ERRORS as e:
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise ArtifactoryHttpError(
+                    f"Connection to {self.host} failed: {e}"
+                ) from e
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise ArtifactoryHttpError(f"Request to {self.host} failed: {e}") from e
+
+        raise ArtifactoryHttpError(f"Connection to {self.host} failed")
+
+    @contextmanager
+    def stream(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Iterator[http.client.HTTPResponse]:
+        """
+        Send a request and yield the response with its body still unread.
+
+        The connection only goes back to the pool if the body was read to the
+        end. Leaving early closes it instead, which aborts the transfer.
+        """
+        connection, response = self._send(method, path, body, dict(headers or {}))
+        completed = False
+        try:
+            yield response
+            completed = response.isclosed()
+        except (OSError, http.client.HTTPException) as e:
+            raise ArtifactoryHttpError(f"Reading from {self.host} failed: {e}") from e
+        finally:
+            if completed and not response.will_close:
+                self._release(connection)
+            else:
+                connection.close()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, bytes]:
+        """Send a request on a pooled connection and return (status, body)."""
+        with self.stream(method, path, body, headers) as response:
+            return response.status, response.read()
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ArtifactoryHttpBackend:
+    """Search and curl Artifactory over HTTP, mirroring the `jf rt` commands."""
+
+    def __init__(
+        self,
+        config: JFrogServerConfig,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.config = config
+        self.pool = HttpConnectionPool(
+            config.artifactory_url, size=pool_size, timeout=timeout
+        )
+        self.headers = {"Connection": "keep-alive"}
+        # Called with the size of each response body (or chunk of one) received
+        self.on_bytes: Optional[Callable[[int], None]] = None
+        auth = config.auth_header()
+        if auth:
+            self.headers["Authorization"] = auth
+
+    @classmethod
+    def from_jf_config(
+        cls, server_id: Optional[str] = None
+    ) -> Optional["ArtifactoryHttpBackend"]:
+        """Build a backend from the jf CLI config, or None if unavailable."""
+        config = load_jf_server_config(server_id)
+        if config is None:
+            return None
+        return cls(config)
+
+    def _received(self, nbytes: int) -> None:
+        if self.on_bytes is not None:
+            self.on_bytes(nbytes)
+
+    def _headers(self, content_type: Optional[str] = None) -> Dict[str, str]:
+        headers = dict(self.headers)
+        if content_type:
+            headers["Content-Type"] = content_type
+        return headers
+
+    def aql(self, query: str) -> Dict:
+        """Run a raw AQL query and return the decoded response."""
+        status, payload = self.pool.request(
+            "POST",
+            "api/search/aql",
+            body=query.encode(),
+            headers=self._headers("text/plain"),
+        )
+        self._received(len(payload))
+        if status != 200:
+            raise ArtifactoryHttpError(
+                f"AQL query failed with HTTP {status}: {payload[:200]!r}", status
+            )
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise ArtifactoryHttpError(f"Invalid AQL response: {e}", status) from e
+
+    def search(
+        self,
+        pattern: str,
+        sort_by: str = "created",
+        sort_order: str = "desc",
+        limit: int = 5,
+        offset: int = 0,
+    ) -> List[Dict]:
+        """Search for artifacts using a `jf rt s` style pattern."""
+        return list(self.iter_search(pattern, sort_by, sort_order, limit, offset))
+
+    def iter_search(
+        self,
+        pattern: str,
+        sort_by: str = "created",
+        sort_order: str = "desc",
+        limit: int = 5,
+        offset: int = 0,
+    ) -> Iterator[Dict]:
+        """
+        Search for artifacts, yielding each one as it is parsed off the socket.
+
+        Closing the iterator early drops the connection, so the rest of the
+        results are never transferred.
+        """
+        query = pattern_to_aql(pattern, sort_by, sort_order, limit, offset)
+        with self.pool.stream(
+            "POST",
+            "api/search/aql",
+            body=query.encode(),
+            headers=self._headers("text/plain"),
+        ) as response:
+            if response.status != 200:
+                raise ArtifactoryHttpError(
+                    f"AQL query failed with HTTP {response.status}: {response.read(200)!r}",
+                    response.status,
+                )
+            try:
+                chunks = iter_text(response, on_bytes=self._received)
+                for item in iter_json_array(chunks, key="results"):
+                    yield aql_item_to_jf(item)
+                # Drain the trailing "range" object so the connection is reusable
+                self._received(len(response.read()))
+            except ValueError as e:
+                raise ArtifactoryHttpError(
+                    f"Invalid AQL response: {e}", response.status
+                ) from e
+
+    def curl(self, endpoint: str, silent: bool = True) -> Tuple[bool, str]:
+        """GET an Artifactory REST endpoint, like `jf rt curl`."""
+        status, payload = self.pool.request("GET", endpoint, headers=self._headers())
+        self._received(len(payload))
+        return status < 400, payload.decode(errors="replace")
+
+    def close(self) -> None:
+        """Release pooled connections."""
+        self.pool.close()
@@ -0,0 +1,170 @@
+"""
+Local reverse index from digests to artifacts for the Artifactory Query Tool.
+
+Every query records the sha1 and sha256 of the artifacts it fetched, with the
+repo, item, tag or version and `created` time they belong to. During an
+incident, `--digest <sha>` then answers "which tags, charts or wheels, in which
+environments, point at this digest?" from the local index, in milliseconds and
+without touching Artifactory. A digest prefix (at least MIN_PREFIX hex
+characters) matches every digest starting with it.
+
+The index lives next to the result cache, in SQLite, keyed by digest so that
+prefix lookups are a range scan of the primary key. Writes are incremental:
+re-seeing an artifact refreshes it, and a path whose digest changed (a
+re-pushed tag) forgets the old one. `--compact-index` drops rows not seen for
+a while and reclaims the space.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from artifact_cache import default_cache_dir
+from artifact_records import ArtifactRecord, format_created
+
+MIN_PREFIX = 6
+DEFAULT_MAX_AGE_DAYS = 90  # rows not seen for this long are dropped on compaction
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS digests (
+    digest TEXT NOT NULL,
+    path TEXT NOT NULL,
+    artifact_type TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    item TEXT NOT NULL,
+    version TEXT NOT NULL,
+    created TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (digest, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS digests_by_path ON digests (path);
+"""
+
+
+class DigestEntry(NamedTuple):
+    """One artifact a digest points at."""
+
+    digest: str
+    artifact_type: str
+    repo: str
+    item: str
+    version: str
+    created: str
+    path: str
+
+    @property
+    def algorithm(self) -> str:
+        return "sha256" if len(self.digest) == 64 else "sha1"
+
+    def as_dict(self) -> Dict[str, str]:
+        return {**self._asdict(), "algorithm": self.algorithm}
+
+
+class CompactionResult(NamedTuple):
+    """What a compaction dropped and how much space it reclaimed."""
+
+    removed: int
+    remaining: int
+    bytes_before: int
+    bytes_after: int
+
+
+def normalise_digest(digest: str) -> str:
+    """Lower-case a digest, dropping a `sha256:`-style prefix; ValueError if invalid."""
+    digest = digest.strip().lower()
+    digest = digest.split(":", 1)[1] if ":" in digest else digest
+    if len(digest) < MIN_PREFIX or not set(digest) <= HEX_DIGITS:
+        raise ValueError(
+            f"Expected a hex digest or a prefix of at least {MIN_PREFIX} characters, "
+            f"got {digest!r}"
+        )
+    return digest
+
+
+class DigestIndex:
+    """SQLite-backed map from sha1/sha256 digests to the artifacts they identify."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_cache_dir() / "digests.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def add(self, artifact_type: str, records: Iterable[ArtifactRecord]) -> int:
+        """Index the digests of some records, returning how many were written."""
+        now = time.time()
+        rows = []
+        paths = []
+        for record in records:
+            digests = [d.lower() for d in (record.sha, record.sha256) if d]
+            if not digests:
+                continue
+            paths.append((record.path, *digests))
+            created = format_created(record.created)
+            rows.extend(
+                (
+                    digest,
+                    record.path,
+                    artifact_type,
+                    record.repo,
+                    record.item,
+                    record.version,
+                    created,
+                    now,
+                )
+                for digest in digests
+            )
+        if not rows:
+            return 0
+
+        with self._lock, self._db:
+            # A path now pointing at other digests (a re-pushed tag) drops the old ones
+            for path, *digests in paths:
+                placeholders = ",".join("?" * len(digests))
+                self._db.execute(
+                    f"DELETE FROM digests WHERE path = ? AND digest NOT IN ({placeholders})",
+                    (path, *digests),
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def lookup(self, digest: str) -> List[DigestEntry]:
+        """Return every artifact whose digest starts with `digest`, newest first."""
+        prefix = normalise_digest(digest)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT digest, artifact_type, repo, item, version, created, path "
+                "FROM digests WHERE digest >= ? AND digest < ? "
+                "ORDER BY created DESC, repo, path",
+                # Every hex digit sorts before "g", so this is a prefix match
+                (prefix, prefix + "g"),
+            ).fetchall()
+        return [DigestEntry(*row) for row in rows]
+
+    def compact(self, max_age_days: float = DEFAULT_MAX_AGE_DAYS) -> CompactionResult:
+        """Drop rows not seen for `max_age_days`, then vacuum the database."""
+        bytes_before = os.path.getsize(self.path)
+        with self._lock:
+            with self._db:
+                removed = self._db.execute(
+                    "DELETE FROM digests WHERE seen_at < ?",
+                    (time.time() - max_age_days * 86400,),
+                ).rowcount
+            self._db.execute("ANALYZE")
+            self._db.execute("VACUUM")
+            (remaining,) = self._db.execute("SELECT COUNT(*) FROM digests").fetchone()
+        return CompactionResult(
+            removed, remaining, bytes_before, os.path.getsize(self.path)
+        )
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
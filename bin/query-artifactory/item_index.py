@@ -0,0 +1,131 @@
+"""
+Item-name completion index for the Artifactory Query Tool.
+
+Tab completion has to answer in a few milliseconds, so it can't search
+Artifactory, or even import much. The item names of each repo (its top-level
+folders: images, charts, packages) are kept per artifact type and environment
+in a sorted text file under the cache directory, e.g. `items/docker-dev.txt`:
+
+    #2025-01-02T10:00:00.000Z
+    data-platform-validation
+    sre-libs
+    ...
+
+The first line is the high-water mark, the newest folder `created` time seen.
+`complete()` reads the file and scans it for the prefix. This module only
+imports os and sys, and `query_artifactory.py complete` loads it before
+anything else, so completing a name costs little more than starting the
+interpreter.
+
+`ArtifactoryQueryTool.list_items` fills the index: one AQL request lists every
+top-level folder, and later refreshes ask only for folders created since the
+mark, which are merged in. Deleted items stay until the index is rebuilt.
+"""
+
+import os
+import sys
+
+# Annotations use builtin generics: importing typing would take longer than
+# the whole completion
+
+ITEM_TYPES = ("docker", "helm", "pypi")
+
+
+def default_index_dir() -> str:
+    """Return the index directory, in the same XDG cache directory as the result cache."""
+    # Not artifact_cache.default_cache_dir, which would import sqlite3 and pathlib
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "query-artifactory", "items")
+
+
+class ItemIndex:
+    """The sorted item names of one repo (artifact type and environment)."""
+
+    def __init__(self, artifact_type: str, environment: str, directory: str = ""):
+        self.path = os.path.join(
+            directory or default_index_dir(), f"{artifact_type}-{environment}.txt"
+        )
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> tuple[str, list[str]]:
+        """Return the high-water mark and the sorted names ("" and [] if not built)."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return "", []
+        if lines and lines[0].startswith("#"):
+            return lines[0][1:], lines[1:]
+        return "", lines
+
+    def complete(self, prefix: str, limit: int = 0) -> list[str]:
+        """Return the names starting with `prefix`, in order (at most `limit`, if set)."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return []
+        # Names are sorted, so the matches are the lines after the first one
+        # that starts with the prefix; every name follows a newline, since the
+        # file starts with the high-water mark. Searching the text like this
+        # beats splitting it into a list to bisect
+        matches = []
+        position = text.find("\n" + prefix) + 1
+        while 0 < position < len(text):
+            end = text.find("\n", position)
+            if end < 0:
+                end = len(text)
+            name = text[position:end]
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+            if len(matches) == limit:
+                break
+            position = end + 1
+        return matches
+
+    def save(self, high_water: str, names: list[str]) -> None:
+        """Replace the index with these names, atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(f"#{high_water}\n")
+            f.writelines(f"{name}\n" for name in sorted(set(names)))
+        os.replace(temporary, self.path)
+
+    def merge(self, high_water: str, names: list[str]) -> int:
+        """Add names found since the last refresh, returning how many were new."""
+        current_mark, current = self.load()
+        added = set(names).difference(current)
+        self.save(max(current_mark, high_water), current + list(added))
+        return len(added)
+
+
+def complete_main(argv: list[str]) -> int:
+    """
+    `query_artifactory.py complete PREFIX [TYPE] [ENVIRONMENT]`
+
+    Prints the indexed item names starting with PREFIX, one per line, for
+    shell completion. TYPE defaults to docker and ENVIRONMENT to dev.
+    Never touches the network; prints nothing if the index isn't built yet.
+    """
+    if not argv or argv[0] in ("-h", "--help") or len(argv) > 3:
+        print(
+            "usage: query_artifactory.py complete PREFIX [TYPE] [ENVIRONMENT]",
+            file=sys.stderr,
+        )
+        return 0 if argv[:1] in (["-h"], ["--help"]) else 2
+    prefix = argv[0]
+    artifact_type = argv[1] if len(argv) > 1 else "docker"
+    environment = argv[2] if len(argv) > 2 else "dev"
+    if artifact_type not in ITEM_TYPES:
+        print(f"complete: unknown artifact type {artifact_type!r}", file=sys.stderr)
+        return 2
+    names = ItemIndex(artifact_type, environment).complete(prefix)
+    if names:
+        sys.stdout.write("\n".join(names) + "\n")
+    return 0
@@ -0,0 +1,101 @@
+"""
+Incremental JSON array parsing for the Artifactory Query Tool.
+
+Search results can run to many megabytes. Rather than buffering the whole
+body and calling `json.loads`, these helpers decode one array element at a
+time as text arrives from a pipe or socket, so memory use depends on the size
+of a single artifact rather than the whole result set.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = " \t\r\n,"
+
+
+def iter_text(
+    stream: BinaryIO,
+    chunk_size: int = CHUNK_SIZE,
+    on_bytes: Optional[Callable[[int], None]] = None,
+) -> Iterator[str]:
+    """
+    Read a binary stream as UTF-8 text in chunks.
+
+    Uses `read1` where the stream has it, so whatever has arrived so far is
+    returned straight away instead of blocking until a whole chunk is in.
+    `on_bytes`, if given, is called with the size of each raw chunk read.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    read = getattr(stream, "read1", stream.read)
+    while True:
+        data = read(chunk_size)
+        if not data:
+            break
+        if on_bytes is not None:
+            on_bytes(len(data))
+        yield decoder.decode(data)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_json_array(chunks: Iterable[str], key: Optional[str] = None) -> Iterator[Any]:
+    """
+    Yield the elements of a JSON array as they arrive in text chunks.
+
+    With `key`, the array is the value of that key in the top-level object
+    (e.g. "results" in an AQL response), and anything after it is ignored.
+    Input without the array at all (e.g. empty output) yields nothing;
+    malformed or truncated input raises ValueError.
+    """
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+
+    def read_more() -> bool:
+        nonlocal buffer, pos
+        for chunk in chunks:
+            if chunk:
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                return True
+        return False
+
+    # Find the opening bracket of the array
+    start = re.compile(r"\[" if key is None else rf'"{re.escape(key)}"\s*:\s*\[')
+    while True:
+        match = start.search(buffer, pos)
+        if match:
+            pos = match.end()
+            break
+        if not read_more():
+            return
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in _SEPARATORS:
+            pos += 1
+        if pos == len(buffer):
+            if not read_more():
+                raise ValueError("Unterminated JSON array")
+            continue
+        if buffer[pos] == "]":
+            return
+
+        try:
+            value, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Most likely the element is split across chunks
+            if not read_more():
+                raise
+            continue
+        if end == len(buffer) and not isinstance(value, (dict, list)):
+            # A scalar at the end of the buffer may continue in the next chunk
+            if read_more():
+                continue
+        pos = end
+        yield value
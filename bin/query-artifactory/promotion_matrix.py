@@ -0,0 +1,79 @@
+"""
+Cross-environment promotion view for the Artifactory Query Tool.
+
+Results of the same query in several environments are joined by version
+(Docker tag, chart or package version) and sha1, so one row shows where a
+build has been promoted to and when it arrived in each environment. The same
+version with different digests in two environments gets a row per digest,
+which makes a rebuilt-rather-than-promoted tag stand out.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Sequence, Tuple
+
+from artifact_records import UNKNOWN_CREATED, ArtifactRecord, format_created
+
+MISSING = "-"
+
+
+@dataclass
+class PromotionRow:
+    """One version/digest and when it was created in each environment."""
+
+    version: str
+    sha: str
+    created: Dict[str, datetime] = field(default_factory=dict)
+
+    @property
+    def newest(self) -> datetime:
+        return max(self.created.values(), default=UNKNOWN_CREATED)
+
+    def present_in(self, environments: Sequence[str]) -> bool:
+        """True if this version/digest exists in every one of the environments."""
+        return all(environment in self.created for environment in environments)
+
+
+def build_promotion_matrix(
+    results: Dict[str, List[ArtifactRecord]],
+) -> List[PromotionRow]:
+    """Join per-environment results by version and sha1, newest first."""
+    rows: Dict[Tuple[str, str], PromotionRow] = {}
+    for environment, records in results.items():
+        for record in records:
+            key = (record.version, record.sha)
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = PromotionRow(record.version, record.sha)
+            current = row.created.get(environment)
+            if current is None or record.created > current:
+                row.created[environment] = record.created
+    return sorted(rows.values(), key=lambda row: row.newest, reverse=True)
+
+
+def format_promotion_matrix(
+    rows: List[PromotionRow], environments: Sequence[str]
+) -> List[str]:
+    """Render the matrix as aligned text lines, header first."""
+    header = ["version", "sha", *environments]
+    table = [header]
+    for row in rows:
+        table.append(
+            [
+                row.version,
+                row.sha[:8],
+                *(
+                    format_created(row.created[environment]) or "?"
+                    if environment in row.created
+                    else MISSING
+                    for environment in environments
+                ),
+            ]
+        )
+    widths = [max(len(line[column]) for line in table) for column in range(len(header))]
+    return [
+        "  ".join(
+            cell.ljust(width) for cell, width in zip(line, widths, strict=True)
+        ).rstrip()
+        for line in table
+    ]
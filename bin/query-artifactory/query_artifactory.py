@@ -5,8 +5,9 @@ Artifactory Query Tool
 Makes searching Artifactory a little less painful. Requires the jf client
 to be installed and configured (that is now part of the dev-container setup).
 
-The tool now recursively calls the Artifactory API until it finds the requested
-number of tags that match the specified length criteria (default: 7 characters).
+Docker tags are found with a single AQL request for the tag manifests, filtered
+to the specified length (default: 7 characters). If AQL isn't available the tool
+recursively calls the Artifactory API until it finds enough matching tags.
 
 Usage:
     # Return the 5 most recent Docker tags for data-platform-validation:
@@ -23,74 +24,327 @@ Usage:
 
     # Return more results:
     ./query_artifactory.py data-platform-validation docker --limit 10
+
+    # Complete an item name from the local index (see --index-items):
+    ./query_artifactory.py complete data-pl docker
 """
 
-import argparse
-import json
-import subprocess
 import sys
-from pathlib import Path
-from typing import Dict, List, Tuple
 
-# Initialize logger
-from lib.dexcom_logging import DexcomLogging
+# Shell completion is answered from the on-disk item index before anything
+# else is imported, see item_index.py
+if __name__ == "__main__" and sys.argv[1:2] == ["complete"]:
+    from item_index import complete_main
 
-logger = DexcomLogging(name="query-artifactory", log_to_file=False).get_logger()
+    sys.exit(complete_main(sys.argv[2:]))
 
-try:
-    from colorama import Fore, Style, init as colorama_init
+import argparse
+import functools
+import os
+import posixpath
+import threading
+import time
+from collections import deque
+from contextlib import closing, nullcontext
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from artifact_records import (
+    ArtifactRecord,
+    format_created,
+    helm_chart_version,
+    newest_artifacts,
+    top_records,
+    wheel_version,
+)
+from query_metrics import Metrics
+
+# Everything else is imported where it's first needed, so that `--help`, shell
+# completion and cache hits don't pay for logging setup, colorama, the HTTP
+# stack or SQLite. `make startup` checks this stays true (see startup_benchmark.py).
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from artifact_cache import ArtifactCache
+    from pathlib import Path
+
+    from artifactory_http import ArtifactoryHttpBackend
+    from digest_index import DigestIndex
+    from record_output import RecordWriter
+
+
+class _LazyLogger:
+    """Sets up DexcomLogging the first time something is actually logged."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr: str) -> Any:
+        with self._lock:
+            if self._logger is None:
+                from lib.dexcom_logging import DexcomLogging
+
+                self._logger = DexcomLogging(
+                    name=self._name, log_to_file=False
+                ).get_logger()
+        return getattr(self._logger, attr)
+
+
+logger = _LazyLogger("query-artifactory")
+
+
+class _NoColor:
+    """Fallback for colorama's Fore and Style if colorama is not available."""
+
+    GREEN = ""
+    YELLOW = ""
+    RED = ""
+    CYAN = ""
+    BRIGHT = ""
+    RESET_ALL = ""
+
+
+_colors: Optional[Tuple[bool, Any, Any]] = None
+
+
+def colors() -> Tuple[bool, Any, Any]:
+    """Import and initialise colorama on first use; returns (available, Fore, Style)."""
+    global _colors
+    if _colors is None:
+        try:
+            from colorama import Fore, Style, init as colorama_init
 
-    colorama_init(autoreset=True)
-    HAS_COLORAMA = True
-except ImportError as e:
-    logger.error(f"Colorama import error: {e}")
-    HAS_COLORAMA = False
+            colorama_init(autoreset=True)
+            _colors = (True, Fore, Style)
+        except ImportError as e:
+            logger.error(f"Colorama import error: {e}")
+            _colors = (False, _NoColor, _NoColor)
+    return _colors
 
-    # Fallback if colorama is not available
-    class Fore:
-        GREEN = ""
-        YELLOW = ""
-        RED = ""
-        CYAN = ""
 
-    class Style:
-        BRIGHT = ""
-        RESET_ALL = ""
+COMMAND_TIMEOUT = 30  # seconds
 
 
 class JFrogClient:
-    """Client for interacting with JFrog CLI."""
+    """
+    Client for interacting with JFrog CLI.
+
+    If an HTTP backend is given, searches and curls go straight to the
+    Artifactory API over pooled keep-alive connections, and the `jf rt`
+    subprocess path is only used as a fallback when that backend fails.
+    """
 
-    def __init__(self):
+    def __init__(self, http_backend: Optional["ArtifactoryHttpBackend"] = None):
         self.base_command = ["jf", "rt"]
+        self.http_backend = http_backend
+        self.metrics = Metrics()
+        self._in_flight = nullcontext()
+        from resilience import DEFAULT_MAX_RETRIES, CircuitBreaker
+
+        self.command_timeout = COMMAND_TIMEOUT
+        self.max_retries = DEFAULT_MAX_RETRIES
+        self.hedge = True  # duplicate jf commands slower than the recent p95
+        self.breaker = CircuitBreaker()
+        if http_backend is not None:
+            http_backend.on_bytes = self._http_bytes_received
+
+    def _http_bytes_received(self, nbytes: int) -> None:
+        self.metrics.count("bytes_received", nbytes, backend="http")
+
+    def set_max_in_flight(self, max_in_flight: Optional[int]) -> None:
+        """Limit how many Artifactory requests may run at once (None for no limit)."""
+        if max_in_flight:
+            self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        else:
+            self._in_flight = nullcontext()
+
+    @classmethod
+    def create(
+        cls, backend: str = "auto", server_id: Optional[str] = None
+    ) -> "JFrogClient":
+        """
+        Build a client for the requested backend.
+
+        "cli" always shells out to jf, "http" requires a usable jf server config
+        and "auto" uses HTTP when that config is available, otherwise jf.
+        """
+        if backend == "cli":
+            return cls()
+
+        from artifactory_http import ArtifactoryHttpBackend, ArtifactoryHttpError
+
+        http_backend = ArtifactoryHttpBackend.from_jf_config(server_id)
+        if http_backend is None:
+            if backend == "http":
+                raise ArtifactoryHttpError(
+                    "No usable jf server config found for the HTTP backend"
+                )
+            logger.debug("No usable jf server config, using the jf CLI backend")
+        return cls(http_backend)
+
+    def _run_command(self, command: List[str]) -> str:
+        """
+        Run a JFrog CLI command and return its output.
+
+        A run slower than the recent p95 is hedged with a duplicate, and a
+        failed one is retried after a jittered backoff, all within
+        `command_timeout`. Failures raise `JFrogCommandError` rather than
+        returning empty output, and while jf keeps failing the circuit
+        breaker refuses commands straight away.
+        """
+        from resilience import CommandAttempts, JFrogCommandError
+
+        op = command[2] if len(command) > 2 else "unknown"
+        deadline = time.monotonic() + self.command_timeout
+        attempts = CommandAttempts(
+            " ".join(command), self.breaker, self.max_retries, deadline
+        )
+        while True:
+            try:
+                attempts.begin()
+            except JFrogCommandError:
+                self.metrics.observe("command", 0.0, op=op, outcome="circuit_open")
+                raise
+            try:
+                output = self._run_attempt(command, op, deadline)
+            except JFrogCommandError as e:
+                delay = attempts.failed(e)
+                logger.warning(f"{e}; retrying in {delay:.2f}s")
+                self.metrics.count("command_retries", op=op)
+                time.sleep(delay)
+                continue
+            attempts.succeeded()
+            return output
+
+    def _run_attempt(self, command: List[str], op: str, deadline: float) -> str:
+        """Run one attempt at a command, hedged if it's slow; returns its stdout."""
+        import queue
+        import subprocess
+
+        from resilience import HEDGE_MIN_SAMPLES, JFrogCommandError, hedge_delay
+
+        finished: "queue.Queue[Tuple[str, subprocess.Popen, str, str]]" = queue.Queue()
+        running: List[subprocess.Popen] = []
+
+        def launch(role: str) -> None:
+            process = subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            )
+            running.append(process)
+
+            def wait() -> None:
+                stdout, stderr = process.communicate()
+                finished.put((role, process, stdout, stderr))
+
+            threading.Thread(target=wait, name=f"jf-{role}", daemon=True).start()
+
+        hedge_at = None
+        if self.hedge:
+            p95 = self.metrics.quantile(
+                "command", 0.95, HEDGE_MIN_SAMPLES, op=op, outcome="ok"
+            )
+            hedge_at = time.monotonic() + hedge_delay(p95)
 
-    def _run_command(self, command: List[str]) -> Tuple[bool, str]:
-        """Run a JFrog CLI command and return success status and output."""
+        outcome = "error"
+        start = time.perf_counter()
         try:
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=30,  # 30 second timeout
-            )
-            return True, result.stdout
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Error running command {' '.join(command)}: {e.stderr}")
-            return False, ""
-        except subprocess.TimeoutExpired:
-            logger.error(f"Command timed out: {' '.join(command)}")
-            return False, ""
-        except FileNotFoundError:
-            logger.error("Error: 'jf' command not found. Please install JFrog CLI.")
-            return False, ""
-
-    def curl(self, endpoint: str, silent: bool = True) -> Tuple[bool, str]:
-        """Execute a JFrog RT curl command."""
-        command = self.base_command + ["curl", endpoint]
-        if silent:
-            command.append("--silent")
-        return self._run_command(command)
+            try:
+                launch("primary")
+            except FileNotFoundError as e:
+                outcome = "not_found"
+                raise JFrogCommandError(
+                    "'jf' command not found. Please install JFrog CLI.", outcome
+                ) from e
+
+            pending = 1
+            stderr = ""
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    outcome = "timeout"
+                    raise JFrogCommandError(
+                        f"Command timed out: {' '.join(command)}", outcome
+                    )
+                wake = deadline if hedge_at is None else min(deadline, hedge_at)
+                try:
+                    role, process, stdout, stderr = finished.get(timeout=wake - now)
+                except queue.Empty:
+                    if hedge_at is not None and time.monotonic() >= hedge_at:
+                        # Maybe stuck on a bad node; a second try may get a good one
+                        logger.debug(f"Hedging slow command: {' '.join(command)}")
+                        self.metrics.count("command_hedges", op=op)
+                        hedge_at = None
+                        launch("hedge")
+                        pending += 1
+                    continue
+
+                pending -= 1
+                if process.returncode == 0:
+                    outcome = "ok" if role == "primary" else "hedged"
+                    self.metrics.count("bytes_received", len(stdout), backend="cli")
+                    return stdout
+
+            raise JFrogCommandError(
+                f"Error running command {' '.join(command)}: {stderr.strip()}", outcome
+            )
+        finally:
+            # Whichever run lost (or everything, on timeout) isn't needed any more
+            for process in running:
+                if process.poll() is None:
+                    process.kill()
+            self.metrics.observe(
+                "command", time.perf_counter() - start, op=op, outcome=outcome
+            )
+
+    def _decode(self, output: str, op: str) -> Any:
+        """Decode jf's JSON output; raises json.JSONDecodeError."""
+        import json
+
+        with self.metrics.timer("decode", op=op):
+            return json.loads(output)
+
+    def curl(self, endpoint: str, silent: bool = True) -> str:
+        """
+        Execute a JFrog RT curl command and return the response body.
+
+        Like `_run_command`, failures raise `JFrogCommandError`.
+        """
+        with self._in_flight:
+            if self.http_backend is not None:
+                from artifactory_http import ArtifactoryHttpError
+                from resilience import JFrogCommandError
+
+                try:
+                    with self.metrics.timer("request", op="curl", backend="http"):
+                        ok, output = self.http_backend.curl(endpoint, silent)
+                except ArtifactoryHttpError as e:
+                    logger.warning(f"HTTP backend failed, falling back to jf CLI: {e}")
+                else:
+                    if not ok:
+                        raise JFrogCommandError(
+                            f"GET {endpoint} failed: {output.strip()[:200]}", "error"
+                        )
+                    return output
+
+            command = self.base_command + ["curl", endpoint]
+            if silent:
+                command.append("--silent")
+            with self.metrics.timer("request", op="curl", backend="cli"):
+                return self._run_command(command)
 
     def search(
         self,
@@ -101,7 +355,96 @@ class JFrogClient:
         offset: int = 0,
     ) -> List[Dict]:
         """Search for artifacts using a pattern."""
-        command = self.base_command + [
+        with self._in_flight:
+            if self.http_backend is not None:
+                from artifactory_http import ArtifactoryHttpError
+
+                try:
+                    with self.metrics.timer("request", op="search", backend="http"):
+                        artifacts = self.http_backend.search(
+                            pattern, sort_by, sort_order, limit, offset
+                        )
+                    self.metrics.count("artifacts_parsed", len(artifacts), op="search")
+                    return artifacts
+                except ArtifactoryHttpError as e:
+                    logger.warning(f"HTTP backend failed, falling back to jf CLI: {e}")
+
+            import json
+
+            command = self._search_command(pattern, sort_by, sort_order, limit, offset)
+            with self.metrics.timer("request", op="search", backend="cli"):
+                output = self._run_command(command)
+                try:
+                    artifacts = self._decode(output, "search")
+                except json.JSONDecodeError:
+                    logger.error("Error parsing JSON response for search")
+                    return []
+            self.metrics.count("artifacts_parsed", len(artifacts), op="search")
+            return artifacts
+
+    def iter_search(
+        self,
+        pattern: str,
+        sort_by: str = "created",
+        sort_order: str = "desc",
+        limit: int = 5,
+        offset: int = 0,
+    ) -> Iterator[Dict]:
+        """
+        Search for artifacts, yielding each one as soon as it has been parsed.
+
+        Closing the iterator early (use `contextlib.closing`) kills the jf
+        process or drops the HTTP connection, so the rest of the results are
+        never transferred or parsed.
+        """
+        with self._in_flight:
+            if self.http_backend is not None:
+                from artifactory_http import ArtifactoryHttpError
+
+                yielded = 0
+                start = time.perf_counter()
+                try:
+                    for artifact in self.http_backend.iter_search(
+                        pattern, sort_by, sort_order, limit, offset
+                    ):
+                        yielded += 1
+                        yield artifact
+                    return
+                except ArtifactoryHttpError as e:
+                    if yielded:
+                        # Falling back now would repeat what was already yielded
+                        logger.error(f"HTTP search failed part way through: {e}")
+                        return
+                    logger.warning(f"HTTP backend failed, falling back to jf CLI: {e}")
+                finally:
+                    self.metrics.observe(
+                        "request",
+                        time.perf_counter() - start,
+                        op="iter_search",
+                        backend="http",
+                    )
+                    self.metrics.count("artifacts_parsed", yielded, op="iter_search")
+
+            command = self._search_command(pattern, sort_by, sort_order, limit, offset)
+            yielded = 0
+            start = time.perf_counter()
+            try:
+                for artifact in self._stream_command(command):
+                    yielded += 1
+                    yield artifact
+            finally:
+                self.metrics.observe(
+                    "request",
+                    time.perf_counter() - start,
+                    op="iter_search",
+                    backend="cli",
+                )
+                self.metrics.count("artifacts_parsed", yielded, op="iter_search")
+
+    def _search_command(
+        self, pattern: str, sort_by: str, sort_order: str, limit: int, offset: int
+    ) -> List[str]:
+        return self.base_command + [
             "s",
             f"--sort-by={sort_by}",
             f"--sort-order={sort_order}",
@@ -110,83 +453,429 @@ class JFrogClient:
             pattern,
         ]
 
-        success, output = self._run_command(command)
-        if not success:
-            return []
+    def _stream_command(self, command: List[str]) -> Iterator[Dict]:
+        """
+        Run a JFrog CLI command and yield the elements of its JSON output.
+
+        Raises `JFrogCommandError` if the command fails before yielding
+        anything (or the circuit breaker is open); a failure part way through
+        is logged, since the caller has already used what came before.
+        """
+        import subprocess
+        import tempfile
+
+        from json_stream import iter_json_array, iter_text
+        from resilience import JFrogCommandError
+
+        op = command[2] if len(command) > 2 else "unknown"
+        if not self.breaker.allow():
+            self.metrics.observe("command", 0.0, op=op, outcome="circuit_open")
+            raise JFrogCommandError(
+                f"Not running {' '.join(command)}: jf keeps failing", "circuit_open"
+            )
 
+        stderr = tempfile.TemporaryFile(mode="w+")
+        start = time.perf_counter()
         try:
-            return json.loads(output)
-        except json.JSONDecodeError:
-            logger.error("Error parsing JSON response for search")
-            return []
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        except FileNotFoundError as e:
+            stderr.close()
+            self.breaker.release()
+            raise JFrogCommandError(
+                "'jf' command not found. Please install JFrog CLI.", "not_found"
+            ) from e
+
+        timed_out = threading.Event()
+
+        def kill_on_timeout() -> None:
+            timed_out.set()
+            process.kill()
+
+        def bytes_received(nbytes: int) -> None:
+            self.metrics.count("bytes_received", nbytes, backend="cli")
+
+        timer = threading.Timer(self.command_timeout, kill_on_timeout)
+        timer.start()
+        finished = False
+        yielded = 0
+        outcome = "stopped"
+        failure = ""
+        try:
+            for artifact in iter_json_array(
+                iter_text(process.stdout, on_bytes=bytes_received)
+            ):
+                yielded += 1
+                yield artifact
+            finished = True
+        except ValueError:
+            if not timed_out.is_set():
+                outcome = "error"
+                failure = "Error parsing JSON response for search"
+        finally:
+            if not finished and process.poll() is None:
+                # Stopped early, so don't make jf finish the search
+                process.kill()
+            process.wait()
+            timer.cancel()
+            process.stdout.close()
+            if timed_out.is_set():
+                outcome = "timeout"
+                failure = f"Command timed out: {' '.join(command)}"
+            elif finished and process.returncode != 0:
+                outcome = "error"
+                stderr.seek(0)
+                failure = f"Error running command {' '.join(command)}: {stderr.read()}"
+            elif finished:
+                outcome = "ok"
+            stderr.close()
+            if outcome in ("timeout", "error"):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self.metrics.observe(
+                "command", time.perf_counter() - start, op=op, outcome=outcome
+            )
 
+        if failure:
+            if not yielded:
+                raise JFrogCommandError(failure, outcome)
+            logger.error(failure)
+
+    def aql(self, query: str) -> Optional[Dict]:
+        """
+        Run a raw AQL query.
+
+        Returns the decoded response, or None if AQL isn't available (request
+        failed, or Artifactory answered with an error instead of results), so
+        callers can fall back to paging through searches.
+        """
+        with self._in_flight:
+            if self.http_backend is not None:
+                from artifactory_http import ArtifactoryHttpError
+
+                try:
+                    with self.metrics.timer("request", op="aql", backend="http"):
+                        response = self.http_backend.aql(query)
+                    self._count_aql_results(response)
+                    return response
+                except ArtifactoryHttpError as e:
+                    logger.warning(f"HTTP backend failed, falling back to jf CLI: {e}")
+
+            import json
+
+            from resilience import JFrogCommandError
+
+            command = self.base_command + [
+                "curl",
+                "-XPOST",
+                "/api/search/aql",
+                "-H",
+                "Content-Type: text/plain",
+                "-d",
+                query,
+                "--silent",
+            ]
+            with self.metrics.timer("request", op="aql", backend="cli"):
+                try:
+                    output = self._run_command(command)
+                except JFrogCommandError as e:
+                    logger.warning(f"AQL query failed: {e}")
+                    return None
+                try:
+                    response = self._decode(output, "aql")
+                except json.JSONDecodeError:
+                    logger.error("Error parsing JSON response for AQL query")
+                    return None
+
+            if not isinstance(response, dict) or "results" not in response:
+                logger.debug(f"AQL query rejected: {output[:200]}")
+                return None
+            self._count_aql_results(response)
+            return response
+
+    def _count_aql_results(self, response: Dict) -> None:
+        if isinstance(response, dict):
+            results = response.get("results", [])
+            self.metrics.count("artifacts_parsed", len(results), op="aql")
+
+
+# Files that mark a Docker tag folder: a single image manifest, or a manifest
+# list for multi-arch images
+DOCKER_MANIFEST_NAMES = ["manifest.json", "list.manifest.json"]
+
+
+def docker_tags_aql(
+    repo: str,
+    item_name: str,
+    tag_length: int,
+    limit: int,
+    created_after: Optional[str] = None,
+) -> str:
+    """Build an AQL query returning one manifest per fixed-length tag, newest first."""
+    import json
+
+    from artifactory_http import AQL_FIELDS
+
+    criteria = {
+        "repo": repo,
+        "type": "file",
+        "path": {"$match": f"{item_name}/{'?' * tag_length}"},
+        "$or": [{"name": name} for name in DOCKER_MANIFEST_NAMES],
+    }
+    if created_after:
+        criteria["created"] = {"$gte": created_after}
+    fields = ",".join(json.dumps(field) for field in AQL_FIELDS)
+    return (
+        f"items.find({json.dumps(criteria)})"
+        f".include({fields})"
+        '.sort({"$desc":["created"]})'
+        f".limit({limit})"
+    )
 
-class ArtifactoryQueryTool:
-    """Main tool for querying Artifactory."""
 
-    def __init__(self, environment: str = "dev"):
-        self.client = JFrogClient()
+def item_folders_aql(repo: str, created_after: Optional[str] = None) -> str:
+    """Build an AQL query listing a repo's top-level folders (its item names)."""
+    import json
+
+    criteria = {"repo": repo, "type": "folder", "depth": 1}
+    if created_after:
+        criteria["created"] = {"$gte": created_after}
+    return f'items.find({json.dumps(criteria)}).include("name","created")'
+
+
+# Page sizes for paged Docker tag discovery, in artifacts
+FIRST_PAGE_SIZE = 100
+DEFAULT_MIN_PAGE_SIZE = 10
+DEFAULT_MAX_PAGE_SIZE = 1000
+# Safety cap on the artifacts looked at by one paged or streamed Docker search
+DEFAULT_MAX_SCAN = 5000
+# First page of a --watch poll, which usually finds nothing new
+WATCH_FIRST_PAGE_SIZE = 10
+
+
+def adaptive_page_size(
+    found: int,
+    wanted: int,
+    scanned: int,
+    current: int,
+    min_size: int = DEFAULT_MIN_PAGE_SIZE,
+    max_size: int = DEFAULT_MAX_PAGE_SIZE,
+) -> int:
+    """
+    Size the next search page from the density of matching tags seen so far.
+
+    Until a matching tag turns up the page size doubles. After that, the next
+    page is sized to hold the `wanted - found` tags still missing at the
+    observed tags-per-artifact rate, plus a quarter for headroom, so pages grow
+    while matches are sparse and shrink as the limit comes within reach.
+    """
+    if found == 0 or scanned == 0:
+        size = current * 2
+    else:
+        size = int((wanted - found) * scanned / found * 1.25) + 1
+    return max(min_size, min(max_size, size))
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one query in a batch."""
+
+    item_name: str
+    artifact_type: str
+    results: List[ArtifactRecord]
+    error: Optional[str] = None
+
+
+@dataclass
+class EnvironmentResult:
+    """Outcome of one environment's query in a cross-environment query."""
+
+    environment: str
+    results: List[ArtifactRecord]
+    error: Optional[str] = None
+
+
+def _timed_query(artifact_type: str) -> Callable:
+    """Record the latency of a query method under the `query` timer."""
+
+    def decorate(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def timed(self: "ArtifactoryQueryTool", *args, **kwargs):
+            with self.metrics.timer("query", type=artifact_type):
+                return method(self, *args, **kwargs)
+
+        return timed
+
+    return decorate
+
+
+# Tool attributes that configure queries, copied by `for_environment`
+QUERY_SETTINGS = (
+    "use_aql",
+    "prefetch_depth",
+    "min_page_size",
+    "max_page_size",
+    "max_scan",
+    "version_scan",
+    "stream_search",
+    "cache",
+    "refresh_cache",
+    "digest_index",
+    "on_candidate",
+)
+
+
+class QueryPlanner:
+    """
+    The settings of a query tool and the steps of a query that need no requests.
+
+    Deciding what to fetch (the cache plan, page sizes, when to stop paging)
+    and turning what was fetched into ranked records is the same whether the
+    requests are made synchronously or on an event loop. `ArtifactoryQueryTool`
+    is a planner with a `JFrogClient`; `AsyncArtifactoryQueryTool` (see
+    artifactory_async.py) has one alongside its `AsyncJFrogClient`.
+    """
+
+    def __init__(self, environment: str, metrics: Metrics):
         self.environment = environment
+        # Shared by every query on the tool, normally the client's registry
+        self.metrics = metrics
         self.docker_repo = f"dexcom-docker-{environment}-virtual"
         self.helm_repo = f"dexcom-helm-{environment}-virtual"
         self.pypi_repo = f"dexcom-pypi-{environment}-local"
+        self.use_aql = True
+        self.prefetch_depth = 4
+        self.min_page_size = DEFAULT_MIN_PAGE_SIZE
+        self.max_page_size = DEFAULT_MAX_PAGE_SIZE
+        self.max_scan = DEFAULT_MAX_SCAN
+        # Helm/PyPI artifacts ranked by version; None means all (up to max_scan)
+        self.version_scan: Optional[int] = None
+        self.stream_search = False
+        self.cache: Optional["ArtifactCache"] = None
+        self.refresh_cache = False
+        self.digest_index: Optional["DigestIndex"] = None
+        # Called with (artifact_type, record) for each Docker tag as it's found
+        self.on_candidate: Optional[Callable[[str, ArtifactRecord], None]] = None
+
+    def _copy_settings(self, other: "QueryPlanner") -> None:
+        """Give another planner (or tool) this one's settings."""
+        for setting in QUERY_SETTINGS:
+            setattr(other, setting, getattr(self, setting))
+
+    def _cache_plan(
+        self, key: str, limit: int
+    ) -> Generator[Optional[str], Dict[str, Dict], List[Dict]]:
+        """
+        The steps of a tool's `_cached_query`, without doing any fetching itself.
+
+        Yields the `created_after` to fetch from (None for everything), is
+        sent back what was fetched, and returns the newest `limit` artifacts.
+        Keeping it free of I/O lets the async tool drive the same logic.
+        """
+        if self.cache is None:
+            return newest_artifacts((yield None), limit)
+
+        entry = None if self.refresh_cache else self.cache.get(key)
+        if entry is not None and entry.covers(limit):
+            if entry.is_fresh(self.cache.ttl):
+                logger.debug(f"Cache hit for {key}")
+                self.metrics.count("cache_lookups", result="hit")
+                return entry.newest(limit)
+
+            self.metrics.count("cache_lookups", result="stale")
 
-    def query_docker(
-        self, item_name: str, limit: int = 5, tag_length: int = 7
-    ) -> List[str]:
-        """Query Docker images and return formatted results."""
-        logger.info(
-            f"Fetching Docker image tags for {item_name} (filtering for {tag_length}-character tags)..."
-        )
-
-        # Recursively search for Docker artifacts until we have enough matching tags
-        search_pattern = f"{self.docker_repo}/{item_name}/*"
-        tag_artifacts = {}
-        all_tags = set()
-        offset = 0
-        batch_size = 100
-        max_iterations = 50  # Safety limit to prevent infinite loops
-
-        for iteration in range(max_iterations):
             logger.debug(
-                f"API call {iteration + 1}/{max_iterations}: offset={offset}, batch_size={batch_size}"
+                f"Cache stale for {key}, fetching artifacts created since {entry.high_water}"
             )
+            newer = yield entry.high_water
+            if len(newer) >= limit:
+                # Everything we need is newer than the cache, start over from it
+                self.cache.store(key, newer, limit)
+                return newest_artifacts(newer, limit)
+            merged = self.cache.merge(key, newer)
+            if merged is not None:
+                return merged.newest(limit)
+
+        logger.debug(f"Cache miss for {key}")
+        self.metrics.count("cache_lookups", result="miss")
+        artifacts = yield None
+        # Don't cache empty results, they're cheap to repeat and may be failures
+        if artifacts:
+            self.cache.store(key, artifacts, limit)
+        return newest_artifacts(artifacts, limit)
+
+    def _index_digests(self, artifact_type: str, records: List[ArtifactRecord]) -> None:
+        """Record the digests of fetched artifacts in the digest index, if any."""
+        if self.digest_index is None:
+            return
+        import sqlite3
 
-            # Get batch of artifacts
-            artifacts = self.client.search(
-                search_pattern, limit=batch_size, offset=offset
+        try:
+            self.digest_index.add(artifact_type, records)
+        except sqlite3.Error as e:
+            logger.warning(f"Couldn't update the digest index: {e}")
+
+    def _docker_records(
+        self, item_name: str, artifacts: List[Dict], tag_length: int
+    ) -> List[ArtifactRecord]:
+        """Turn tag manifests into records, one per tag."""
+        if not artifacts:
+            logger.warning(
+                f"No {tag_length}-character Docker image tags found for {item_name}"
             )
+            return []
 
-            if not artifacts:
-                logger.debug(f"No more artifacts found at offset {offset}")
-                break
+        return [
+            ArtifactRecord.from_artifact(
+                artifact,
+                self.docker_repo,
+                item_name,
+                artifact.get("path", "").split("/")[2],
+            )
+            for artifact in artifacts
+        ]
 
-            logger.debug(f"Found {len(artifacts)} artifacts in batch {iteration + 1}")
+    def _docker_pager(
+        self,
+        limit: int,
+        tag_length: int,
+        tag_artifacts: Dict[str, Dict],
+        all_tags: set,
+        created_after: Optional[str] = None,
+    ) -> Tuple[Callable[[], int], Callable[[List[Dict]], bool]]:
+        """
+        The page sizing and stopping rule of `_page_docker_tags`, without I/O.
+
+        Returns `page_size()`, the size to ask for next, and `take(page)`,
+        which collects a page's tags and says whether paging is done. Like
+        `_cache_plan`, this lets the async tool page the same way.
+        """
+        min_size = max(1, self.min_page_size)
+        max_size = max(min_size, self.max_page_size)
+        page_size = max(min_size, min(max_size, FIRST_PAGE_SIZE))
+        scanned = 0
+        iteration = 0
+
+        def take(artifacts: List[Dict]) -> bool:
+            nonlocal page_size, scanned, iteration
+            iteration += 1
+            returned = len(artifacts)
+            scanned += returned
+            if created_after:
+                artifacts = [
+                    artifact
+                    for artifact in artifacts
+                    if artifact.get("created", "") >= created_after
+                ]
 
             # Process this batch of artifacts
-            batch_tag_count = 0
-            for artifact in artifacts:
-                path = artifact.get("path", "")
-                # Extract tag from path: dexcom-docker-dev-virtual/item/tag/...
-                path_parts = path.split("/")
-                if len(path_parts) >= 3:
-                    tag = path_parts[2]  # Tag is the third part
-                    all_tags.add(tag)
-                    if len(tag) == tag_length:  # Only tags of specified length
-                        batch_tag_count += 1
-                        created = artifact.get("created", "")
-                        # Keep the most recent artifact for each tag
-                        if (
-                            tag not in tag_artifacts
-                            or created > tag_artifacts[tag]["created"]
-                        ):
-                            tag_artifacts[tag] = {
-                                "created": created,
-                                "artifact": artifact,
-                            }
+            with self.metrics.timer("filter", search="docker_paged"):
+                batch_tag_count = self._collect_docker_tags(
+                    artifacts, tag_length, tag_artifacts, all_tags, limit
+                )
 
             logger.debug(
-                f"Batch {iteration + 1}: found {batch_tag_count} new {tag_length}-character tags"
+                f"Batch {iteration}: found {batch_tag_count} new {tag_length}-character tags"
             )
             logger.debug(
                 f"Progress: {len(tag_artifacts)}/{limit} {tag_length}-character tags found"
@@ -195,18 +884,364 @@ class ArtifactoryQueryTool:
             # Check if we have enough matching tags
             if len(tag_artifacts) >= limit:
                 logger.debug(
-                    f"✓ Found enough {tag_length}-character tags ({len(tag_artifacts)}) after {iteration + 1} API calls"
+                    f"✓ Found enough {tag_length}-character tags ({len(tag_artifacts)}) after {iteration} API calls"
                 )
-                break
+                return True
 
-            # If we got fewer artifacts than batch_size, we've reached the end
-            if len(artifacts) < batch_size:
-                logger.debug(
-                    f"Reached end of results (got {len(artifacts)} < {batch_size})"
-                )
-                break
+            if len(artifacts) < returned:
+                logger.debug(f"Reached artifacts older than {created_after}")
+                return True
+
+            page_size = adaptive_page_size(
+                len(tag_artifacts), limit, scanned, page_size, min_size, max_size
+            )
+            logger.debug(f"Next page size: {page_size}")
+            return False
+
+        return lambda: page_size, take
+
+    def _report_scan_cap(
+        self,
+        search: str,
+        scanned: int,
+        what: str,
+        option: str = "--max-scan",
+        cap: Optional[int] = None,
+    ) -> None:
+        """Warn that a search stopped at its cap, not the end of results."""
+        self.metrics.count("scan_capped", search=search)
+        cap = self.max_scan if cap is None else cap
+        logger.warning(
+            f"Stopped after {scanned} artifacts at the safety cap ({option} {cap}) "
+            f"before reaching the end of results; older {what} may be missing"
+        )
+
+    def _collect_docker_tags(
+        self,
+        artifacts: List[Dict],
+        tag_length: int,
+        tag_artifacts: Dict[str, Dict],
+        all_tags: set,
+        limit: Optional[int] = None,
+    ) -> int:
+        """
+        Record the newest artifact per matching tag, returning the match count.
+
+        Each of the first `limit` tags is passed to `on_candidate`, if set, as
+        soon as it is first seen, so callers can show tags while the search
+        carries on. Searches are newest first, so later tags won't make the cut.
+        """
+        batch_tag_count = 0
+        for artifact in artifacts:
+            path = artifact.get("path", "")
+            # Extract tag from path: dexcom-docker-dev-virtual/item/tag/...
+            path_parts = path.split("/")
+            if len(path_parts) >= 3:
+                tag = path_parts[2]  # Tag is the third part
+                all_tags.add(tag)
+                if len(tag) == tag_length:  # Only tags of specified length
+                    batch_tag_count += 1
+                    created = artifact.get("created", "")
+                    # Keep the most recent artifact for each tag
+                    current = tag_artifacts.get(tag)
+                    if current is None or created > current.get("created", ""):
+                        tag_artifacts[tag] = artifact
+                    if (
+                        current is None
+                        and self.on_candidate is not None
+                        and (limit is None or len(tag_artifacts) <= limit)
+                    ):
+                        self.on_candidate(
+                            "docker",
+                            ArtifactRecord.from_artifact(
+                                artifact, self.docker_repo, path_parts[1], tag
+                            ),
+                        )
+        return batch_tag_count
+
+    def _search_all_pager(
+        self, created_after: Optional[str], first_page_size: int = FIRST_PAGE_SIZE
+    ) -> Tuple[Callable[[], int], Callable[[List[Dict]], bool], Dict[str, Dict]]:
+        """
+        The page sizing and stopping rule of `_search_all`, without I/O.
+
+        Returns `page_size()`, which doubles each time it is asked, `take(page)`,
+        which keeps a page's artifacts and says whether paging is done, and
+        the dict they are kept in, keyed by path.
+        """
+        max_size = max(1, self.min_page_size, self.max_page_size)
+        page_size = min(max_size, first_page_size)
+        artifacts: Dict[str, Dict] = {}
+
+        def next_page_size() -> int:
+            nonlocal page_size
+            size, page_size = page_size, min(max_size, page_size * 2)
+            return size
+
+        def take(page: List[Dict]) -> bool:
+            for artifact in page:
+                if created_after is None or (
+                    artifact.get("created", "") >= created_after
+                ):
+                    artifacts[artifact.get("path", "")] = artifact
+            return bool(created_after) and page[-1].get("created", "") < created_after
+
+        return next_page_size, take, artifacts
+
+    def _helm_records(
+        self, item_name: str, artifacts: List[Dict]
+    ) -> List[ArtifactRecord]:
+        """Turn chart packages into records, versioned by chart version."""
+        return [
+            ArtifactRecord.from_artifact(
+                artifact,
+                self.helm_repo,
+                item_name,
+                helm_chart_version(
+                    posixpath.basename(artifact.get("path", "")), item_name
+                ),
+            )
+            for artifact in artifacts
+        ]
+
+    def _pypi_records(
+        self, item_name: str, artifacts: List[Dict]
+    ) -> List[ArtifactRecord]:
+        """Turn wheels into records, versioned by package version."""
+        return [
+            ArtifactRecord.from_artifact(
+                artifact,
+                self.pypi_repo,
+                item_name,
+                wheel_version(posixpath.basename(artifact.get("path", ""))),
+            )
+            for artifact in artifacts
+        ]
+
+    def _top_versions(
+        self,
+        artifact_type: str,
+        records: List[ArtifactRecord],
+        limit: int,
+        version_range: Optional[str],
+        prereleases: bool,
+    ) -> List[ArtifactRecord]:
+        """Return the Helm or PyPI records with the highest versions."""
+        from versions import top_records_by_version
+
+        return top_records_by_version(
+            records, limit, VERSION_SCHEMES[artifact_type], version_range, prereleases
+        )
+
+    def _version_scan_cap(self) -> Tuple[int, str]:
+        """
+        How many artifacts to rank by version, and the option that says so.
+
+        Without `version_scan` that is all of them, up to `max_scan`: correct,
+        but a cold query on a busy item pages through thousands of artifacts.
+        `version_scan` ranks only the newest so many instead, which is faster
+        but misses a higher version uploaded before them.
+        """
+        if self.version_scan is not None and self.version_scan < self.max_scan:
+            return max(1, self.version_scan), "--version-scan"
+        return self.max_scan, "--max-scan"
+
+
+class ArtifactoryQueryTool(QueryPlanner):
+    """Main tool for querying Artifactory."""
 
-            offset += batch_size
+    def __init__(self, environment: str = "dev", client: Optional[JFrogClient] = None):
+        self.client = client or JFrogClient()
+        super().__init__(environment, self.client.metrics)
+
+    def _cached_query(
+        self,
+        key: str,
+        limit: int,
+        fetch: Callable[[Optional[str]], Dict[str, Dict]],
+    ) -> List[Dict]:
+        """
+        Run a newest-first query through the on-disk cache, if there is one.
+
+        `fetch(created_after)` returns artifacts keyed by identity (tag, path).
+        Given a high-water mark it only needs to return artifacts created since
+        then, which are merged into the cached set once its TTL has expired.
+        """
+        plan = self._cache_plan(key, limit)
+        try:
+            created_after = next(plan)
+            while True:
+                created_after = plan.send(fetch(created_after))
+        except StopIteration as done:
+            return done.value
+
+    def query(
+        self,
+        artifact_type: str,
+        item_name: str,
+        limit: int = 5,
+        tag_length: int = 7,
+        version_range: Optional[str] = None,
+        prereleases: bool = False,
+    ) -> List[ArtifactRecord]:
+        """
+        Query one item of the given artifact type (docker, helm or pypi).
+
+        `version_range` (e.g. ">=1.4,<2") and `prereleases` only apply to
+        Helm and PyPI, which are ordered by version.
+        """
+        if artifact_type == "docker":
+            return self.query_docker(item_name, limit, tag_length)
+        if artifact_type == "helm":
+            return self.query_helm(item_name, limit, version_range, prereleases)
+        if artifact_type == "pypi":
+            return self.query_pypi(item_name, limit, version_range, prereleases)
+        raise ValueError(
+            f"Unsupported artifact type: {artifact_type}. Supported types are: docker, helm, pypi"
+        )
+
+    def query_batch(
+        self,
+        queries: Iterable[Tuple[str, str]],
+        limit: int = 5,
+        tag_length: int = 7,
+        concurrency: int = 8,
+        version_range: Optional[str] = None,
+        prereleases: bool = False,
+    ) -> Iterator[BatchResult]:
+        """
+        Run many (item_name, artifact_type) queries concurrently.
+
+        Queries share this tool's client, and so its connection pool and
+        cache. Results are yielded as each query completes, not in input
+        order; a failing query is reported in its result rather than raised.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, concurrency), thread_name_prefix="batch-query"
+        )
+        try:
+            futures = {
+                executor.submit(
+                    self.query,
+                    artifact_type,
+                    item_name,
+                    limit,
+                    tag_length,
+                    version_range,
+                    prereleases,
+                ): (item_name, artifact_type)
+                for item_name, artifact_type in queries
+            }
+            for future in as_completed(futures):
+                item_name, artifact_type = futures[future]
+                try:
+                    yield BatchResult(item_name, artifact_type, future.result())
+                except Exception as e:
+                    yield BatchResult(item_name, artifact_type, [], str(e))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def for_environment(self, environment: str) -> "ArtifactoryQueryTool":
+        """
+        Return a tool for another environment with the same settings.
+
+        The new tool shares this one's client (connection pool, metrics) and
+        cache; their keys include the repo, so environments don't collide.
+        """
+        if environment == self.environment:
+            return self
+        tool = type(self)(environment=environment, client=self.client)
+        self._copy_settings(tool)
+        return tool
+
+    def query_environments(
+        self,
+        environments: List[str],
+        artifact_type: str,
+        item_name: str,
+        limit: int = 5,
+        tag_length: int = 7,
+    ) -> List[EnvironmentResult]:
+        """
+        Run the same query in several environments concurrently.
+
+        Takes about as long as the slowest environment. Results come back in
+        the order of `environments`; a failing environment is reported in its
+        result rather than raised.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        tools = [self.for_environment(environment) for environment in environments]
+        with ThreadPoolExecutor(
+            max_workers=max(1, len(tools)), thread_name_prefix="env-query"
+        ) as executor:
+            futures = [
+                executor.submit(tool.query, artifact_type, item_name, limit, tag_length)
+                for tool in tools
+            ]
+            results = []
+            for environment, future in zip(environments, futures, strict=True):
+                try:
+                    results.append(EnvironmentResult(environment, future.result()))
+                except Exception as e:
+                    results.append(EnvironmentResult(environment, [], str(e)))
+        return results
+
+    @_timed_query("docker")
+    def query_docker(
+        self, item_name: str, limit: int = 5, tag_length: int = 7
+    ) -> List[ArtifactRecord]:
+        """Query Docker images and return the newest matches."""
+        logger.info(
+            f"Fetching Docker image tags for {item_name} (filtering for {tag_length}-character tags)..."
+        )
+
+        cache_key = f"docker:{self.docker_repo}/{item_name}:{tag_length}"
+        artifacts = self._cached_query(
+            cache_key,
+            limit,
+            lambda created_after: self._find_docker_tags(
+                item_name, limit, tag_length, created_after
+            ),
+        )
+
+        records = self._docker_records(item_name, artifacts, tag_length)
+        self._index_digests("docker", records)
+        return top_records(records, limit)
+
+    def _find_docker_tags(
+        self,
+        item_name: str,
+        limit: int,
+        tag_length: int,
+        created_after: Optional[str] = None,
+    ) -> Dict[str, Dict]:
+        """Return the newest artifact for each matching tag, keyed by tag."""
+        tag_artifacts: Dict[str, Dict] = {}
+        all_tags = set()
+
+        # Ask for the tag folders directly first; only page through every
+        # layer file when AQL isn't available to us
+        aql_artifacts = None
+        if self.use_aql:
+            aql_artifacts = self._query_docker_tags_aql(
+                item_name, limit, tag_length, created_after
+            )
+        if aql_artifacts is not None:
+            with self.metrics.timer("filter", search="docker_aql"):
+                self._collect_docker_tags(
+                    aql_artifacts, tag_length, tag_artifacts, all_tags, limit
+                )
+        elif self.stream_search:
+            self._stream_docker_tags(
+                item_name, limit, tag_length, tag_artifacts, all_tags, created_after
+            )
+        else:
+            self._page_docker_tags(
+                item_name, limit, tag_length, tag_artifacts, all_tags, created_after
+            )
 
         # Debug logging to see what tags were found
         # logger.debug(f"All tags found: {sorted(all_tags)}")
@@ -216,71 +1251,411 @@ class ArtifactoryQueryTool:
         logger.debug(
             f"Found {len(tag_artifacts)} unique {tag_length}-character tags out of {len(all_tags)} total tags"
         )
+        return tag_artifacts
 
-        if not tag_artifacts:
-            logger.warning(
-                f"No {tag_length}-character Docker image tags found for {item_name}"
+    def _query_docker_tags_aql(
+        self,
+        item_name: str,
+        limit: int,
+        tag_length: int,
+        created_after: Optional[str] = None,
+    ) -> Optional[List[Dict]]:
+        """
+        Find the newest tags of the given length in a single AQL request.
+
+        Every Docker tag folder holds exactly one manifest (or a manifest list
+        for multi-arch images), so searching for those with a fixed-length
+        `?` wildcard returns one row per matching tag, newest first, without
+        touching any layer files. Returns None if AQL is unavailable.
+        """
+        query = docker_tags_aql(
+            self.docker_repo, item_name, tag_length, limit, created_after
+        )
+        logger.debug(f"AQL tag query: {query}")
+
+        response = self.client.aql(query)
+        self.metrics.count("pages_fetched", search="docker_aql")
+        if response is None:
+            logger.debug("AQL unavailable, falling back to paged search")
+            return None
+
+        from artifactory_http import aql_item_to_jf
+
+        artifacts = [aql_item_to_jf(item) for item in response.get("results", [])]
+        logger.debug(f"AQL returned {len(artifacts)} tag manifests in one request")
+        return artifacts
+
+    def _stream_docker_tags(
+        self,
+        item_name: str,
+        limit: int,
+        tag_length: int,
+        tag_artifacts: Dict[str, Dict],
+        all_tags: set,
+        created_after: Optional[str] = None,
+    ) -> None:
+        """
+        Stream one search over every artifact of an image, newest first.
+
+        Artifacts are looked at one at a time as they are parsed, and the
+        search is abandoned as soon as enough tags are found (or, with
+        `created_after`, the artifacts get older than that).
+        """
+        search_pattern = f"{self.docker_repo}/{item_name}/*"
+        parsed = 0
+        filtering = 0.0  # Time spent matching tags, as opposed to waiting for them
+
+        with closing(
+            self.client.iter_search(search_pattern, limit=self.max_scan)
+        ) as artifacts:
+            for artifact in artifacts:
+                parsed += 1
+                if created_after and artifact.get("created", "") < created_after:
+                    logger.debug(f"Reached artifacts older than {created_after}")
+                    break
+
+                start = time.perf_counter()
+                self._collect_docker_tags(
+                    [artifact], tag_length, tag_artifacts, all_tags, limit
+                )
+                filtering += time.perf_counter() - start
+                if len(tag_artifacts) >= limit:
+                    logger.debug(
+                        f"✓ Found enough {tag_length}-character tags ({len(tag_artifacts)}) after parsing {parsed} artifacts"
+                    )
+                    break
+            else:
+                if parsed >= self.max_scan:
+                    self._report_scan_cap(
+                        "docker_stream", parsed, f"{tag_length}-character tags"
+                    )
+
+        logger.debug(f"Parsed {parsed} artifacts from the search stream")
+        self.metrics.count("pages_fetched", search="docker_stream")
+        self.metrics.observe("filter", filtering, search="docker_stream")
+
+    def _page_docker_tags(
+        self,
+        item_name: str,
+        limit: int,
+        tag_length: int,
+        tag_artifacts: Dict[str, Dict],
+        all_tags: set,
+        created_after: Optional[str] = None,
+    ) -> None:
+        """
+        Page through every artifact of an image until enough tags are found.
+
+        With `created_after`, paging also stops at the first artifact older
+        than that, since results are sorted newest first.
+
+        Page sizes adapt to how densely matching tags occur (see
+        `adaptive_page_size`), within `min_page_size` and `max_page_size`.
+        """
+        page_size, take = self._docker_pager(
+            limit, tag_length, tag_artifacts, all_tags, created_after
+        )
+        with closing(
+            self._iter_pages(
+                f"{self.docker_repo}/{item_name}/*",
+                page_size,
+                "docker_paged",
+                f"{tag_length}-character tags",
             )
-            return []
+        ) as pages:
+            for artifacts in pages:
+                if take(artifacts):
+                    break
+
+    def _iter_pages(
+        self,
+        pattern: str,
+        page_size: Callable[[], int],
+        search: str,
+        what: str,
+        probe_first: bool = False,
+        scan_cap: Optional[Tuple[int, str]] = None,
+    ) -> Iterator[List[Dict]]:
+        """
+        Yield pages of a newest-first search, in offset order.
+
+        `page_size()` is asked for the size of each page as it is requested,
+        so callers can adapt it to what earlier pages held. Up to
+        `prefetch_depth` pages are requested ahead of the one being consumed,
+        on a bounded worker pool; any still queued are cancelled when the
+        caller stops early or a short page marks the end. With `probe_first`,
+        prefetching only starts once the first page comes back full, so
+        searches that fit in one page make one request. Paging gives up after
+        `max_scan` artifacts (or the cap and option in `scan_cap`), warning
+        that older `what` may be missing, rather than running on indefinitely.
+        """
+        max_scan, option = scan_cap or (self.max_scan, "--max-scan")
+        prefetch_depth = max(1, self.prefetch_depth)
+        window = 1 if probe_first else prefetch_depth
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(
+            max_workers=prefetch_depth, thread_name_prefix=f"{search}-pager"
+        )
+        pending: Deque[Tuple[int, int, "Future"]] = deque()
+        next_offset = 0
+        scanned = 0
+
+        def fill_window() -> None:
+            nonlocal next_offset
+            while len(pending) < window and next_offset < max_scan:
+                size = min(page_size(), max_scan - next_offset)
+                future = executor.submit(
+                    self.client.search, pattern, limit=size, offset=next_offset
+                )
+                pending.append((next_offset, size, future))
+                next_offset += size
+
+        try:
+            fill_window()
+            iteration = 0
+            while pending:
+                offset, size, future = pending.popleft()
+                iteration += 1
+                logger.debug(
+                    f"API call {iteration}: offset={offset}, page_size={size} ({len(pending)} prefetched)"
+                )
 
-        # Format results and sort by creation date
-        results = []
-        for tag, data in tag_artifacts.items():
-            artifact = data["artifact"]
-            created = data["created"]
-            sha = (artifact.get("sha1", "") or artifact.get("actualSha1", ""))[
-                :8
-            ] or "unknown"
-            result = f"{created} {self.docker_repo}/{item_name}, Tag: {tag} (JFrog sha: {sha})"
-            results.append(result)
-
-        # Sort by timestamp (descending) and return top results
-        sorted_results = sorted(results, reverse=True)[:limit]
-        return sorted_results
-
-    def query_helm(self, item_name: str, limit: int = 5) -> List[str]:
-        """Query Helm charts and return formatted results."""
+                artifacts = future.result()
+                self.metrics.count("pages_fetched", search=search)
+                if not artifacts:
+                    logger.debug(f"No more artifacts found at offset {offset}")
+                    return
+
+                logger.debug(f"Found {len(artifacts)} artifacts in batch {iteration}")
+                scanned += len(artifacts)
+                yield artifacts
+
+                # If we got fewer artifacts than we asked for, we've reached the end
+                if len(artifacts) < size:
+                    logger.debug(
+                        f"Reached end of results (got {len(artifacts)} < {size})"
+                    )
+                    return
+                window = prefetch_depth
+                fill_window()
+
+            self._report_scan_cap(search, scanned, what, option, max_scan)
+        finally:
+            # Don't wait for speculative pages we no longer need
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _search_all(
+        self,
+        pattern: str,
+        search: str,
+        what: str,
+        created_after: Optional[str] = None,
+        first_page_size: int = FIRST_PAGE_SIZE,
+        scan_cap: Optional[Tuple[int, str]] = None,
+    ) -> Dict[str, Dict]:
+        """
+        Return every artifact for a pattern, keyed by path.
+
+        With `created_after`, return only those created since then, paging
+        until the results get older than that. Pages start small and double up
+        to `max_page_size`, so a small repo takes a single request. `scan_cap`
+        is passed on to `_iter_pages`.
+        """
+        page_size, take, artifacts = self._search_all_pager(
+            created_after, first_page_size
+        )
+        with closing(
+            self._iter_pages(pattern, page_size, search, what, True, scan_cap)
+        ) as pages:
+            for page in pages:
+                if take(page):
+                    break
+        return artifacts
+
+    @_timed_query("helm")
+    def query_helm(
+        self,
+        item_name: str,
+        limit: int = 5,
+        version_range: Optional[str] = None,
+        prereleases: bool = False,
+    ) -> List[ArtifactRecord]:
+        """Query Helm charts and return the highest chart versions (semver)."""
         search_pattern = f"{self.helm_repo}/{item_name}/*.tgz"
-        artifacts = self.client.search(search_pattern, limit=limit)
+        artifacts = self._all_artifacts(
+            f"helm:{search_pattern}", search_pattern, "helm", "chart versions"
+        )
+        records = self._helm_records(item_name, artifacts)
+        self._index_digests("helm", records)
+        return self._top_versions("helm", records, limit, version_range, prereleases)
 
-        results = []
-        for artifact in artifacts:
-            created = artifact.get("created", "")
-            path = artifact.get("path", "")
+    @_timed_query("pypi")
+    def query_pypi(
+        self,
+        item_name: str,
+        limit: int = 5,
+        version_range: Optional[str] = None,
+        prereleases: bool = False,
+    ) -> List[ArtifactRecord]:
+        """Query PyPI packages and return the highest package versions (PEP 440)."""
+        search_pattern = f"{self.pypi_repo}/{item_name}/*.whl"
+        artifacts = self._all_artifacts(
+            f"pypi:{search_pattern}", search_pattern, "pypi", "package versions"
+        )
+        records = self._pypi_records(item_name, artifacts)
+        self._index_digests("pypi", records)
+        return self._top_versions("pypi", records, limit, version_range, prereleases)
+
+    def find_new(
+        self,
+        artifact_type: str,
+        item_name: str,
+        created_after: Optional[str],
+        tag_length: int = 7,
+    ) -> List[ArtifactRecord]:
+        """
+        Return every artifact created since `created_after`, for --watch.
+
+        Skips the cache and asks only for what is newer than the mark: one AQL
+        request for Docker tag manifests, or newest-first pages that stop at
+        the mark for Helm and PyPI. Given None, returns just the newest
+        artifact, to start watching from. Versions aren't filtered here.
+
+        Docker tags are only returned once their manifest exists, as the
+        manifest: paging without AQL also sees the layers pushed ahead of it,
+        which would otherwise report a half-pushed tag, then report it again
+        (as a different artifact) when the manifest lands.
+        """
+        self.metrics.count("watch_polls", type=artifact_type)
+        if artifact_type == "docker":
+            tag_artifacts = self._find_docker_tags(
+                item_name,
+                1 if created_after is None else self.max_scan,
+                tag_length,
+                created_after,
+            )
+            records = [
+                ArtifactRecord.from_artifact(artifact, self.docker_repo, item_name, tag)
+                for tag, artifact in tag_artifacts.items()
+                if posixpath.basename(artifact.get("path", "")) in DOCKER_MANIFEST_NAMES
+            ]
+        elif artifact_type in VERSION_SCHEMES:
+            if artifact_type == "helm":
+                repo, pattern, what = self.helm_repo, "*.tgz", "chart versions"
+                to_records = self._helm_records
+            else:
+                repo, pattern, what = self.pypi_repo, "*.whl", "package versions"
+                to_records = self._pypi_records
+            pattern = f"{repo}/{item_name}/{pattern}"
+            if created_after is None:
+                artifacts = self.client.search(pattern, limit=1)
+            else:
+                artifacts = list(
+                    self._search_all(
+                        pattern,
+                        artifact_type,
+                        what,
+                        created_after,
+                        first_page_size=WATCH_FIRST_PAGE_SIZE,
+                    ).values()
+                )
+            records = to_records(item_name, artifacts)
+        else:
+            raise ValueError(
+                f"Unsupported artifact type: {artifact_type}. Supported types are: docker, helm, pypi"
+            )
+        self._index_digests(artifact_type, records)
+        return records
+
+    def list_items(
+        self, artifact_type: str, created_after: Optional[str] = None
+    ) -> Tuple[List[str], str]:
+        """
+        Return the item names in one of this environment's repos, for completion.
+
+        Item names are the repo's top-level folders, listed in a single AQL
+        request; given `created_after`, only folders created since then are.
+        Also returns the newest folder `created` seen, the next high-water
+        mark. Without AQL the repo root is listed instead, which has no
+        creation times, so the mark comes back empty and the next refresh
+        lists everything again.
+        """
+        repo = {
+            "docker": self.docker_repo,
+            "helm": self.helm_repo,
+            "pypi": self.pypi_repo,
+        }[artifact_type]
+        response = None
+        if self.use_aql:
+            response = self.client.aql(item_folders_aql(repo, created_after))
+        if response is not None:
+            folders = response.get("results", [])
+            names = [folder["name"] for folder in folders if folder.get("name")]
+            newest = max((folder.get("created", "") for folder in folders), default="")
+            return names, max(newest, created_after or "")
+
+        import json
+
+        logger.debug(f"AQL unavailable, listing {repo} instead")
+        output = self.client.curl(f"api/storage/{repo}")
+        children = json.loads(output).get("children", [])
+        names = [child["uri"].strip("/") for child in children if child.get("folder")]
+        return names, ""
+
+    def _all_artifacts(
+        self, cache_key: str, pattern: str, search: str, what: str
+    ) -> List[Dict]:
+        """
+        Return every artifact for a pattern (up to `max_scan`), through the cache.
+
+        Picking the highest versions needs all of them, not just the newest
+        few, so the whole set is cached and refreshed incrementally. On a cold
+        cache that means paging through the whole item; see `_version_scan_cap`.
+        """
+        scan_cap = self._version_scan_cap()
+        return self._cached_query(
+            cache_key,
+            scan_cap[0],
+            lambda created_after: self._search_all(
+                pattern, search, what, created_after, scan_cap=scan_cap
+            ),
+        )
 
-            # Extract filename and remove .tgz extension
-            filename = Path(path).name
-            chart_name_with_version = filename.replace(".tgz", "")
 
-            sha = (artifact.get("sha1", "") or artifact.get("actualSha1", ""))[
-                :8
-            ] or "unknown"
-            result = f"{created} {chart_name_with_version} (JFrog SHA: {sha})"
-            results.append(result)
+ARTIFACT_TYPES = ["docker", "helm", "pypi"]
+# How Helm and PyPI versions are parsed and ordered (see versions.py)
+VERSION_SCHEMES = {"helm": "semver", "pypi": "pep440"}
+OUTPUT_FORMATS = ["text", "ndjson", "json", "tsv"]
 
-        return results
 
-    def query_pypi(self, item_name: str, limit: int = 5) -> List[str]:
-        """Query PyPI packages and return formatted results."""
-        search_pattern = f"{self.pypi_repo}/{item_name}/*.whl"
-        artifacts = self.client.search(search_pattern, limit=limit)
+def parse_batch_spec(spec: str) -> Tuple[str, str]:
+    """Parse an `item_name[:artifact_type]` batch entry (type defaults to docker)."""
+    item_name, _, artifact_type = spec.strip().partition(":")
+    artifact_type = artifact_type or "docker"
+    if not item_name or artifact_type not in ARTIFACT_TYPES:
+        raise ValueError(
+            f"Invalid batch entry '{spec}', expected item_name:{'|'.join(ARTIFACT_TYPES)}"
+        )
+    return item_name, artifact_type
 
-        results = []
-        for artifact in artifacts:
-            created = artifact.get("created", "")
-            path = artifact.get("path", "")
-            filename = Path(path).name
-            sha = (artifact.get("sha1", "") or artifact.get("actualSha1", ""))[
-                :8
-            ] or "unknown"
-            result = f"{created} {filename} (JFrog sha: {sha})"
-            results.append(result)
 
-        return results
+def read_batch_file(path: str) -> List[Tuple[str, str]]:
+    """Read batch entries from a file ("-" for stdin), skipping comments and blanks."""
+    handle = sys.stdin if path == "-" else open(path)
+    with handle:
+        return [
+            parse_batch_spec(line)
+            for line in handle
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
 
 
-def main():
-    """Main function to parse arguments and run the query."""
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser."""
     parser = argparse.ArgumentParser(
         description="Query JFrog Artifactory for artifacts",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -300,13 +1675,27 @@ Examples:
 
   # Get more results
   python query_artifactory.py data-platform-validation docker --limit 10
+
+  # Query several items at once, 8 at a time
+  python query_artifactory.py --batch data-platform-validation:docker sre-libs:pypi --env prod
+  python query_artifactory.py --batch-file items.txt --concurrency 8
+
+  # Answer repeat queries from a resident daemon (started on first use)
+  python query_artifactory.py data-platform-validation docker --daemon
+
+  # Block until a new Docker tag is pushed (or give up after 30 minutes)
+  python query_artifactory.py data-platform-validation docker --watch --exit-on-match --watch-timeout 1800
         """,
     )
 
-    parser.add_argument("item_name", help="Name of the item to search for")
+    parser.add_argument(
+        "item_name",
+        nargs="?",
+        help="Name of the item to search for (not needed with --batch/--batch-file)",
+    )
     parser.add_argument(
         "artifact_type",
-        choices=["docker", "helm", "pypi"],
+        choices=ARTIFACT_TYPES,
         default="docker",
         nargs="?",
         help="Type of artifact to search for (default: docker)",
@@ -329,57 +1718,824 @@ Examples:
         default=7,
         help="Filter Docker tags by character length (default: 7)",
     )
+    parser.add_argument(
+        "--version-range",
+        metavar="RANGE",
+        help="Only return Helm/PyPI versions in this range, e.g. '>=1.4,<2'",
+    )
+    parser.add_argument(
+        "--pre",
+        action="store_true",
+        help="Include pre-release Helm/PyPI versions",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="text",
+        help="Output format: coloured text, or records for scripts; ndjson and tsv "
+        "stream each artifact as it's found (default: text)",
+    )
     parser.add_argument(
         "--no-highlight",
         action="store_true",
         help="Disable highlighting of the most recent entry",
     )
+    parser.add_argument(
+        "--no-aql",
+        action="store_true",
+        help="Always page through Docker artifacts instead of asking AQL for tags",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream one Docker search instead of paging through the results; "
+        "it may transfer up to --max-scan artifacts even for a few tags",
+    )
+    parser.add_argument(
+        "--prefetch-depth",
+        type=int,
+        default=4,
+        help="Number of Docker search pages to fetch ahead (default: 4)",
+    )
+    parser.add_argument(
+        "--min-page-size",
+        type=int,
+        default=DEFAULT_MIN_PAGE_SIZE,
+        help="Smallest Docker search page, in artifacts "
+        f"(default: {DEFAULT_MIN_PAGE_SIZE})",
+    )
+    parser.add_argument(
+        "--max-page-size",
+        type=int,
+        default=DEFAULT_MAX_PAGE_SIZE,
+        help="Largest Docker search page, in artifacts "
+        f"(default: {DEFAULT_MAX_PAGE_SIZE})",
+    )
+    parser.add_argument(
+        "--max-scan",
+        type=int,
+        default=DEFAULT_MAX_SCAN,
+        help="Stop a paged or streamed Docker search, or a Helm/PyPI version "
+        f"scan, after this many artifacts (default: {DEFAULT_MAX_SCAN})",
+    )
+    parser.add_argument(
+        "--version-scan",
+        type=int,
+        metavar="N",
+        help="Rank Helm/PyPI versions among only the newest N artifacts. Ranking "
+        "looks at every artifact by default, which is correct but slow for a busy "
+        "item on a cold cache; a cap is faster but misses a higher version "
+        "uploaded before the newest N (default: all, up to --max-scan)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write the local result cache",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached results and fetch everything again (the cache is updated)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        help="Seconds before cached results are refreshed (default: 300)",
+    )
+    parser.add_argument(
+        "--no-digest-index",
+        action="store_true",
+        help="Don't record the digests of fetched artifacts in the local digest index",
+    )
+    parser.add_argument(
+        "--digest",
+        metavar="SHA",
+        help="List the indexed tags, charts and wheels with this sha1/sha256 "
+        "(or a prefix of at least 6 hex characters), without querying Artifactory",
+    )
+    parser.add_argument(
+        "--compact-index",
+        action="store_true",
+        help="Drop digest index entries not seen for --index-max-age days and "
+        "reclaim the space",
+    )
+    parser.add_argument(
+        "--index-max-age",
+        type=float,
+        metavar="DAYS",
+        default=90,
+        help="Age in days after which --compact-index drops unseen entries (default: 90)",
+    )
+    parser.add_argument(
+        "--index-items",
+        nargs="*",
+        choices=ARTIFACT_TYPES,
+        metavar="TYPE",
+        help="Update the local item-name index used by `complete` for these "
+        "types (default: all) in --env, fetching only items created since the "
+        "last update; with --refresh, rebuild it",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["auto", "http", "cli"],
+        default="auto",
+        help="How to talk to Artifactory: direct HTTP using the jf server config, "
+        "the jf CLI, or HTTP when configured (default: auto)",
+    )
+    parser.add_argument(
+        "--server-id",
+        help="jf server ID to use for the HTTP backend (default: the jf default server)",
+    )
+    parser.add_argument(
+        "--env",
+        help="Artifactory environment, overriding the positional one (handy with --batch)",
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="ITEM:TYPE",
+        help="Query several items concurrently, e.g. sre-libs:pypi (type defaults to docker)",
+    )
+    parser.add_argument(
+        "--batch-file",
+        metavar="PATH",
+        help="Read ITEM:TYPE batch entries from a file, one per line ('-' for stdin)",
+    )
+    parser.add_argument(
+        "--promotion",
+        nargs="+",
+        metavar="ENV",
+        help="Query these environments concurrently, e.g. dev stage prod, and show "
+        "which tags exist in each",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum queries and Artifactory requests in flight in batch mode (default: 8)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print per-call latency, bytes, artifacts, pages and cache counts to stderr",
+    )
+    parser.add_argument(
+        "--stats-json",
+        metavar="PATH",
+        help="Write the same stats as JSON ('-' for stderr, keeping stdout for results)",
+    )
+    parser.add_argument(
+        "--prometheus-textfile",
+        metavar="PATH",
+        help="Write the stats for the node_exporter textfile collector (*.prom)",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a resident daemon answering queries over a Unix socket",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Send the query to the resident daemon, starting it if it isn't running",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="Unix socket of the daemon (default: $XDG_RUNTIME_DIR/query-artifactory.sock, "
+        "else in a private per-user directory in the temp dir)",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=int,
+        default=15 * 60,
+        help="Seconds without a request before the daemon exits (default: 900)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep polling for newly created artifacts and print each new match "
+        "as it appears, until interrupted",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        metavar="SECONDS",
+        default=15,
+        help="Seconds between --watch polls; doubles while nothing changes (default: 15)",
+    )
+    parser.add_argument(
+        "--watch-max-interval",
+        type=float,
+        metavar="SECONDS",
+        default=300,
+        help="Longest pause between --watch polls (default: 300)",
+    )
+    parser.add_argument(
+        "--watch-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Stop watching after this long (default: watch until interrupted)",
+    )
+    parser.add_argument(
+        "--exit-on-match",
+        action="store_true",
+        help="With --watch, exit as soon as one new match appears; exits 1 if "
+        "--watch-timeout passes first",
+    )
 
-    args = parser.parse_args()
+    return parser
+
+
+def build_tool(args: argparse.Namespace) -> ArtifactoryQueryTool:
+    """Build a query tool configured from the command line."""
+    client = JFrogClient.create(args.backend, args.server_id)
+    tool = ArtifactoryQueryTool(environment=args.env or args.environment, client=client)
+    tool.use_aql = not args.no_aql
+    tool.prefetch_depth = args.prefetch_depth
+    tool.min_page_size = args.min_page_size
+    tool.max_page_size = args.max_page_size
+    tool.max_scan = args.max_scan
+    tool.version_scan = args.version_scan
+    tool.stream_search = args.stream
+    tool.refresh_cache = args.refresh
+    if not args.no_cache:
+        import sqlite3
 
-    tool = ArtifactoryQueryTool(environment=args.environment)
+        from artifact_cache import DEFAULT_TTL, ArtifactCache
+
+        try:
+            tool.cache = ArtifactCache(
+                ttl=DEFAULT_TTL if args.cache_ttl is None else args.cache_ttl
+            )
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Result cache unavailable, continuing without it: {e}")
+    if not args.no_digest_index:
+        import sqlite3
+
+        from digest_index import DigestIndex
+
+        try:
+            tool.digest_index = DigestIndex()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Digest index unavailable, continuing without it: {e}")
+    return tool
+
+
+# Options the daemon's tools are built with; a query through the daemon must
+# have been asked for with the same ones
+DAEMON_SETTINGS = (
+    "backend",
+    "server_id",
+    "prefetch_depth",
+    "min_page_size",
+    "max_page_size",
+    "max_scan",
+    "version_scan",
+    "cache_ttl",
+    "no_aql",
+    "stream",
+    "no_cache",
+    "no_digest_index",
+)
+
+
+def daemon_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    """The settings of the tools a daemon started with these arguments builds."""
+    return {name: getattr(args, name) for name in DAEMON_SETTINGS}
+
+
+def serve_command(args: argparse.Namespace, socket_path: "Path") -> List[str]:
+    """Command line that starts a daemon with the same backend and cache settings."""
+    command = [sys.executable, os.path.abspath(__file__), "--serve"]
+    command += ["--socket", str(socket_path), "--backend", args.backend]
+    command += ["--prefetch-depth", str(args.prefetch_depth)]
+    command += ["--min-page-size", str(args.min_page_size)]
+    command += ["--max-page-size", str(args.max_page_size)]
+    command += ["--max-scan", str(args.max_scan)]
+    command += ["--idle-timeout", str(args.idle_timeout)]
+    if args.server_id:
+        command += ["--server-id", args.server_id]
+    if args.version_scan is not None:
+        command += ["--version-scan", str(args.version_scan)]
+    if args.cache_ttl is not None:
+        command += ["--cache-ttl", str(args.cache_ttl)]
+    for flag in ("no_aql", "stream", "no_cache", "no_digest_index"):
+        if getattr(args, flag):
+            command.append("--" + flag.replace("_", "-"))
+    return command
+
+
+def serve(args: argparse.Namespace) -> int:
+    """Run the resident query daemon until it is shut down or goes idle."""
+    from pathlib import Path
+
+    from query_daemon import DaemonError, QueryDaemon, default_socket_path
+
+    def tool_factory(environment: str) -> ArtifactoryQueryTool:
+        return build_tool(argparse.Namespace(**{**vars(args), "env": environment}))
 
     try:
-        if args.artifact_type == "docker":
-            results = tool.query_docker(args.item_name, args.limit, args.tag_length)
-        elif args.artifact_type == "helm":
-            results = tool.query_helm(args.item_name, args.limit)
-        elif args.artifact_type == "pypi":
-            results = tool.query_pypi(args.item_name, args.limit)
+        socket_path = Path(args.socket) if args.socket else default_socket_path()
+        daemon = QueryDaemon(
+            socket_path,
+            tool_factory,
+            idle_timeout=args.idle_timeout,
+            settings=daemon_settings(args),
+        )
+    except (OSError, DaemonError) as e:
+        logger.error(f"Cannot start daemon: {e}")
+        return 1
+    logger.info(f"Serving queries on {socket_path}")
+    daemon.serve()
+    return 0
+
+
+def query_via_daemon(
+    args: argparse.Namespace, metrics: Metrics
+) -> Optional[List[ArtifactRecord]]:
+    """
+    Run the query through the resident daemon, starting it if needed.
+
+    The round trip (including starting the daemon) is recorded in `metrics`
+    as the `daemon_request` timer. Returns None if the daemon can't be used,
+    so the caller can run the query itself.
+    """
+    from pathlib import Path
+
+    from query_daemon import (
+        DaemonError,
+        default_socket_path,
+        query_daemon,
+        spawn_daemon,
+    )
+
+    request = {
+        "op": "query",
+        "environment": args.env or args.environment,
+        "artifact_type": args.artifact_type,
+        "item_name": args.item_name,
+        "limit": args.limit,
+        "tag_length": args.tag_length,
+        "version_range": args.version_range,
+        "prereleases": args.pre,
+        "refresh": args.refresh,
+        "settings": daemon_settings(args),
+    }
+    try:
+        socket_path = Path(args.socket) if args.socket else default_socket_path()
+        with metrics.timer("daemon_request", op="query"):
+            return query_daemon(
+                request,
+                socket_path,
+                spawn=lambda: spawn_daemon(
+                    serve_command(args, socket_path), socket_path
+                ),
+            )
+    except (OSError, DaemonError) as e:
+        logger.warning(f"Daemon unavailable, running the query directly: {e}")
+        return None
+
+
+def report_stats(metrics: Metrics, args: argparse.Namespace) -> None:
+    """Print or write the call metrics, as asked for on the command line."""
+    if args.stats:
+        print(metrics.summary(), file=sys.stderr)
+    try:
+        if args.stats_json == "-":
+            # stdout carries the results, which may be machine-read too
+            print(metrics.to_json(), file=sys.stderr)
+        elif args.stats_json:
+            with open(args.stats_json, "w") as f:
+                f.write(metrics.to_json() + "\n")
+        if args.prometheus_textfile:
+            metrics.write_prometheus_textfile(args.prometheus_textfile)
+    except OSError as e:
+        logger.error(f"Could not write stats: {e}")
+
+
+def format_record(record: ArtifactRecord, artifact_type: str) -> str:
+    """Render a query result as a line of text."""
+    created = format_created(record.created)
+    if artifact_type == "docker":
+        return f"{created} {record.repo}/{record.item}, Tag: {record.version} (JFrog sha: {record.short_sha})"
+    if artifact_type == "helm":
+        chart_name_with_version = record.filename.replace(".tgz", "")
+        return f"{created} {chart_name_with_version} (JFrog SHA: {record.short_sha})"
+    return f"{created} {record.filename} (JFrog sha: {record.short_sha})"
+
+
+def print_results(
+    records: List[ArtifactRecord],
+    artifact_type: str,
+    item_name: str,
+    highlight: bool = True,
+) -> None:
+    """Print query results, highlighting the most recent one."""
+    has_colorama, fore, style = colors()
+    results = [format_record(record, artifact_type) for record in records]
+    # Display all results with colors preserved
+    for i, result in enumerate(results):
+        if has_colorama and i == 0 and highlight:
+            # Highlight the most recent (first) result
+            print(f"{fore.CYAN}{result}{style.RESET_ALL}")
         else:
-            logger.error(f"Unsupported artifact type: {args.artifact_type}")
-            logger.error("Supported types are: docker, helm, pypi")
-            sys.exit(1)
+            print(result)
+
+    # Show most recent summary at the end (if highlighting is enabled)
+    if highlight:
+        print()  # Add blank line
+        # First result is the most recent tag, or the highest chart/package version
+        most_recent = results[0]
+        label = "MOST RECENT" if artifact_type == "docker" else "LATEST VERSION"
+        if has_colorama:
+            highlighted_result = (
+                f"{fore.GREEN}{style.BRIGHT}🔥 {label}: {most_recent}{style.RESET_ALL}"
+            )
+            print(highlighted_result)  # Use print to preserve color formatting
+        else:
+            print(f"🔥 {label}: {most_recent}")
 
-        if results:
-            # Display all results with colors preserved
-            for i, result in enumerate(results):
-                if HAS_COLORAMA and i == 0 and not args.no_highlight:
-                    # Highlight the most recent (first) result
-                    print(f"{Fore.CYAN}{result}{Style.RESET_ALL}")
-                else:
-                    print(result)
-
-            # Show most recent summary at the end (if highlighting is enabled)
-            if not args.no_highlight:
-                print()  # Add blank line
-                most_recent = results[0]  # First result is most recent due to sorting
-                if HAS_COLORAMA:
-                    highlighted_result = f"{Fore.GREEN}{Style.BRIGHT}🔥 MOST RECENT: {most_recent}{Style.RESET_ALL}"
-                    print(highlighted_result)  # Use print to preserve color formatting
+    # Print Artifactory link
+    print()
+    if has_colorama:
+        print(
+            f"{fore.YELLOW}Go to Artifactory: https://dexcom.jfrog.io/ui/packages/{artifact_type}:%2F%2F{item_name}{style.RESET_ALL}"
+        )
+    else:
+        print(
+            f"Go to Artifactory: https://dexcom.jfrog.io/ui/packages/{artifact_type}:%2F%2F{item_name}"
+        )
+
+
+def run_batch(
+    tool: ArtifactoryQueryTool,
+    queries: List[Tuple[str, str]],
+    args: argparse.Namespace,
+    writer: Optional["RecordWriter"] = None,
+) -> int:
+    """Run a batch of queries, printing each item's results as it completes."""
+    _, fore, style = colors()
+    failures = 0
+    for batch_result in tool.query_batch(
+        queries,
+        args.limit,
+        args.tag_length,
+        concurrency=args.concurrency,
+        version_range=args.version_range,
+        prereleases=args.pre,
+    ):
+        if writer is not None:
+            if batch_result.error:
+                failures += 1
+                logger.error(f"{batch_result.item_name}: {batch_result.error}")
+            writer.finish(
+                batch_result.artifact_type,
+                batch_result.item_name,
+                batch_result.results,
+                batch_result.error,
+            )
+            continue
+        header = f"==> {batch_result.item_name} ({batch_result.artifact_type})"
+        print(f"{fore.GREEN}{style.BRIGHT}{header}{style.RESET_ALL}")
+        if batch_result.error:
+            failures += 1
+            logger.error(f"{batch_result.item_name}: {batch_result.error}")
+        elif batch_result.results:
+            print_results(
+                batch_result.results,
+                batch_result.artifact_type,
+                batch_result.item_name,
+                highlight=not args.no_highlight,
+            )
+        else:
+            logger.warning(f"No results found for {batch_result.item_name}")
+        print()
+    return 1 if failures else 0
+
+
+def run_promotion(tool: ArtifactoryQueryTool, args: argparse.Namespace) -> int:
+    """Query several environments and print a promotion matrix."""
+    from promotion_matrix import build_promotion_matrix, format_promotion_matrix
+
+    has_colorama, fore, style = colors()
+    environments = args.promotion
+    env_results = tool.query_environments(
+        environments, args.artifact_type, args.item_name, args.limit, args.tag_length
+    )
+    failures = 0
+    for env_result in env_results:
+        if env_result.error:
+            failures += 1
+            logger.error(f"{env_result.environment}: {env_result.error}")
+
+    rows = build_promotion_matrix(
+        {
+            env_result.environment: env_result.results
+            for env_result in env_results
+            if not env_result.error
+        }
+    )
+    if not rows:
+        logger.warning(f"No results found for {args.item_name} in any environment")
+        return 1 if failures else 0
+
+    header = f"==> {args.item_name} ({args.artifact_type})"
+    print(f"{fore.GREEN}{style.BRIGHT}{header}{style.RESET_ALL}")
+    lines = format_promotion_matrix(rows, environments)
+    print(lines[0])
+    for row, line in zip(rows, lines[1:], strict=True):
+        if has_colorama and row.present_in(environments):
+            # Promoted all the way
+            print(f"{fore.CYAN}{line}{style.RESET_ALL}")
+        else:
+            print(line)
+    return 1 if failures else 0
+
+
+def run_watch(
+    tool: ArtifactoryQueryTool,
+    args: argparse.Namespace,
+    writer: Optional["RecordWriter"] = None,
+) -> int:
+    """
+    Print each new matching artifact as it is created, until interrupted.
+
+    With --exit-on-match, returns 0 at the first one, or 1 if --watch-timeout
+    passes first. A failed poll is logged and retried after the next pause.
+    """
+    from artifact_watch import PollBackoff, watch
+
+    has_colorama, fore, style = colors()
+    artifact_type = args.artifact_type
+    # Only brand new artifacts are written, not the tags the search passes
+    tool.on_candidate = None
+
+    matches = None
+    if artifact_type in VERSION_SCHEMES:
+        from versions import version_matcher
+
+        matches = version_matcher(
+            VERSION_SCHEMES[artifact_type], args.version_range, args.pre
+        )
+
+    def poll(created_after: Optional[str]) -> List[ArtifactRecord]:
+        try:
+            return tool.find_new(
+                artifact_type, args.item_name, created_after, args.tag_length
+            )
+        except Exception as e:
+            tool.metrics.count("watch_poll_errors", type=artifact_type)
+            logger.warning(f"Poll failed, trying again later: {e}")
+            return []
+
+    baseline = tool.find_new(artifact_type, args.item_name, None, args.tag_length)
+    newest = format_created(baseline[0].created) if baseline else "nothing yet"
+    logger.info(
+        f"Watching for new {artifact_type} artifacts of {args.item_name} "
+        f"(newest: {newest}), Ctrl-C to stop..."
+    )
+
+    new_records = watch(
+        poll,
+        baseline,
+        PollBackoff(args.watch_interval, args.watch_max_interval),
+        matches,
+        timeout=args.watch_timeout,
+    )
+    try:
+        with closing(new_records):
+            for record in new_records:
+                tool.metrics.count("watch_matches", type=artifact_type)
+                if writer is not None:
+                    writer.candidate(artifact_type, record)
+                elif has_colorama:
+                    print(
+                        f"{fore.GREEN}{style.BRIGHT}NEW{style.RESET_ALL} "
+                        f"{format_record(record, artifact_type)}",
+                        flush=True,
+                    )
                 else:
-                    print(f"🔥 MOST RECENT: {most_recent}")
+                    print(f"NEW {format_record(record, artifact_type)}", flush=True)
+                if args.exit_on_match:
+                    return 0
+    except KeyboardInterrupt:
+        return 0
 
-            # Print Artifactory link
-            print()
-            if HAS_COLORAMA:
-                print(
-                    f"{Fore.YELLOW}Go to Artifactory: https://dexcom.jfrog.io/ui/packages/{args.artifact_type}:%2F%2F{args.item_name}{Style.RESET_ALL}"
-                )
-            else:
-                print(
-                    f"Go to Artifactory: https://dexcom.jfrog.io/ui/packages/{args.artifact_type}:%2F%2F{args.item_name}"
+    logger.warning(
+        f"No new matches for {args.item_name} within {args.watch_timeout:g} seconds"
+    )
+    return 1 if args.exit_on_match else 0
+
+
+def run_item_index(tool: ArtifactoryQueryTool, args: argparse.Namespace) -> int:
+    """Build or refresh the item-name index for `complete`, per artifact type."""
+    from item_index import ItemIndex
+
+    failures = 0
+    for artifact_type in args.index_items or ARTIFACT_TYPES:
+        index = ItemIndex(artifact_type, tool.environment)
+        high_water, _ = index.load()
+        rebuild = args.refresh or not index.exists() or not high_water
+        try:
+            names, newest = tool.list_items(
+                artifact_type, None if rebuild else high_water
+            )
+        except Exception as e:
+            failures += 1
+            logger.error(f"Couldn't list {artifact_type} items: {e}")
+            continue
+        if rebuild:
+            index.save(newest, names)
+            logger.info(
+                f"Indexed {len(set(names))} {artifact_type} items in {tool.environment}"
+            )
+        else:
+            added = index.merge(newest, names)
+            logger.info(
+                f"Added {added} new {artifact_type} items in {tool.environment}"
+            )
+    return 1 if failures else 0
+
+
+def run_digest_lookup(args: argparse.Namespace) -> int:
+    """Print every indexed artifact with the digest (or digest prefix) in --digest."""
+    import json
+
+    from digest_index import DigestIndex
+
+    index = DigestIndex()
+    try:
+        entries = index.lookup(args.digest)
+    finally:
+        index.close()
+
+    if args.format == "json":
+        print(json.dumps([entry.as_dict() for entry in entries], indent=2))
+    elif args.format == "ndjson":
+        for entry in entries:
+            print(json.dumps(entry.as_dict()))
+    elif args.format == "tsv":
+        for entry in entries:
+            print("\t".join(entry))
+    elif entries:
+        _, fore, style = colors()
+        for entry in entries:
+            print(
+                f"{entry.created or '?'}  {entry.artifact_type:<6}  "
+                f"{entry.repo}/{entry.item}:{entry.version}  "
+                f"{fore.CYAN}{entry.algorithm}:{entry.digest[:12]}{style.RESET_ALL}  "
+                f"{entry.path}"
+            )
+    if not entries:
+        logger.warning(f"No indexed artifacts match digest {args.digest}")
+        return 1
+    return 0
+
+
+def run_compaction(args: argparse.Namespace) -> int:
+    """Compact the digest index and report what was reclaimed."""
+    from digest_index import DigestIndex
+
+    index = DigestIndex()
+    try:
+        result = index.compact(args.index_max_age)
+    finally:
+        index.close()
+    print(
+        f"Removed {result.removed} digest entries not seen for {args.index_max_age:g} "
+        f"days, {result.remaining} remain; {result.bytes_before} -> "
+        f"{result.bytes_after} bytes"
+    )
+    return 0
+
+
+def main():
+    """Main function to parse arguments and run the query."""
+    parser = build_parser()
+    args = parser.parse_args()
+
+    queries: List[Tuple[str, str]] = []
+    try:
+        if args.batch:
+            queries.extend(parse_batch_spec(spec) for spec in args.batch)
+        if args.batch_file:
+            queries.extend(read_batch_file(args.batch_file))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.serve:
+        sys.exit(serve(args))
+    if args.digest or args.compact_index:
+        import sqlite3
+
+        try:
+            if args.digest:
+                sys.exit(run_digest_lookup(args))
+            sys.exit(run_compaction(args))
+        except ValueError as e:
+            parser.error(str(e))
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Digest index unavailable: {e}")
+            sys.exit(1)
+    if args.index_items is not None:
+        from artifactory_http import ArtifactoryHttpError
+
+        try:
+            # Listing items doesn't use the result cache or the digest index
+            tool = build_tool(
+                argparse.Namespace(
+                    **{**vars(args), "no_cache": True, "no_digest_index": True}
                 )
+            )
+        except ArtifactoryHttpError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        sys.exit(run_item_index(tool, args))
+    if not queries and not args.item_name:
+        parser.error("item_name is required unless --batch or --batch-file is given")
+    if args.promotion and queries:
+        parser.error("--promotion can't be combined with --batch or --batch-file")
+    if args.promotion and args.format != "text":
+        parser.error("--promotion only supports --format text")
+    if args.watch:
+        if queries or args.promotion:
+            parser.error(
+                "--watch can't be combined with --batch, --batch-file or --promotion"
+            )
+        if args.format == "json":
+            parser.error("--watch streams records, use --format ndjson or tsv")
+        if args.watch_interval <= 0:
+            parser.error("--watch-interval must be positive")
+    elif args.exit_on_match or args.watch_timeout is not None:
+        parser.error("--exit-on-match and --watch-timeout need --watch")
+    if args.version_range:
+        from versions import VersionRange
+
+        artifact_types = {artifact_type for _, artifact_type in queries} or {
+            args.artifact_type
+        }
+        try:
+            for artifact_type in artifact_types & VERSION_SCHEMES.keys():
+                VersionRange(args.version_range, VERSION_SCHEMES[artifact_type])
+        except ValueError as e:
+            parser.error(str(e))
+
+    results = None
+    tool = None
+    # What --stats reports when the daemon answers; otherwise it's the tool's
+    daemon_metrics = Metrics()
+    if args.daemon and not queries and not args.promotion and not args.watch:
+        results = query_via_daemon(args, daemon_metrics)
+
+    if results is None:
+        from artifactory_http import ArtifactoryHttpError
+
+        try:
+            tool = build_tool(args)
+        except ArtifactoryHttpError as e:
+            logger.error(str(e))
+            sys.exit(1)
+
+    writer = None
+    if args.format != "text":
+        from record_output import RecordWriter
+
+        writer = RecordWriter(args.format, args.env or args.environment)
+        if tool is not None:
+            tool.on_candidate = writer.candidate
+
+    try:
+        if results is None:
+            if queries:
+                tool.client.set_max_in_flight(args.concurrency)
+                status = run_batch(tool, queries, args, writer)
+                if writer is not None:
+                    writer.close()
+                sys.exit(status)
+            if args.promotion:
+                sys.exit(run_promotion(tool, args))
+            if args.watch:
+                sys.exit(run_watch(tool, args, writer))
+
+            results = tool.query(
+                args.artifact_type,
+                args.item_name,
+                args.limit,
+                args.tag_length,
+                args.version_range,
+                args.pre,
+            )
+
+        if writer is not None:
+            writer.finish(args.artifact_type, args.item_name, results)
+            writer.close()
+        elif results:
+            print_results(
+                results,
+                args.artifact_type,
+                args.item_name,
+                highlight=not args.no_highlight,
+            )
         else:
             logger.warning(f"No results found for {args.item_name}")
 
@@ -389,6 +2545,8 @@ Examples:
     except Exception as e:
         logger.error(f"An error occurred: {e}")
         sys.exit(1)
+    finally:
+        report_stats(daemon_metrics if tool is None else tool.metrics, args)
 
 
 if __name__ == "__main__":
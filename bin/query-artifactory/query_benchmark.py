@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Query-path benchmark for the Artifactory Query Tool.
+
+Starts the synthetic Artifactory emulator (see artifactory_emulator.py) for
+each repo size, then runs `query_docker`, `query_helm` and `query_pypi`
+against it through the HTTP backend and through a fake `jf` on PATH. Each
+case runs in a fresh interpreter so its peak RSS is its own, and reports:
+
+  * wall time of the query (median over --repeat runs; tool setup excluded)
+  * searches: AQL/search requests the emulator answered
+  * bytes: response bytes the emulator sent, i.e. JSON the tool had to parse
+    (for the jf backend, the fake jf re-encodes it first, as the real one does)
+  * peak RSS of the process running the query
+
+Docker is measured down each of its paths: the single AQL request, the
+paged search (--no-aql) and the streamed search (--no-aql --stream).
+
+Results can be saved with --json and compared with a later run using
+--compare, to see how a change affects each path.
+
+Usage:
+    ./query_benchmark.py
+    ./query_benchmark.py --artifacts 10000 100000 1000000 --latency-ms 20
+    ./query_benchmark.py --json before.json
+    ./query_benchmark.py --compare before.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from artifactory_emulator import DEFAULT_ITEM, write_fake_jf
+
+TOOL_DIR = Path(__file__).resolve().parent
+
+# Docker query paths, and the tool flags that force each one
+DOCKER_PATHS = {
+    "aql": [],
+    "paged": ["--no-aql"],
+    "stream": ["--no-aql", "--stream"],
+}
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case: Dict) -> Dict:
+    """Run one query against the emulator in this process and measure it."""
+    sys.path.insert(0, str(TOOL_DIR))
+    from artifactory_emulator import emulator_stats, reset_emulator_stats
+    from query_artifactory import build_parser, build_tool
+
+    args = build_parser().parse_args(
+        [
+            case["item"],
+            case["artifact_type"],
+            "--no-cache",
+            "--backend",
+            case["backend"],
+            "--limit",
+            str(case["limit"]),
+            "--tag-length",
+            str(case["tag_length"]),
+            *DOCKER_PATHS.get(case["path"], []),
+        ]
+    )
+    tool = build_tool(args)
+
+    reset_emulator_stats(case["url"])
+    start = time.perf_counter()
+    records = tool.query(
+        args.artifact_type, args.item_name, args.limit, args.tag_length
+    )
+    wall = time.perf_counter() - start
+    stats = emulator_stats(case["url"])
+
+    return {
+        "wall_ms": wall * 1000,
+        "searches": stats["searches"],
+        "bytes": stats["bytes"],
+        "peak_rss_mb": peak_rss_bytes() / 2**20,
+        "results": len(records),
+    }
+
+
+def start_emulator(args: argparse.Namespace, artifacts: int) -> subprocess.Popen:
+    """Start an emulator subprocess on a free port."""
+    command = [
+        sys.executable,
+        str(TOOL_DIR / "artifactory_emulator.py"),
+        "--port",
+        "0",
+        "--artifacts",
+        str(artifacts),
+        "--item",
+        args.item,
+        "--tag-lengths",
+        args.tag_lengths,
+        "--latency-ms",
+        str(args.latency_ms),
+        "--jitter-ms",
+        str(args.jitter_ms),
+    ]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+
+def measure(
+    case: Dict, env: Dict[str, str], repeat: int, verbose: bool
+) -> Optional[Dict]:
+    """Run a case `repeat` times in fresh interpreters; None if it failed."""
+    runs = []
+    for _ in range(max(1, repeat)):
+        result = subprocess.run(
+            [sys.executable, __file__, "--run-case", json.dumps(case)],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if verbose or result.returncode != 0:
+            sys.stderr.write(result.stderr)
+        if result.returncode != 0:
+            return None
+        runs.append(json.loads(result.stdout.splitlines()[-1]))
+
+    return {
+        **runs[0],
+        "wall_ms": statistics.median(run["wall_ms"] for run in runs),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+    }
+
+
+def case_name(case: Dict) -> str:
+    return (
+        f"{case['artifacts']}/{case['artifact_type']}/{case['path']}/{case['backend']}"
+    )
+
+
+def print_table(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+    header = f"{'case':<34} {'wall ms':>10} {'searches':>9} {'bytes':>12} {'RSS MB':>8} {'results':>8}"
+    if baseline:
+        header += f" {'wall vs base':>13}"
+    print(header)
+    for name, result in results.items():
+        line = (
+            f"{name:<34} {result['wall_ms']:>10.1f} {result['searches']:>9}"
+            f" {result['bytes']:>12} {result['peak_rss_mb']:>8.1f} {result['results']:>8}"
+        )
+        base = baseline.get(name)
+        if base and base["wall_ms"]:
+            change = (result["wall_ms"] - base["wall_ms"]) / base["wall_ms"] * 100
+            line += f" {change:>+12.1f}%"
+        print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark query paths against a synthetic Artifactory",
+    )
+    parser.add_argument(
+        "--artifacts",
+        type=int,
+        nargs="+",
+        default=[10_000],
+        help="Repo sizes to benchmark, in artifacts per repo (default: 10000)",
+    )
+    parser.add_argument(
+        "--types",
+        nargs="+",
+        choices=["docker", "helm", "pypi"],
+        default=["docker", "helm", "pypi"],
+    )
+    parser.add_argument(
+        "--backends", nargs="+", choices=["http", "cli"], default=["http", "cli"]
+    )
+    parser.add_argument(
+        "--docker-paths",
+        nargs="+",
+        choices=list(DOCKER_PATHS),
+        default=list(DOCKER_PATHS),
+    )
+    parser.add_argument(
+        "--tag-lengths",
+        default="7:0.8,10:0.15,12:0.05",
+        help="Docker tag length distribution (default: 7:0.8,10:0.15,12:0.05)",
+    )
+    parser.add_argument("--tag-length", type=int, default=7, help="default: 7")
+    parser.add_argument("--limit", type=int, default=5, help="default: 5")
+    parser.add_argument("--item", default=DEFAULT_ITEM)
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="Added to every request"
+    )
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per case (default: 3)"
+    )
+    parser.add_argument("--json", metavar="PATH", help="Write results to a file")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="Compare with results saved by --json"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show tool logging")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return 0
+
+    baseline = {}
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+
+    results: Dict[str, Dict] = {}
+    failed = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_fake_jf(Path(tmpdir))
+        for artifacts in args.artifacts:
+            emulator = start_emulator(args, artifacts)
+            try:
+                url = emulator.stdout.readline().strip()
+                env = dict(
+                    os.environ,
+                    JF_URL=url,
+                    JF_ACCESS_TOKEN="benchmark",
+                    JFROG_CLI_HOME_DIR=tmpdir,
+                    PATH=f"{tmpdir}{os.pathsep}{os.environ.get('PATH', '')}",
+                )
+                for artifact_type in args.types:
+                    paths = (
+                        args.docker_paths if artifact_type == "docker" else ["search"]
+                    )
+                    for path in paths:
+                        for backend in args.backends:
+                            case = {
+                                "url": url,
+                                "artifacts": artifacts,
+                                "artifact_type": artifact_type,
+                                "path": path,
+                                "backend": backend,
+                                "item": args.item,
+                                "limit": args.limit,
+                                "tag_length": args.tag_length,
+                            }
+                            result = measure(case, env, args.repeat, args.verbose)
+                            if result is None:
+                                print(f"FAILED: {case_name(case)}", file=sys.stderr)
+                                failed = True
+                                continue
+                            results[case_name(case)] = result
+            finally:
+                emulator.terminate()
+                emulator.wait()
+
+    print_table(results, baseline)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
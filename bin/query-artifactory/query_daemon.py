@@ -0,0 +1,324 @@
+"""
+Resident query daemon for the Artifactory Query Tool.
+
+`query_artifactory.py --serve` keeps one warm `ArtifactoryQueryTool` per
+environment (HTTP connection pool, SQLite cache handle) plus an in-memory copy
+of recent results, and answers queries over a Unix domain socket. Editor
+integrations and `run.zsh` fire many small queries in a row; through the
+daemon each one costs a socket round trip rather than interpreter startup,
+client setup and a cold cache.
+
+The protocol is one JSON object per line in each direction:
+
+    -> {"op": "query", "environment": "dev", "artifact_type": "docker",
+        "item_name": "sre-libs", "limit": 5, "tag_length": 7,
+        "version_range": null, "prereleases": false}
+    <- {"results": [{"created": ..., "repo": ..., ...}, ...]}
+    <- {"error": "Unsupported artifact type: ..."}
+
+`{"op": "ping"}` and `{"op": "shutdown"}` are also understood. The daemon
+exits on its own after `idle_timeout` seconds without a request.
+
+A query also carries the `settings` its tools should be built with (backend,
+cache, search flags). A daemon started with other settings refuses it rather
+than silently answering from its own, and the client runs the query itself.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from artifact_records import ArtifactRecord
+
+DEFAULT_IDLE_TIMEOUT = 15 * 60  # seconds without a request before exiting
+DEFAULT_RESULT_TTL = 60  # seconds results are answered from memory
+DEFAULT_MAX_RESULTS = 256  # query results kept in memory, least recently used dropped
+SPAWN_TIMEOUT = 10  # seconds to wait for a spawned daemon to start listening
+REQUEST_TIMEOUT = 120  # seconds to wait for an answer to one query
+
+
+class DaemonError(Exception):
+    """Raised when the daemon can't be reached or reports an error."""
+
+
+def default_socket_path() -> Path:
+    """
+    Return the socket path, in XDG_RUNTIME_DIR if set.
+
+    Otherwise the socket goes in a per-user directory in the temp dir, created
+    with mode 0700. The temp dir is shared, so if that directory already
+    exists it must belong to this user and be private to them.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "query-artifactory.sock"
+    directory = Path(tempfile.gettempdir()) / f"query-artifactory-{os.getuid()}"
+    try:
+        directory.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_mode & 0o077:
+        raise DaemonError(f"{directory} is not a private directory, not using it")
+    _check_owner(directory, info)
+    return directory / "daemon.sock"
+
+
+def _check_owner(path: Path, info: Optional[os.stat_result] = None) -> None:
+    """Refuse a path another user could have put there for us to connect to."""
+    info = info or os.lstat(path)
+    if info.st_uid != os.getuid():
+        raise DaemonError(f"{path} belongs to another user, not using it")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answers newline-delimited JSON requests on one connection."""
+
+    server: "QueryDaemon"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                response = self.server.dispatch(request)
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+            if response.get("stopping"):
+                break
+
+
+class QueryDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves queries from warm, per-environment query tools.
+
+    `tool_factory(environment)` builds an `ArtifactoryQueryTool`; it is called
+    once per environment, on its first request. Identical queries within
+    `result_ttl` seconds are answered from memory without touching the tool;
+    at most `max_results` of them are kept, dropping the least recently used.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: Path,
+        tool_factory: Callable[[str], object],
+        result_ttl: float = DEFAULT_RESULT_TTL,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        settings: Optional[Dict[str, Any]] = None,
+        max_results: int = DEFAULT_MAX_RESULTS,
+    ):
+        self.socket_path = Path(socket_path)
+        self.tool_factory = tool_factory
+        self.settings = settings
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self.idle_timeout = idle_timeout
+        self._tools: Dict[str, object] = {}
+        self._tools_lock = threading.Lock()
+        # Least recently used first
+        self._results: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._results_lock = threading.Lock()
+        self._last_request = time.monotonic()
+        self._stopping = threading.Event()
+
+        _remove_stale_socket(self.socket_path)
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        old_umask = os.umask(0o077)  # Only this user may connect
+        try:
+            super().__init__(str(self.socket_path), _RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def tool(self, environment: str):
+        """Return the warm query tool for an environment, building it if needed."""
+        with self._tools_lock:
+            if environment not in self._tools:
+                self._tools[environment] = self.tool_factory(environment)
+            return self._tools[environment]
+
+    def dispatch(self, request: Dict) -> Dict:
+        """Answer one decoded request."""
+        self._last_request = time.monotonic()
+        op = request.get("op", "query")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "shutdown":
+            self._stopping.set()
+            return {"ok": True, "stopping": True}
+        if op != "query":
+            raise ValueError(f"Unknown op: {op}")
+        settings = request.get("settings")
+        if settings != self.settings:
+            differing = sorted(
+                name
+                for name in {*(settings or {}), *(self.settings or {})}
+                if (settings or {}).get(name) != (self.settings or {}).get(name)
+            )
+            raise DaemonError(
+                f"Daemon was started with different {', '.join(differing)}"
+            )
+        return {"results": self.query(request)}
+
+    def query(self, request: Dict) -> List[Dict]:
+        """Run a query, answering repeats from memory while they're fresh."""
+        environment = request.get("environment", "dev")
+        artifact_type = request["artifact_type"]
+        item_name = request["item_name"]
+        limit = int(request.get("limit", 5))
+        tag_length = int(request.get("tag_length", 7))
+        version_range = request.get("version_range")
+        prereleases = bool(request.get("prereleases", False))
+        key = (
+            environment,
+            artifact_type,
+            item_name,
+            limit,
+            tag_length,
+            version_range,
+            prereleases,
+        )
+
+        if not request.get("refresh"):
+            with self._results_lock:
+                cached = self._results.get(key)
+                if cached is not None:
+                    self._results.move_to_end(key)
+            if cached is not None and time.monotonic() - cached[0] < self.result_ttl:
+                return cached[1]
+
+        records = self.tool(environment).query(
+            artifact_type, item_name, limit, tag_length, version_range, prereleases
+        )
+        results = [record.as_dict() for record in records]
+        self._remember(key, results)
+        return results
+
+    def _remember(self, key: Tuple, results: List[Dict]) -> None:
+        """Keep a query's results, dropping expired ones and the least recently used."""
+        now = time.monotonic()
+        with self._results_lock:
+            expired = [
+                cached_key
+                for cached_key, (stored, _) in self._results.items()
+                if now - stored >= self.result_ttl
+            ]
+            for cached_key in expired:
+                del self._results[cached_key]
+            self._results[key] = (now, results)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def serve(self) -> None:
+        """Handle requests until shut down or idle for `idle_timeout` seconds."""
+        self.timeout = 1.0
+        try:
+            while not self._stopping.is_set():
+                self.handle_request()
+                if time.monotonic() - self._last_request > self.idle_timeout:
+                    break
+        finally:
+            self.server_close()
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    """Remove a socket file left behind by a dead daemon; fail if one is alive."""
+    if not socket_path.exists():
+        return
+    try:
+        with _connect(socket_path, timeout=1.0):
+            raise DaemonError(f"A daemon is already listening on {socket_path}")
+    except (ConnectionRefusedError, FileNotFoundError):
+        socket_path.unlink(missing_ok=True)
+
+
+def _connect(socket_path: Path, timeout: float) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def send_request(
+    request: Dict, socket_path: Path, timeout: float = REQUEST_TIMEOUT
+) -> Dict:
+    """Send one request to a running daemon and return its decoded response."""
+    _check_owner(socket_path)
+    with _connect(socket_path, timeout) as sock:
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise DaemonError("Daemon closed the connection without answering")
+    return json.loads(line)
+
+
+def spawn_daemon(
+    command: List[str], socket_path: Path, cwd: Optional[str] = None
+) -> None:
+    """Start a detached daemon and wait until it accepts connections."""
+    subprocess.Popen(
+        command,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + SPAWN_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            send_request({"op": "ping"}, socket_path, timeout=1.0)
+            return
+        except (OSError, DaemonError):
+            time.sleep(0.05)
+    raise DaemonError(f"Daemon did not start listening on {socket_path}")
+
+
+def query_daemon(
+    request: Dict,
+    socket_path: Path,
+    spawn: Optional[Callable[[], None]] = None,
+) -> List[ArtifactRecord]:
+    """
+    Run a query through the daemon, starting it with `spawn()` if it's not running.
+
+    Raises DaemonError if the daemon can't be reached or the query failed.
+    """
+    try:
+        try:
+            response = send_request(request, socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            if spawn is None:
+                raise DaemonError(f"No daemon listening on {socket_path}") from e
+            spawn()
+            response = send_request(request, socket_path)
+    except OSError as e:
+        raise DaemonError(f"Daemon request failed: {e}") from e
+
+    if "error" in response:
+        raise DaemonError(response["error"])
+    return [ArtifactRecord.from_dict(result) for result in response["results"]]
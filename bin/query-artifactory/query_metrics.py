@@ -0,0 +1,252 @@
+"""
+Per-call instrumentation for the Artifactory Query Tool.
+
+`JFrogClient` owns a `Metrics` registry that its requests and the query
+methods record into:
+
+  * timers (`request`, `command`, `decode`, `query`, `filter`,
+    `daemon_request`): latency of each call, labelled by backend, operation
+    or artifact type
+  * counters: `bytes_received`, `artifacts_parsed`, `pages_fetched` and
+    `cache_lookups` (labelled hit / stale / miss)
+
+The registry can be rendered as a human-readable summary (`--stats`), dumped
+as JSON (`--stats-json`) or written as a Prometheus textfile-collector file
+(`--prometheus-textfile`) so tail latency can be tracked over time.
+
+query_artifactory imports this at startup, so json, tempfile etc. are imported
+where they're used.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+# Prometheus histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Recent samples kept per timer for the quantiles in the summary
+SAMPLE_WINDOW = 2048
+METRIC_PREFIX = "query_artifactory"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    return ",".join(f"{key}={value}" for key, value in labels)
+
+
+class _Timer:
+    """Latency observations for one timer and label set."""
+
+    __slots__ = ("count", "total", "maximum", "buckets", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        self.samples.append(seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """Thread-safe registry of call latencies and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers: Dict[Tuple[str, Labels], _Timer] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record one latency observation."""
+        key = (name, _labels(labels))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = _Timer()
+            timer.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Time the body of a `with` block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def quantile(
+        self, name: str, q: float, min_samples: int = 1, **labels
+    ) -> Optional[float]:
+        """A quantile of one timer's recent samples, or None with too few of them."""
+        with self._lock:
+            timer = self._timers.get((name, _labels(labels)))
+            if timer is None or len(timer.samples) < min_samples:
+                return None
+            return timer.quantile(q)
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        """Add to a counter."""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels) -> float:
+        """Return a counter's value, summed over any labels not given."""
+        wanted = set(_labels(labels))
+        with self._lock:
+            return sum(
+                value
+                for (counter_name, counter_labels), value in self._counters.items()
+                if counter_name == name and wanted <= set(counter_labels)
+            )
+
+    def snapshot(self) -> Dict:
+        """Return every timer and counter as JSON-serialisable data."""
+        with self._lock:
+            timers = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": timer.count,
+                    "total_seconds": timer.total,
+                    "p50_seconds": timer.quantile(0.5),
+                    "p95_seconds": timer.quantile(0.95),
+                    "p99_seconds": timer.quantile(0.99),
+                    "max_seconds": timer.maximum,
+                }
+                for (name, labels), timer in sorted(self._timers.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {"timers": timers, "counters": counters}
+
+    def summary(self) -> str:
+        """Render the registry as a human-readable table."""
+        snapshot = self.snapshot()
+        lines = [
+            f"{'timer':<40} {'calls':>6} {'total ms':>10} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'max ms':>8}"
+        ]
+        for timer in snapshot["timers"]:
+            name = timer["name"]
+            if timer["labels"]:
+                name += f"{{{_format_labels(tuple(timer['labels'].items()))}}}"
+            lines.append(
+                f"{name:<40} {timer['count']:>6} {timer['total_seconds'] * 1000:>10.1f}"
+                f" {timer['p50_seconds'] * 1000:>8.1f} {timer['p95_seconds'] * 1000:>8.1f}"
+                f" {timer['max_seconds'] * 1000:>8.1f}"
+            )
+        if snapshot["counters"]:
+            lines.append("")
+            lines.append(f"{'counter':<40} {'value':>12}")
+            for counter in snapshot["counters"]:
+                name = counter["name"]
+                if counter["labels"]:
+                    name += f"{{{_format_labels(tuple(counter['labels'].items()))}}}"
+                lines.append(f"{name:<40} {_format_value(counter['value']):>12}")
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        """Render the registry as JSON."""
+        import json
+
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = METRIC_PREFIX) -> str:
+        """Render the registry in the Prometheus text exposition format."""
+        with self._lock:
+            timers = sorted(self._timers.items())
+            counters = sorted(self._counters.items())
+
+        lines: List[str] = []
+        seen = set()
+        for (name, labels), timer in timers:
+            metric = f"{prefix}_{name}_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# HELP {metric} Latency of {name} calls.")
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, count in zip(LATENCY_BUCKETS, timer.buckets, strict=True):
+                lines.append(
+                    f"{metric}_bucket{_prometheus_labels(labels, le=bound)} {count}"
+                )
+            lines.append(
+                f"{metric}_bucket{_prometheus_labels(labels, le='+Inf')} {timer.count}"
+            )
+            lines.append(f"{metric}_sum{_prometheus_labels(labels)} {timer.total}")
+            lines.append(f"{metric}_count{_prometheus_labels(labels)} {timer.count}")
+
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# HELP {metric} Total {name.replace('_', ' ')}.")
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_prometheus_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_textfile(self, path: str) -> None:
+        """
+        Write the registry for the node_exporter textfile collector.
+
+        The file is written next to its destination and renamed into place, so
+        the collector never reads a partial file.
+        """
+        import os
+        import tempfile
+        from pathlib import Path
+
+        path = Path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _format_value(value: float) -> str:
+    """
+    Format a counter without losing precision: integers in full, floats with
+    enough digits to round-trip. `:g` keeps 6 significant digits, which turns
+    a byte count of 1234567 into 1.23457e+06 and breaks rate() over it.
+    """
+    if isinstance(value, int):
+        return f"{value:d}"
+    return repr(float(value))
+
+
+def _prometheus_labels(labels: Labels, **extra) -> str:
+    pairs = list(labels) + [(key, str(value)) for key, value in extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
@@ -0,0 +1,115 @@
+"""
+Machine-readable output for the Artifactory Query Tool.
+
+`--format ndjson|json|tsv` replaces the coloured text, "MOST RECENT" footer
+and UI link with structured records that pipelines can read directly:
+
+  * ndjson: one `artifact` record per artifact as soon as it is known (Docker
+    tags are streamed while the search is still running), then one `summary`
+    record per query holding the final results in order
+  * json: the summary records only, as one array once everything is done
+  * tsv: one line per artifact as soon as it is known, with the columns
+    artifact_type, created, repo, item, version, sha and path
+
+Records look like:
+
+    {"record": "artifact", "artifact_type": "docker", "created": ...,
+     "repo": ..., "item": ..., "version": ..., "sha": ..., "path": ...}
+    {"record": "summary", "artifact_type": "docker", "item": ...,
+     "environment": "dev", "count": 2, "results": [{...}, {...}], "error": null}
+"""
+
+import json
+import sys
+import threading
+from typing import Dict, List, Optional, Set, TextIO, Tuple
+
+from artifact_records import ArtifactRecord
+
+STRUCTURED_FORMATS = ["ndjson", "json", "tsv"]
+TSV_FIELDS = ["created", "repo", "item", "version", "sha", "path"]
+
+
+class RecordWriter:
+    """
+    Writes query results in one of the structured formats.
+
+    Safe to call from several threads at once, as batch mode does.
+    """
+
+    def __init__(
+        self, output_format: str, environment: str, stream: Optional[TextIO] = None
+    ):
+        if output_format not in STRUCTURED_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.format = output_format
+        self.environment = environment
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+        # (artifact_type, repo, item, version) of every artifact written
+        self._emitted: Set[Tuple[str, str, str, str]] = set()
+        self._summaries: List[Dict] = []
+
+    def candidate(self, artifact_type: str, record: ArtifactRecord) -> None:
+        """Write an artifact as soon as it's known, unless already written."""
+        with self._lock:
+            self._write_artifact(artifact_type, record)
+
+    def finish(
+        self,
+        artifact_type: str,
+        item_name: str,
+        records: List[ArtifactRecord],
+        error: Optional[str] = None,
+    ) -> None:
+        """Write any results not streamed yet, then the query's summary."""
+        summary = {
+            "record": "summary",
+            "artifact_type": artifact_type,
+            "item": item_name,
+            "environment": self.environment,
+            "count": len(records),
+            "results": [record.as_dict() for record in records],
+            "error": error,
+        }
+        with self._lock:
+            for record in records:
+                self._write_artifact(artifact_type, record)
+            if self.format == "ndjson":
+                self._write_line(json.dumps(summary))
+            elif self.format == "json":
+                self._summaries.append(summary)
+
+    def close(self) -> None:
+        """Write anything held back until the end (the json document)."""
+        if self.format == "json":
+            with self._lock:
+                json.dump(self._summaries, self.stream, indent=2)
+                self._write_line("")
+
+    def _write_artifact(self, artifact_type: str, record: ArtifactRecord) -> None:
+        # Keyed on identity, not the whole record: a tag found while paging
+        # may be finished with another of its files (created, size, sha)
+        key = (artifact_type, record.repo, record.item, record.version)
+        if self.format == "json" or key in self._emitted:
+            return
+        self._emitted.add(key)
+        fields = record.as_dict()
+        if self.format == "ndjson":
+            self._write_line(
+                json.dumps(
+                    {"record": "artifact", "artifact_type": artifact_type, **fields}
+                )
+            )
+        else:
+            values = [artifact_type] + [fields[name] for name in TSV_FIELDS]
+            self._write_line("\t".join(_tsv_escape(value) for value in values))
+
+    def _write_line(self, line: str) -> None:
+        self.stream.write(line + "\n")
+        # Flushed per line so a downstream reader sees records straight away
+        self.stream.flush()
+
+
+def _tsv_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
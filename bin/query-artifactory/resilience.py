@@ -0,0 +1,181 @@
+"""
+Failure handling for the jf commands run by the Artifactory Query Tool.
+
+A stalled Artifactory node shouldn't turn a query into a 30 second hang that
+then quietly returns nothing. `JFrogClient._run_command` (and its asyncio
+counterpart in `AsyncJFrogClient`) uses these to:
+
+  * hedge: once a command has run longer than the p95 of recent successful
+    runs (`hedge_delay`), start a duplicate and take whichever answers first
+  * retry a failed or timed-out command after a jittered, exponentially
+    growing pause (`backoff_delay`), within the same overall deadline
+  * fail fast with a `CircuitBreaker` while the backend keeps failing,
+    instead of waiting out every timeout again
+
+Failures are raised as `JFrogCommandError`, whose `outcome` says what went
+wrong (error, timeout, not_found or circuit_open). `CommandAttempts` holds the
+retry and breaker decisions, so the sync and async clients share them and only
+differ in how they run a command and wait.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+# Hedge after this long while there isn't enough history for a p95
+DEFAULT_HEDGE_DELAY = 5.0
+MIN_HEDGE_DELAY = 0.05  # seconds, so fast commands aren't all hedged
+HEDGE_MIN_SAMPLES = 10  # successful runs needed before trusting their p95
+
+DEFAULT_MAX_RETRIES = 2
+BACKOFF_BASE = 0.2  # seconds
+BACKOFF_CAP = 5.0
+
+FAILURE_THRESHOLD = 5  # consecutive failures that open the circuit
+RESET_TIMEOUT = 30.0  # seconds the circuit stays open before a trial call
+
+
+class JFrogCommandError(Exception):
+    """Raised when a jf command fails; `outcome` says how."""
+
+    def __init__(self, message: str, outcome: str):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+def hedge_delay(p95: Optional[float]) -> float:
+    """How long to wait before hedging, given the p95 of recent runs (if known)."""
+    if p95 is None:
+        return DEFAULT_HEDGE_DELAY
+    return max(MIN_HEDGE_DELAY, p95)
+
+
+def backoff_delay(
+    attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP
+) -> float:
+    """
+    Pause before retry number `attempt` (1 for the first retry).
+
+    "Full jitter": uniformly random up to an exponentially growing bound, so
+    clients that failed together don't all retry together.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a backend after repeated failures, for a while.
+
+    Closed: calls go through, counting consecutive failures. After
+    `failure_threshold` of them the circuit opens, and calls are refused
+    until `reset_timeout` has passed. Then it is half open: one trial call
+    goes through, closing the circuit if it succeeds or reopening it if not.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        """The current state: "closed", "open" or "half_open"."""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Hand back an allowed call that never reached the backend."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+class CommandAttempts:
+    """
+    The retry and circuit breaker policy for one command, without running it.
+
+    Callers loop: `begin()` before each attempt, which raises while the
+    circuit is open, then `succeeded()`, or `failed(error)`, which re-raises
+    the error once it shouldn't be retried and otherwise returns the pause
+    before the next attempt. A missing `jf` isn't retried or held against
+    the backend.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        breaker: CircuitBreaker,
+        max_retries: int,
+        deadline: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.command = command
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self._clock = clock
+        self.attempt = 0
+
+    def begin(self) -> None:
+        """Check that an attempt may go ahead; raises if the circuit is open."""
+        if not self.breaker.allow():
+            raise JFrogCommandError(
+                f"Not running {self.command}: jf keeps failing, "
+                f"retrying in up to {self.breaker.reset_timeout:g}s",
+                "circuit_open",
+            )
+
+    def succeeded(self) -> None:
+        self.breaker.record_success()
+
+    def failed(self, error: JFrogCommandError) -> float:
+        """Record a failed attempt; returns the pause before retrying, or raises."""
+        if error.outcome == "not_found":
+            self.breaker.release()
+            raise error
+        self.breaker.record_failure()
+        self.attempt += 1
+        delay = backoff_delay(self.attempt)
+        if self.attempt > self.max_retries or self._clock() + delay >= self.deadline:
+            raise error
+        return delay
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the Artifactory Query Tool.
+
+Runs `query_artifactory.py --help` in fresh interpreters under
+`python -X importtime` and checks two things:
+
+  * none of the modules that are meant to be imported lazily (logging setup,
+    colorama, the HTTP stack, SQLite, ...) were loaded, and
+  * the cumulative import time of `query_artifactory` is within budget.
+
+Bytecode is compiled into a throwaway pycache first, so the numbers measure
+importing rather than compiling, and the median of several runs is used.
+Exits non-zero if either check fails, so it can gate `make startup`.
+
+Usage:
+    ./startup_benchmark.py
+    ./startup_benchmark.py --runs 20 --budget-ms 20 --top 15
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Set
+
+TOOL_DIR = Path(__file__).resolve().parent
+MODULE = "query_artifactory"
+DEFAULT_RUNS = 9
+DEFAULT_BUDGET_MS = 25.0
+
+# Modules `--help` must not import; they are loaded where they're first needed
+DEFERRED_MODULES = [
+    "artifact_cache",
+    "artifact_watch",
+    "artifactory_async",
+    "artifactory_http",
+    "asyncio",
+    "colorama",
+    "concurrent.futures",
+    "digest_index",
+    "http.client",
+    "item_index",
+    "json",
+    "json_stream",
+    "lib.dexcom_logging",
+    "logging",
+    "promotion_matrix",
+    "record_output",
+    "resilience",
+    "sqlite3",
+    "subprocess",
+    "versions",
+]
+
+# Imports the tool, runs `--help`, then prints every module that was loaded
+# along the way (modules the interpreter had already loaded don't count)
+PROBE = f"""
+import sys
+before = set(sys.modules)
+sys.argv = ["{MODULE}.py", "--help"]
+import {MODULE}
+try:
+    {MODULE}.main()
+except SystemExit:
+    pass
+sys.stdout = sys.__stdout__
+print("\\n".join(sorted(set(sys.modules) - before)))
+"""
+
+
+class StartupRun(NamedTuple):
+    """Import times (microseconds, cumulative) and new modules of one run."""
+
+    import_times: Dict[str, int]
+    modules: Set[str]
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Parse `-X importtime` output into module -> cumulative microseconds."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        # import time: self [us] | cumulative | imported package
+        _, cumulative_us, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative_us)
+        except ValueError:
+            continue  # The header line
+    return times
+
+
+def run_once(env: Dict[str, str]) -> StartupRun:
+    """Start a fresh interpreter, run `--help` and record what it imported."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=TOOL_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # --help output comes first, the module list is printed after it
+    modules = set(result.stdout.split("\n\n")[-1].split())
+    return StartupRun(parse_importtime(result.stderr), modules)
+
+
+def measure(runs: int = DEFAULT_RUNS) -> List[StartupRun]:
+    """Run the probe `runs` times after one warm-up run that compiles bytecode."""
+    with tempfile.TemporaryDirectory() as pycache:
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        run_once(env)
+        return [run_once(env) for _ in range(max(1, runs))]
+
+
+def eagerly_imported(runs: List[StartupRun]) -> List[str]:
+    """Return the deferred modules that were imported anyway."""
+    loaded = set().union(*(run.modules for run in runs))
+    return [name for name in DEFERRED_MODULES if name in loaded]
+
+
+def median_ms(runs: List[StartupRun], module: str = MODULE) -> float:
+    """Median cumulative import time of a module across runs, in milliseconds."""
+    return statistics.median(run.import_times.get(module, 0) for run in runs) / 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Check that query_artifactory starts quickly",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=DEFAULT_RUNS,
+        help=f"Fresh interpreters to time (default: {DEFAULT_RUNS})",
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"Maximum median import time of {MODULE} (default: {DEFAULT_BUDGET_MS})",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="How many of the slowest imports to list (default: 10)",
+    )
+    args = parser.parse_args()
+
+    runs = measure(args.runs)
+    total = median_ms(runs)
+
+    print(f"{MODULE} import time (median of {len(runs)}): {total:.1f} ms")
+    slowest = sorted(
+        (name for name in runs[0].modules if name in runs[0].import_times),
+        key=lambda name: median_ms(runs, name),
+        reverse=True,
+    )
+    for name in slowest[: args.top]:
+        print(f"  {median_ms(runs, name):7.1f} ms  {name}")
+
+    failed = False
+    eager = eagerly_imported(runs)
+    if eager:
+        print(f"FAIL: imported at startup but meant to be lazy: {', '.join(eager)}")
+        failed = True
+    if total > args.budget_ms:
+        print(f"FAIL: {total:.1f} ms is over the {args.budget_ms:.1f} ms budget")
+        failed = True
+    if not failed:
+        print(f"OK: within the {args.budget_ms:.1f} ms budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
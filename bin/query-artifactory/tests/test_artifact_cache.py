@@ -0,0 +1,108 @@
+"""
+Tests for the artifact_cache module.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_cache import ArtifactCache
+
+
+def artifact(name: str, created: str) -> dict:
+    return {"path": f"repo/item/{name}", "created": created}
+
+
+class TestArtifactCache(unittest.TestCase):
+    """Test the ArtifactCache class."""
+
+    def setUp(self):
+        """Create a cache in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ArtifactCache(Path(self.tmpdir.name) / "cache.sqlite3", ttl=60)
+
+    def tearDown(self):
+        """Clean up the temporary directory."""
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_missing_key(self):
+        """Test that an unknown key returns None."""
+        self.assertIsNone(self.cache.get("docker:repo/item:7"))
+
+    def test_store_and_get(self):
+        """Test storing a result set and reading it back newest first."""
+        self.cache.store(
+            "key",
+            {
+                "a": artifact("a", "2025-01-01T10:00:00.000Z"),
+                "b": artifact("b", "2025-01-03T10:00:00.000Z"),
+                "c": artifact("c", "2025-01-02T10:00:00.000Z"),
+            },
+            limit=3,
+        )
+
+        entry = self.cache.get("key")
+
+        self.assertEqual(
+            [a["path"] for a in entry.newest(2)], ["repo/item/b", "repo/item/c"]
+        )
+        self.assertEqual(entry.high_water, "2025-01-03T10:00:00.000Z")
+        self.assertTrue(entry.is_fresh(60))
+        self.assertTrue(entry.covers(3))
+        self.assertFalse(entry.covers(4))
+
+    def test_short_result_set_is_complete(self):
+        """Test that fewer results than asked for covers any limit."""
+        self.cache.store(
+            "key", {"a": artifact("a", "2025-01-01T10:00:00.000Z")}, limit=5
+        )
+
+        self.assertTrue(self.cache.get("key").covers(100))
+
+    def test_merge_extends_depth(self):
+        """Test merging artifacts created since the high-water mark."""
+        self.cache.store(
+            "key",
+            {
+                "a": artifact("a", "2025-01-01T10:00:00.000Z"),
+                "b": artifact("b", "2025-01-02T10:00:00.000Z"),
+            },
+            limit=2,
+        )
+
+        entry = self.cache.merge(
+            "key",
+            {
+                "b": artifact("b", "2025-01-02T10:00:00.000Z"),
+                "c": artifact("c", "2025-01-03T10:00:00.000Z"),
+            },
+        )
+
+        self.assertEqual(entry.depth, 3)
+        self.assertEqual(entry.high_water, "2025-01-03T10:00:00.000Z")
+        self.assertEqual(entry.newest(1)[0]["path"], "repo/item/c")
+
+    def test_evicts_least_recently_used(self):
+        """Test that eviction drops the least recently used entries first."""
+        self.cache.max_artifacts = 3
+        self.cache.store("old", {"a": artifact("a", "1"), "b": artifact("b", "2")}, 2)
+        time.sleep(0.01)
+        self.cache.store("used", {"c": artifact("c", "3")}, 1)
+        time.sleep(0.01)
+        self.cache.get("old")
+        self.cache.store("new", {"d": artifact("d", "4")}, 1)
+
+        self.assertIsNotNone(self.cache.get("old"))
+        self.assertIsNone(self.cache.get("used"))
+        self.assertIsNotNone(self.cache.get("new"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Tests for the artifact_records module.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_records import (
+    UNKNOWN_CREATED,
+    ArtifactRecord,
+    format_created,
+    helm_chart_version,
+    newest_artifacts,
+    parse_created,
+    top_records,
+    wheel_version,
+)
+
+
+def record(version: str, created: str) -> ArtifactRecord:
+    return ArtifactRecord.from_artifact(
+        {"path": f"repo/item/{version}/manifest.json", "created": created},
+        "repo",
+        "item",
+        version,
+    )
+
+
+class TestCreated(unittest.TestCase):
+    """Test parsing and formatting of created timestamps."""
+
+    def test_round_trip(self):
+        """Test that Artifactory timestamps survive parsing and formatting."""
+        created = parse_created("2025-01-01T10:00:00.123Z")
+
+        self.assertEqual(created, datetime(2025, 1, 1, 10, 0, 0, 123000, timezone.utc))
+        self.assertEqual(format_created(created), "2025-01-01T10:00:00.123Z")
+
+    def test_offsets_are_normalised(self):
+        """Test that timestamps with offsets compare by instant, not text."""
+        self.assertEqual(
+            parse_created("2025-01-01T12:00:00.000+02:00"),
+            parse_created("2025-01-01T10:00:00.000Z"),
+        )
+
+    def test_unparseable(self):
+        """Test that missing timestamps sort first and render empty."""
+        self.assertEqual(parse_created(""), UNKNOWN_CREATED)
+        self.assertEqual(format_created(UNKNOWN_CREATED), "")
+
+
+class TestArtifactRecord(unittest.TestCase):
+    """Test ArtifactRecord serialisation."""
+
+    def test_dict_round_trip(self):
+        """Test that as_dict output rebuilds an equal record."""
+        original = record("abc1234", "2025-01-01T10:00:00.123Z")
+
+        self.assertEqual(ArtifactRecord.from_dict(original.as_dict()), original)
+
+
+class TestTopK(unittest.TestCase):
+    """Test selection of the newest results."""
+
+    def test_top_records(self):
+        """Test that the newest records are returned newest first."""
+        records = [
+            record("aaa0001", "2025-01-02T10:00:00.000Z"),
+            record("aaa0002", "2025-01-04T10:00:00.000Z"),
+            record("aaa0003", "2025-01-01T10:00:00.000Z"),
+            record("aaa0004", "2025-01-03T10:00:00.000Z"),
+        ]
+
+        newest = top_records(iter(records), 2)
+
+        self.assertEqual([r.version for r in newest], ["aaa0002", "aaa0004"])
+
+    def test_newest_artifacts_compares_instants(self):
+        """Test that raw artifacts are ranked by parsed created time."""
+        artifacts = {
+            "a": {"created": "2025-01-01T11:00:00.000+02:00"},  # 09:00 UTC
+            "b": {"created": "2025-01-01T10:00:00.000Z"},
+        }
+
+        self.assertEqual(newest_artifacts(artifacts, 1), [artifacts["b"]])
+
+
+class TestVersions(unittest.TestCase):
+    """Test version extraction from file names."""
+
+    def test_helm_chart_version(self):
+        """Test that the chart name prefix is stripped."""
+        self.assertEqual(helm_chart_version("my-chart-1.2.3.tgz", "my-chart"), "1.2.3")
+
+    def test_wheel_version(self):
+        """Test that the version field of a wheel name is returned."""
+        self.assertEqual(wheel_version("sre_libs-0.3.1-py3-none-any.whl"), "0.3.1")
+
+
+if __name__ == "__main__":
+    unittest.main()
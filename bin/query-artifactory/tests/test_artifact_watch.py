@@ -0,0 +1,164 @@
+"""
+Tests for the artifact_watch module.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_records import ArtifactRecord, format_created
+from artifact_watch import PollBackoff, watch
+
+START = datetime(2025, 1, 2, 10, tzinfo=timezone.utc)
+
+
+def record(tag: str, minutes: int, sha: str = "") -> ArtifactRecord:
+    repo = "dexcom-docker-dev-virtual"
+    return ArtifactRecord(
+        created=START + timedelta(minutes=minutes),
+        repo=repo,
+        item="test-item",
+        version=tag,
+        sha=sha or tag * 5,
+        path=f"{repo}/test-item/{tag}/manifest.json",
+    )
+
+
+class FakeArtifactory:
+    """Serves `find_new` from a list of records that grows as time passes."""
+
+    def __init__(self, records):
+        self.records = list(records)
+        self.published = {}  # Records to add once the clock reaches a time
+        self.now = 0.0
+        self.polls = []
+
+    def find_new(self, created_after):
+        for at, records in list(self.published.items()):
+            if self.now >= at:
+                self.records.extend(records)
+                del self.published[at]
+        self.polls.append(created_after)
+        if created_after is None:
+            return sorted(self.records, key=lambda r: r.created)[-1:]
+        return [r for r in self.records if format_created(r.created) >= created_after]
+
+    def sleep(self, delay):
+        self.now += delay
+
+
+class TestPollBackoff(unittest.TestCase):
+    """Test the poll interval."""
+
+    def test_doubles_while_unchanged_and_resets(self):
+        """Test that empty polls back off up to the maximum, and a change resets it."""
+        backoff = PollBackoff(interval=10, max_interval=50, jitter=0)
+
+        delays = [backoff.next_delay(False) for _ in range(5)]
+        self.assertEqual(delays, [10, 20, 40, 50, 50])
+        self.assertEqual(backoff.next_delay(True), 10)
+        self.assertEqual(backoff.next_delay(False), 10)
+        self.assertEqual(backoff.next_delay(False), 20)
+
+    def test_jitter(self):
+        """Test that delays are spread around the interval."""
+        backoff = PollBackoff(interval=10, jitter=0.1)
+
+        delays = {backoff.next_delay(True) for _ in range(20)}
+
+        self.assertGreater(len(delays), 1)
+        self.assertTrue(all(9 <= delay <= 11 for delay in delays))
+
+    def test_invalid_interval(self):
+        """Test that the interval must be positive."""
+        with self.assertRaises(ValueError):
+            PollBackoff(interval=0)
+
+
+class TestWatch(unittest.TestCase):
+    """Test the watch loop against a fake Artifactory and clock."""
+
+    def run_watch(self, artifactory, baseline, timeout, matches=None):
+        return list(
+            watch(
+                artifactory.find_new,
+                baseline,
+                PollBackoff(interval=10, max_interval=40, jitter=0),
+                matches,
+                timeout=timeout,
+                sleep=artifactory.sleep,
+                clock=lambda: artifactory.now,
+            )
+        )
+
+    def test_yields_only_new_artifacts(self):
+        """Test that existing artifacts, including ones at the mark, aren't repeated."""
+        old = record("aaaaaaa", 0)
+        artifactory = FakeArtifactory([record("zzzzzzz", -5), old])
+        artifactory.published = {
+            15: [record("bbbbbbb", 2), record("ccccccc", 1)],
+            65: [record("ddddddd", 3)],
+        }
+
+        new = self.run_watch(artifactory, [old], timeout=100)
+
+        self.assertEqual([r.version for r in new], ["ccccccc", "bbbbbbb", "ddddddd"])
+        self.assertEqual(artifactory.polls[0], format_created(old.created))
+        # Later polls only ask for what's newer than the newest artifact seen
+        self.assertEqual(
+            artifactory.polls[-1], format_created(START + timedelta(minutes=2))
+        )
+
+    def test_backs_off_while_nothing_changes(self):
+        """Test that polls slow down while nothing is published, up to the maximum."""
+        old = record("aaaaaaa", 0)
+        artifactory = FakeArtifactory([old])
+        times = []
+        find_new = artifactory.find_new
+
+        def timed_find_new(created_after):
+            times.append(artifactory.now)
+            return find_new(created_after)
+
+        artifactory.find_new = timed_find_new
+        self.run_watch(artifactory, [old], timeout=200)
+
+        # 10, then +10, +20, +40, +40... until the timeout
+        self.assertEqual(times[:5], [10, 20, 40, 80, 120])
+        self.assertEqual(times[-1], 200)
+
+    def test_repushed_tag_is_new(self):
+        """Test that a tag pushed again with a new digest is reported again."""
+        old = record("aaaaaaa", 0)
+        artifactory = FakeArtifactory([old])
+        artifactory.published = {10: [record("aaaaaaa", 0, sha="f" * 40)]}
+
+        new = self.run_watch(artifactory, [old], timeout=30)
+
+        self.assertEqual([r.sha for r in new], ["f" * 40])
+
+    def test_matches_filters_but_moves_the_mark(self):
+        """Test that unwanted artifacts aren't yielded, but aren't asked for again."""
+        artifactory = FakeArtifactory([])
+        artifactory.published = {10: [record("1.0.0", 1)], 20: [record("2.0.0", 2)]}
+
+        new = self.run_watch(
+            artifactory,
+            [],
+            timeout=40,
+            matches=lambda r: r.version.startswith("2"),
+        )
+
+        self.assertEqual([r.version for r in new], ["2.0.0"])
+        self.assertIsNone(artifactory.polls[0])
+        self.assertEqual(
+            artifactory.polls[1], format_created(START + timedelta(minutes=1))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,427 @@
+"""
+Tests for the artifactory_async module.
+
+The client and tool run against a served emulator, and must agree with the
+synchronous tool.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_cache import ArtifactCache
+from artifactory_async import (
+    AsyncArtifactoryQueryTool,
+    AsyncJFrogClient,
+    TokenBucket,
+)
+from artifactory_emulator import (
+    Emulator,
+    EmulatorServer,
+    emulator_stats,
+    reset_emulator_stats,
+    write_fake_jf,
+)
+from artifactory_http import ArtifactoryHttpBackend, JFrogServerConfig
+from digest_index import DigestIndex
+from query_artifactory import ArtifactoryQueryTool, JFrogClient
+from resilience import JFrogCommandError
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test the token bucket rate limiter with a fake clock."""
+
+    def test_burst_then_rate(self):
+        """Test that a full bucket allows a burst, then one request per 1/rate."""
+        now = [0.0]
+
+        async def fake_sleep(delay):
+            now[0] += delay
+
+        async def run():
+            bucket = TokenBucket(rate=10, burst=3, clock=lambda: now[0])
+            started = []
+            for _ in range(6):
+                await bucket.acquire()
+                started.append(round(now[0], 3))
+            return started
+
+        with patch("artifactory_async.asyncio.sleep", fake_sleep):
+            started = asyncio.run(run())
+
+        self.assertEqual(started, [0.0, 0.0, 0.0, 0.1, 0.2, 0.3])
+
+    def test_invalid_rate(self):
+        """Test that a rate limit must be positive."""
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestAsyncArtifactoryQueryTool(unittest.TestCase):
+    """Test the async tool's settings, kept on its planner."""
+
+    def test_for_environment_copies_settings(self):
+        """Test that another environment's tool shares the client and settings."""
+        tool = AsyncArtifactoryQueryTool(client=AsyncJFrogClient(None))
+        tool.planner.use_aql = False
+        tool.planner.version_scan = 50
+
+        prod = tool.for_environment("prod")
+
+        self.assertIs(tool.for_environment("dev"), tool)
+        self.assertIs(prod.client, tool.client)
+        self.assertIs(prod.metrics, tool.metrics)
+        self.assertEqual(prod.planner.docker_repo, "dexcom-docker-prod-virtual")
+        self.assertFalse(prod.planner.use_aql)
+        self.assertEqual(prod.planner.version_scan, 50)
+
+    def test_not_a_sync_tool(self):
+        """Test that no synchronous query method is inherited to call the async client."""
+        tool = AsyncArtifactoryQueryTool(client=AsyncJFrogClient(None))
+
+        self.assertNotIsInstance(tool, ArtifactoryQueryTool)
+        self.assertFalse(hasattr(tool, "find_new"))
+        self.assertFalse(hasattr(tool, "list_items"))
+
+
+class TestAsyncAgainstEmulator(unittest.TestCase):
+    """Run the async client and tool against a served emulator."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Serve an emulator with a little latency for the whole class."""
+        emulator = Emulator.create(artifacts=3000, item="item")
+        cls.server = EmulatorServer(emulator, latency=0.02)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the emulator."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Reset the emulator's counters."""
+        self.config = JFrogServerConfig(self.server.url, "token")
+        reset_emulator_stats(self.server.url)
+
+    def run_with_client(self, body, **kwargs):
+        """Run `body(client)` on a fresh event loop with a fresh client."""
+
+        async def run():
+            async with AsyncJFrogClient(self.config, **kwargs) as client:
+                return await body(client)
+
+        return asyncio.run(run())
+
+    def test_search_curl_and_aql(self):
+        """Test the client's requests, sharing pooled connections."""
+
+        async def body(client):
+            first = await client.search("dexcom-helm-dev-virtual/item/*.tgz", limit=3)
+            second = await client.search(
+                "dexcom-helm-dev-virtual/item/*.tgz", limit=3, offset=3
+            )
+            output = await client.curl("api/system/ping")
+            rejected = await client.aql("not aql")
+            return (
+                first,
+                second,
+                output,
+                rejected,
+                client.http_backend.pool.connections_opened,
+            )
+
+        first, second, output, rejected, opened = self.run_with_client(body)
+
+        self.assertEqual(
+            [artifact["path"].rsplit("/", 1)[1] for artifact in first],
+            ["item-0.30.0.tgz", "item-0.29.99.tgz", "item-0.29.98.tgz"],
+        )
+        self.assertEqual(second[0]["path"].rsplit("/", 1)[1], "item-0.29.97.tgz")
+        self.assertIn("sha1", first[0])
+        self.assertEqual(output, "{}")
+        self.assertIsNone(rejected)
+        self.assertEqual(opened, 1)
+
+    def test_max_in_flight(self):
+        """Test that no more than max_in_flight requests run at once."""
+        in_flight = 0
+        peak = 0
+        lock = threading.Lock()
+
+        async def body(client):
+            original = client.http_backend.search
+
+            def counting_search(*args, **kwargs):
+                nonlocal in_flight, peak
+                with lock:
+                    in_flight += 1
+                    peak = max(peak, in_flight)
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    with lock:
+                        in_flight -= 1
+
+            client.http_backend.search = counting_search
+            await asyncio.gather(
+                *(
+                    client.search("dexcom-pypi-dev-local/item/*.whl", limit=1)
+                    for _ in range(12)
+                )
+            )
+            return client.http_backend.pool.connections_opened
+
+        opened = self.run_with_client(body, max_in_flight=3)
+
+        self.assertEqual(peak, 3)
+        self.assertEqual(opened, 3)
+        self.assertEqual(emulator_stats(self.server.url)["searches"], 12)
+
+    def test_rate_limit(self):
+        """Test that requests beyond the burst wait for the token bucket."""
+
+        async def body(client):
+            await asyncio.gather(
+                *(
+                    client.search("dexcom-pypi-dev-local/item/*.whl", limit=1)
+                    for _ in range(4)
+                )
+            )
+            return client.metrics.snapshot()
+
+        snapshot = self.run_with_client(body, rate_limit=20, burst=2)
+
+        waits = [
+            timer for timer in snapshot["timers"] if timer["name"] == "rate_limited"
+        ]
+        self.assertEqual(waits[0]["count"], 2)
+        self.assertGreater(waits[0]["max_seconds"], 0.04)
+
+    def test_queries_match_sync_tool(self):
+        """Test that the async tool returns what the synchronous one does."""
+        backend = ArtifactoryHttpBackend(self.config)
+        self.addCleanup(backend.close)
+        sync_tool = ArtifactoryQueryTool(client=JFrogClient(backend))
+        expected = {
+            "docker": sync_tool.query_docker("item", limit=5),
+            "helm": sync_tool.query_helm("item", limit=3),
+            "pypi": sync_tool.query_pypi("item", limit=3, version_range="<0.29"),
+        }
+
+        async def body(client):
+            tool = AsyncArtifactoryQueryTool(client=client)
+            results = {
+                "docker": await tool.query_docker("item", limit=5),
+                "helm": await tool.query("helm", "item", limit=3),
+                "pypi": await tool.query_pypi("item", 3, version_range="<0.29"),
+            }
+            tool.planner.use_aql = False
+            results["docker_paged"] = await tool.query_docker("item", limit=5)
+            return results
+
+        results = self.run_with_client(body)
+
+        self.assertEqual(len(results["docker"]), 5)
+        self.assertEqual(results["docker"], expected["docker"])
+        self.assertEqual(results["docker_paged"], expected["docker"])
+        self.assertEqual(results["helm"], expected["helm"])
+        self.assertEqual(results["pypi"], expected["pypi"])
+
+    def test_cache_and_digest_index_off_the_loop(self):
+        """Test that the SQLite cache and digest index aren't used on the loop's thread."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ArtifactCache(Path(tmpdir) / "cache.sqlite3")
+            digest_index = DigestIndex(Path(tmpdir) / "digests.sqlite3")
+            threads = set()
+
+            def on_thread(method):
+                def record_thread(*args, **kwargs):
+                    threads.add(threading.get_ident())
+                    return method(*args, **kwargs)
+
+                return record_thread
+
+            cache.get = on_thread(cache.get)
+            cache.store = on_thread(cache.store)
+            digest_index.add = on_thread(digest_index.add)
+
+            async def body(client):
+                tool = AsyncArtifactoryQueryTool(client=client)
+                tool.planner.cache = cache
+                tool.planner.digest_index = digest_index
+                first = await tool.query_helm("item", limit=2)
+                second = await tool.query_helm("item", limit=2)
+                return first, second, threading.get_ident()
+
+            first, second, loop_thread = self.run_with_client(body)
+            found = digest_index.lookup(first[0].sha)
+            cache.close()
+            digest_index.close()
+
+        self.assertEqual(first, second)
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+        self.assertTrue(found)
+
+    def test_query_batch_multiplexes(self):
+        """Test that a batch of queries overlaps on one loop and reports failures."""
+        queries = [("item", "docker")] * 30 + [("item", "helm"), ("item", "npm")]
+
+        async def body(client):
+            tool = AsyncArtifactoryQueryTool(client=client)
+            return [result async for result in tool.query_batch(queries, limit=2)]
+
+        start = time.perf_counter()
+        results = self.run_with_client(body, max_in_flight=32)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(results), len(queries))
+        failed = [result for result in results if result.error]
+        self.assertEqual([result.artifact_type for result in failed], ["npm"])
+        self.assertTrue(
+            all(len(result.results) == 2 for result in results if not result.error)
+        )
+        # 31 queries at 20ms a request, run one after another, would take 0.6s+
+        self.assertLess(elapsed, 0.5)
+
+    def test_query_environments_shares_client(self):
+        """Test that environments are queried on one loop, in input order."""
+
+        async def body(client):
+            tool = AsyncArtifactoryQueryTool(client=client)
+            return await tool.query_environments(["dev", "prod"], "helm", "item", 1)
+
+        dev, prod = self.run_with_client(body)
+
+        self.assertEqual(dev.environment, "dev")
+        self.assertEqual(dev.results[0].version, "0.30.0")
+        self.assertEqual(prod.environment, "prod")
+        self.assertEqual(prod.results, [])
+
+    def test_cli_fallback(self):
+        """Test that without a server config searches go through jf."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fake_jf = write_fake_jf(Path(tmpdir))
+
+            async def run():
+                client = AsyncJFrogClient(None)
+                client.base_command = [str(fake_jf), "rt"]
+                artifacts = await client.search(
+                    "dexcom-helm-dev-virtual/item/*.tgz", limit=2
+                )
+                response = await client.aql(
+                    'items.find({"repo": "dexcom-helm-dev-virtual"}).limit(1)'
+                )
+                return artifacts, response
+
+            with patch.dict(os.environ, {"JF_URL": self.server.url}):
+                artifacts, response = asyncio.run(run())
+
+        self.assertEqual(len(artifacts), 2)
+        self.assertEqual(len(response["results"]), 1)
+
+    def test_command_retried_after_failure(self):
+        """Test that a failed jf command is retried, like the sync client's."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = os.path.join(tmpdir, "failed-once")
+            script = (
+                "import os, sys\n"
+                f"if not os.path.exists({marker!r}):\n"
+                f"    open({marker!r}, 'w').close()\n"
+                "    sys.exit(1)\n"
+                "print('[]')\n"
+            )
+
+            async def run():
+                client = AsyncJFrogClient(None)
+                with patch("resilience.random.uniform", return_value=0):
+                    output = await client._run_command([sys.executable, "-c", script])
+                return output, client.metrics.counter("command_retries")
+
+            output, retries = asyncio.run(run())
+
+        self.assertEqual(output, "[]\n")
+        self.assertEqual(retries, 1)
+
+    def test_command_hedged_when_slow(self):
+        """Test that a jf command slower than the p95 is raced by a duplicate."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = os.path.join(tmpdir, "stalled")
+            # The first run stalls, as if it hit a bad node; the hedge doesn't
+            script = (
+                "import os, time\n"
+                f"if not os.path.exists({marker!r}):\n"
+                f"    open({marker!r}, 'w').close()\n"
+                "    time.sleep(30)\n"
+                "print('hedged')\n"
+            )
+
+            async def run():
+                client = AsyncJFrogClient(None)
+                for _ in range(20):
+                    client.metrics.observe("command", 0.01, op=script, outcome="ok")
+                output = await client._run_command([sys.executable, "-c", script])
+                return output, client.metrics.counter("command_hedges")
+
+            start = time.monotonic()
+            output, hedges = asyncio.run(run())
+
+        self.assertEqual(output, "hedged\n")
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(hedges, 1)
+
+    def test_circuit_breaker_fails_fast(self):
+        """Test that once jf keeps failing, searches are refused without running it."""
+
+        async def run():
+            client = AsyncJFrogClient(None)
+            client.max_retries = 0
+            client.breaker.failure_threshold = 2
+            client.base_command = [sys.executable, "-c", "import sys; sys.exit(1)"]
+            for _ in range(2):
+                with self.assertRaises(JFrogCommandError):
+                    await client.search("repo/item/*")
+            with patch("asyncio.create_subprocess_exec") as mock_exec:
+                with self.assertRaises(JFrogCommandError) as raised:
+                    await client.search("repo/item/*")
+            return raised.exception, mock_exec
+
+        error, mock_exec = asyncio.run(run())
+
+        self.assertEqual(error.outcome, "circuit_open")
+        mock_exec.assert_not_called()
+
+    def test_jf_not_found(self):
+        """Test that a missing jf raises like the sync client, and AQL gives up."""
+
+        async def run():
+            client = AsyncJFrogClient(None)
+            client.base_command = ["/nonexistent/jf", "rt"]
+            with self.assertRaises(JFrogCommandError) as raised:
+                await client.search("repo/item/*")
+            response = await client.aql("items.find()")
+            return raised.exception, response, client.metrics.snapshot()
+
+        error, response, snapshot = asyncio.run(run())
+
+        self.assertEqual(error.outcome, "not_found")
+        self.assertIsInstance(error.__cause__, FileNotFoundError)
+        self.assertIsNone(response)
+        commands = [timer for timer in snapshot["timers"] if timer["name"] == "command"]
+        self.assertEqual(commands[0]["labels"]["outcome"], "not_found")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Tests for the artifactory_emulator module.
+
+Besides checking the emulator itself, these run the query tool against it
+down every Docker path, which must all agree on the newest tags.
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifactory_emulator import (
+    Emulator,
+    EmulatorServer,
+    SyntheticRepo,
+    emulator_stats,
+    parse_tag_lengths,
+    reset_emulator_stats,
+)
+from artifactory_http import ArtifactoryHttpBackend, JFrogServerConfig
+from query_artifactory import ArtifactoryQueryTool, JFrogClient, docker_tags_aql
+
+
+class TestSyntheticRepo(unittest.TestCase):
+    """Test generation of synthetic artifacts."""
+
+    def test_parse_tag_lengths(self):
+        """Test parsing a tag length distribution."""
+        self.assertEqual(parse_tag_lengths("7:0.8,10:0.2"), {7: 0.8, 10: 0.2})
+
+    def test_docker_layout(self):
+        """Test that each tag folder starts with its manifest, newest first."""
+        repo = SyntheticRepo("docker-repo", "docker", "item", 20, {7: 1.0}, 4)
+
+        first, second = repo.item_at(0), repo.item_at(1)
+
+        self.assertEqual(first["name"], "manifest.json")
+        self.assertEqual(len(first["path"].split("/")[1]), 7)
+        self.assertEqual(first["path"], second["path"])
+        self.assertGreater(first["created"], second["created"])
+        self.assertEqual(len(repo.tags), 5)
+
+    def test_deterministic(self):
+        """Test that the same seed generates the same repo."""
+        a = SyntheticRepo("repo", "docker", "item", 1000, {7: 0.5, 10: 0.5})
+        b = SyntheticRepo("repo", "docker", "item", 1000, {7: 0.5, 10: 0.5})
+
+        self.assertEqual(a.tags, b.tags)
+        self.assertEqual({len(tag) for tag in a.tags}, {7, 10})
+
+    def test_helm_versions_newest_first(self):
+        """Test that the newest chart has the highest version."""
+        repo = SyntheticRepo("helm-repo", "helm", "my-chart", 300)
+
+        self.assertEqual(repo.item_at(0)["name"], "my-chart-0.3.0.tgz")
+        self.assertEqual(repo.item_at(1)["name"], "my-chart-0.2.99.tgz")
+
+
+class TestEmulator(unittest.TestCase):
+    """Test AQL evaluation."""
+
+    def setUp(self):
+        """Build a small emulator."""
+        self.emulator = Emulator.create(
+            artifacts=500, item="item", tag_lengths={7: 0.5, 10: 0.5}
+        )
+
+    def test_docker_tags_aql(self):
+        """Test the tool's tag query returns one manifest per matching tag."""
+        query = docker_tags_aql("dexcom-docker-dev-virtual", "item", 7, 5)
+
+        results = self.emulator.aql(query)["results"]
+
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(item["name"] == "manifest.json" for item in results))
+        self.assertTrue(all(len(item["path"]) == len("item/") + 7 for item in results))
+        created = [item["created"] for item in results]
+        self.assertEqual(created, sorted(created, reverse=True))
+
+    def test_offset_and_created_filter(self):
+        """Test offset/limit paging and $gte on created."""
+        query = (
+            'items.find({"repo": "dexcom-helm-dev-virtual",'
+            ' "created": {"$gte": "2024-12-31T23:59:58.000Z"}})'
+            ".offset(1).limit(5)"
+        )
+
+        results = self.emulator.aql(query)["results"]
+
+        self.assertEqual(
+            [item["created"][-10:] for item in results],
+            ["59:59.000Z", "59:58.000Z"],
+        )
+
+
+class TestToolAgainstEmulator(unittest.TestCase):
+    """Run the query tool against a served emulator."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Serve an emulator for the whole class."""
+        emulator = Emulator.create(artifacts=3000, item="item")
+        cls.server = EmulatorServer(emulator)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the emulator."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Build a tool using the HTTP backend against the emulator."""
+        backend = ArtifactoryHttpBackend(JFrogServerConfig(self.server.url, "token"))
+        self.addCleanup(backend.close)
+        self.tool = ArtifactoryQueryTool(client=JFrogClient(backend))
+        reset_emulator_stats(self.server.url)
+
+    def test_docker_paths_agree(self):
+        """Test that AQL, paged and streamed searches find the same tags."""
+        aql = self.tool.query_docker("item", limit=5)
+        self.assertEqual(emulator_stats(self.server.url)["searches"], 1)
+
+        self.tool.use_aql = False
+        reset_emulator_stats(self.server.url)
+        paged = self.tool.query_docker("item", limit=5)
+        paged_bytes = emulator_stats(self.server.url)["bytes"]
+
+        self.tool.stream_search = True
+        reset_emulator_stats(self.server.url)
+        with patch.object(self.tool.client, "aql", return_value=None):
+            streamed = self.tool.query_docker("item", limit=5)
+        streamed_bytes = emulator_stats(self.server.url)["bytes"]
+
+        self.assertEqual(len(aql), 5)
+        self.assertEqual(aql, paged)
+        self.assertEqual(aql, streamed)
+        # Paging is the default because it stops at a few small pages, where
+        # one streamed search asks for up to max_scan artifacts
+        self.assertLess(paged_bytes, streamed_bytes)
+
+    def test_helm_and_pypi(self):
+        """Test that the newest charts and wheels come back newest first."""
+        helm = self.tool.query_helm("item", limit=3)
+        pypi = self.tool.query_pypi("item", limit=3)
+
+        self.assertEqual(
+            [record.version for record in helm], ["0.30.0", "0.29.99", "0.29.98"]
+        )
+        self.assertEqual(
+            [record.version for record in pypi], ["0.30.0", "0.29.99", "0.29.98"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
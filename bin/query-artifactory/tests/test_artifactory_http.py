@@ -0,0 +1,259 @@
+"""
+Tests for the artifactory_http module.
+
+These run the HTTP backend against a stub Artifactory server on localhost,
+so no real Artifactory access is needed.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifactory_http import (
+    ArtifactoryHttpBackend,
+    ArtifactoryHttpError,
+    JFrogServerConfig,
+    aql_item_to_jf,
+    load_jf_server_config,
+    pattern_to_aql,
+)
+
+
+class StubArtifactoryHandler(BaseHTTPRequestHandler):
+    """Answers AQL and storage requests the way Artifactory would."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        query = self.rfile.read(length).decode()
+        self.server.requests.append(
+            (self.path, query, self.headers.get("Authorization"), self.client_address)
+        )
+        if self.path != "/artifactory/api/search/aql":
+            self._send(404, b"not found")
+            return
+        body = json.dumps({"results": self.server.results}).encode()
+        self._send(self.server.status, body)
+
+    def do_GET(self):
+        self.server.requests.append(
+            (self.path, None, self.headers.get("Authorization"), self.client_address)
+        )
+        self._send(200, b'{"repo": "test"}')
+
+
+class TestArtifactoryHttpBackend(unittest.TestCase):
+    """Test the HTTP backend against a stub server."""
+
+    def setUp(self):
+        """Start a stub Artifactory server."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubArtifactoryHandler)
+        self.server.requests = []
+        self.server.status = 200
+        self.server.results = [
+            {
+                "repo": "dexcom-docker-dev-virtual",
+                "path": "test-item/abc1234",
+                "name": "manifest.json",
+                "type": "file",
+                "created": "2025-01-01T10:00:00.000Z",
+                "actual_sha1": "abcdef1234567890",
+            }
+        ]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        config = JFrogServerConfig(
+            artifactory_url=f"http://127.0.0.1:{self.server.server_port}/artifactory/",
+            access_token="secret",
+        )
+        self.backend = ArtifactoryHttpBackend(config)
+
+    def tearDown(self):
+        """Stop the stub server."""
+        self.backend.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_search_returns_jf_shaped_results(self):
+        """Test that AQL results are converted to `jf rt s` output."""
+        results = self.backend.search("dexcom-docker-dev-virtual/test-item/*")
+
+        self.assertEqual(
+            results,
+            [
+                {
+                    "path": "dexcom-docker-dev-virtual/test-item/abc1234/manifest.json",
+                    "type": "file",
+                    "created": "2025-01-01T10:00:00.000Z",
+                    "sha1": "abcdef1234567890",
+                }
+            ],
+        )
+        path, query, auth, _ = self.server.requests[0]
+        self.assertEqual(auth, "Bearer secret")
+        self.assertIn('"repo": "dexcom-docker-dev-virtual"', query)
+
+    def test_connections_are_reused(self):
+        """Test that consecutive searches share one keep-alive connection."""
+        for offset in range(0, 300, 100):
+            self.backend.search("dexcom-docker-dev-virtual/test-item/*", offset=offset)
+
+        self.assertEqual(self.backend.pool.connections_opened, 1)
+        client_ports = {request[3] for request in self.server.requests}
+        self.assertEqual(len(client_ports), 1)
+
+    def test_iter_search_closed_early_drops_connection(self):
+        """Test that abandoning a streamed search doesn't reuse the connection."""
+        self.server.results = self.server.results * 100
+
+        artifacts = self.backend.iter_search("dexcom-docker-dev-virtual/test-item/*")
+        next(artifacts)
+        artifacts.close()
+        self.backend.search("dexcom-docker-dev-virtual/test-item/*")
+        self.backend.search("dexcom-docker-dev-virtual/test-item/*")
+
+        self.assertEqual(self.backend.pool.connections_opened, 2)
+
+    def test_search_http_error_raises(self):
+        """Test that an HTTP error surfaces as ArtifactoryHttpError."""
+        self.server.status = 500
+
+        with self.assertRaises(ArtifactoryHttpError) as ctx:
+            self.backend.search("dexcom-docker-dev-virtual/test-item/*")
+
+        self.assertEqual(ctx.exception.status, 500)
+
+    def test_connection_error_keeps_its_cause(self):
+        """Test that a failed connection chains the socket error behind it."""
+        self.server.shutdown()
+        self.server.server_close()
+        config = JFrogServerConfig(
+            artifactory_url=f"http://127.0.0.1:{self.server.server_port}/artifactory/",
+            access_token="secret",
+        )
+        backend = ArtifactoryHttpBackend(config)
+        self.addCleanup(backend.close)
+
+        with self.assertRaises(ArtifactoryHttpError) as ctx:
+            backend.search("dexcom-docker-dev-virtual/test-item/*")
+
+        self.assertIsInstance(ctx.exception.__cause__, OSError)
+
+    def test_curl(self):
+        """Test GET requests against REST endpoints."""
+        success, output = self.backend.curl("/api/repositories/test")
+
+        self.assertTrue(success)
+        self.assertEqual(output, '{"repo": "test"}')
+        self.assertEqual(
+            self.server.requests[0][0], "/artifactory/api/repositories/test"
+        )
+
+
+class TestAqlTranslation(unittest.TestCase):
+    """Test conversion between jf patterns, AQL and jf output."""
+
+    def test_pattern_to_aql(self):
+        """Test that patterns become recursive AQL criteria."""
+        query = pattern_to_aql("repo/item/*.tgz", limit=10, offset=20)
+
+        self.assertTrue(query.startswith("items.find("))
+        self.assertIn(
+            '{"path": {"$match": "item"}, "name": {"$match": "*.tgz"}}', query
+        )
+        self.assertIn(
+            '{"path": {"$match": "item/*"}, "name": {"$match": "*.tgz"}}', query
+        )
+        self.assertIn('.sort({"$desc":["created"]})', query)
+        self.assertTrue(query.endswith(".offset(20).limit(10)"))
+
+    def test_aql_item_at_repo_root(self):
+        """Test that items at the repository root get a two part path."""
+        artifact = aql_item_to_jf({"repo": "repo", "path": ".", "name": "file.whl"})
+
+        self.assertEqual(artifact, {"path": "repo/file.whl"})
+
+
+class TestLoadJfServerConfig(unittest.TestCase):
+    """Test reading the jf CLI server config."""
+
+    def setUp(self):
+        """Create a temporary jf home directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.home = Path(self.tmpdir.name)
+        env = {k: v for k, v in os.environ.items() if not k.startswith("JF_")}
+        self.env_patch = patch.dict(os.environ, env, clear=True)
+        self.env_patch.start()
+
+    def tearDown(self):
+        """Clean up the temporary directory."""
+        self.env_patch.stop()
+        self.tmpdir.cleanup()
+
+    def _write_config(self, config: dict) -> None:
+        (self.home / "jfrog-cli.conf.v6").write_text(json.dumps(config))
+
+    def test_default_server(self):
+        """Test that the default server is picked."""
+        self._write_config(
+            {
+                "servers": [
+                    {"serverId": "other", "url": "https://other.jfrog.io/"},
+                    {
+                        "serverId": "dexcom",
+                        "url": "https://dexcom.jfrog.io/",
+                        "artifactoryUrl": "https://dexcom.jfrog.io/artifactory/",
+                        "accessToken": "token",
+                        "isDefault": True,
+                    },
+                ]
+            }
+        )
+
+        config = load_jf_server_config(home_dir=self.home)
+
+        self.assertEqual(config.server_id, "dexcom")
+        self.assertEqual(config.artifactory_url, "https://dexcom.jfrog.io/artifactory/")
+        self.assertEqual(config.auth_header(), "Bearer token")
+
+    def test_named_server_without_artifactory_url(self):
+        """Test selecting a server by ID and deriving the Artifactory URL."""
+        self._write_config(
+            {"servers": [{"serverId": "other", "url": "https://other.jfrog.io"}]}
+        )
+
+        config = load_jf_server_config("other", home_dir=self.home)
+
+        self.assertEqual(config.artifactory_url, "https://other.jfrog.io/artifactory/")
+
+    def test_encrypted_config(self):
+        """Test that an encrypted config is not used."""
+        self._write_config({"servers": [{"url": "https://x.jfrog.io"}], "enc": True})
+
+        self.assertIsNone(load_jf_server_config(home_dir=self.home))
+
+    def test_missing_config(self):
+        """Test that a missing config returns None."""
+        self.assertIsNone(load_jf_server_config(home_dir=self.home))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests for the digest_index module.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_records import ArtifactRecord
+from digest_index import DigestIndex, normalise_digest
+
+SHA1 = "a" * 8 + "1" * 32
+SHA256 = "b" * 8 + "2" * 56
+
+
+def record(tag: str, sha: str, sha256: str = "", environment: str = "dev"):
+    repo = f"dexcom-docker-{environment}-virtual"
+    return ArtifactRecord(
+        created=datetime(2025, 1, 2, 10, tzinfo=timezone.utc),
+        repo=repo,
+        item="test-item",
+        version=tag,
+        sha=sha,
+        path=f"{repo}/test-item/{tag}/manifest.json",
+        sha256=sha256,
+    )
+
+
+class TestDigestIndex(unittest.TestCase):
+    """Test the DigestIndex class."""
+
+    def setUp(self):
+        """Create an index in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.index = DigestIndex(Path(self.tmpdir.name) / "digests.sqlite3")
+
+    def tearDown(self):
+        """Clean up the temporary directory."""
+        self.index.close()
+        self.tmpdir.cleanup()
+
+    def test_lookup_by_full_digest(self):
+        """Test that both the sha1 and the sha256 find the artifact."""
+        self.index.add("docker", [record("abc1234", SHA1, SHA256)])
+
+        for digest in (SHA1, SHA256, f"sha256:{SHA256.upper()}"):
+            entries = self.index.lookup(digest)
+            self.assertEqual(len(entries), 1)
+            self.assertEqual(entries[0].version, "abc1234")
+            self.assertEqual(entries[0].artifact_type, "docker")
+            self.assertEqual(entries[0].created, "2025-01-02T10:00:00.000Z")
+        self.assertEqual(self.index.lookup(SHA256)[0].algorithm, "sha256")
+
+    def test_lookup_by_prefix(self):
+        """Test that a prefix matches every digest starting with it."""
+        self.index.add(
+            "docker",
+            [
+                record("abc1234", SHA1, environment="dev"),
+                record("abc1234", SHA1, environment="prod"),
+                record("def5678", "a" * 7 + "f" * 33),
+            ],
+        )
+
+        self.assertEqual(len(self.index.lookup("aaaaaaa")), 3)
+        entries = self.index.lookup("aaaaaaaa")
+        self.assertEqual(
+            sorted(entry.repo for entry in entries),
+            ["dexcom-docker-dev-virtual", "dexcom-docker-prod-virtual"],
+        )
+        self.assertEqual(self.index.lookup("cccccc"), [])
+
+    def test_repushed_tag_forgets_old_digest(self):
+        """Test that re-indexing a path with a new digest drops the old one."""
+        self.index.add("docker", [record("abc1234", SHA1)])
+        self.index.add("docker", [record("abc1234", "c" * 40)])
+
+        self.assertEqual(self.index.lookup(SHA1), [])
+        self.assertEqual(len(self.index.lookup("c" * 40)), 1)
+
+    def test_records_without_digests_are_skipped(self):
+        """Test that records with no digest aren't indexed."""
+        self.assertEqual(self.index.add("helm", [record("1.0.0", "")]), 0)
+
+    def test_compact_drops_stale_entries(self):
+        """Test that compaction removes entries not seen within the max age."""
+        now = time.time()
+        with patch("digest_index.time.time", return_value=now - 10 * 86400):
+            self.index.add("docker", [record("old1234", SHA1)])
+        self.index.add("docker", [record("new1234", "c" * 40)])
+
+        result = self.index.compact(max_age_days=5)
+
+        self.assertEqual(result.removed, 1)
+        self.assertEqual(result.remaining, 1)
+        self.assertEqual(self.index.lookup(SHA1), [])
+        self.assertEqual(len(self.index.lookup("c" * 40)), 1)
+
+    def test_invalid_digest(self):
+        """Test that short or non-hex digests are rejected."""
+        for digest in ("abc12", "not-a-digest", "sha256:zzzzzzzz"):
+            with self.assertRaises(ValueError):
+                self.index.lookup(digest)
+        self.assertEqual(normalise_digest(" SHA1:ABCDEF12 "), "abcdef12")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests for the item_index module.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from item_index import ItemIndex, complete_main
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NAMES = ["sre-libs", "data-platform-validation", "data-pipeline", "api", "data"]
+
+
+class TestItemIndex(unittest.TestCase):
+    """Test the ItemIndex class."""
+
+    def setUp(self):
+        """Create an index in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.index = ItemIndex("docker", "dev", self.tmpdir.name)
+
+    def test_complete_prefix(self):
+        """Test that every name with the prefix is returned, in order."""
+        self.index.save("2025-01-01T10:00:00.000Z", NAMES)
+
+        self.assertEqual(
+            self.index.complete("data"),
+            ["data", "data-pipeline", "data-platform-validation"],
+        )
+        self.assertEqual(self.index.complete("data-pl"), ["data-platform-validation"])
+        self.assertEqual(self.index.complete("data", limit=1), ["data"])
+        self.assertEqual(self.index.complete("zzz"), [])
+        self.assertEqual(len(self.index.complete("")), len(NAMES))
+
+    def test_missing_index(self):
+        """Test that an index that was never built has no names."""
+        self.assertFalse(self.index.exists())
+        self.assertEqual(self.index.load(), ("", []))
+        self.assertEqual(self.index.complete("d"), [])
+
+    def test_merge_adds_new_names_and_moves_the_mark(self):
+        """Test that an incremental refresh merges in new names only."""
+        self.index.save("2025-01-01T10:00:00.000Z", ["api", "data"])
+
+        added = self.index.merge("2025-01-02T10:00:00.000Z", ["data", "sre-libs"])
+
+        self.assertEqual(added, 1)
+        self.assertEqual(
+            self.index.load(),
+            ("2025-01-02T10:00:00.000Z", ["api", "data", "sre-libs"]),
+        )
+        # An empty refresh keeps the old mark
+        self.index.merge("", [])
+        self.assertEqual(self.index.load()[0], "2025-01-02T10:00:00.000Z")
+
+    def test_complete_main(self):
+        """Test the `complete` subcommand's output and argument handling."""
+        ItemIndex("helm", "prod", self.tmpdir.name).save("", NAMES)
+        output = io.StringIO()
+
+        with patch("item_index.default_index_dir", return_value=self.tmpdir.name):
+            with redirect_stdout(output):
+                status = complete_main(["data-p", "helm", "prod"])
+            with patch("sys.stderr", io.StringIO()):
+                self.assertEqual(complete_main([]), 2)
+                self.assertEqual(complete_main(["d", "npm"]), 2)
+
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue(), "data-pipeline\ndata-platform-validation\n")
+
+    def test_complete_skips_the_tool(self):
+        """Test that `query_artifactory.py complete` imports nothing heavy."""
+        ItemIndex(
+            "docker",
+            "dev",
+            os.path.join(self.tmpdir.name, "query-artifactory", "items"),
+        ).save("", NAMES)
+        env = dict(os.environ, XDG_CACHE_HOME=self.tmpdir.name)
+
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                os.path.join(TOOL_DIR, "query_artifactory.py"),
+                "complete",
+                "data-p",
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        self.assertEqual(
+            result.stdout.split(), ["data-pipeline", "data-platform-validation"]
+        )
+        names = [
+            line.split("|")[-1]
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")
+        ]
+        # Only count what was imported after interpreter startup (`site`)
+        started = max(
+            (i for i, name in enumerate(names) if name == " site"), default=-1
+        )
+        imported = {name.strip() for name in names[started + 1 :]}
+        self.assertIn("item_index", imported)
+        for module in ("argparse", "typing", "json", "sqlite3", "artifact_records"):
+            self.assertNotIn(module, imported)
+
+
+if __name__ == "__main__":
+    unittest.main()
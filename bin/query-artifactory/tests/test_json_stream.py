@@ -0,0 +1,91 @@
+"""
+Tests for the json_stream module.
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_stream import iter_json_array, iter_text
+
+
+def split_every(text: str, size: int) -> list:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+class TestIterJsonArray(unittest.TestCase):
+    """Test the iter_json_array function."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.artifacts = [
+            {"path": f"repo/item/tag{i}/manifest.json", "size": i, "sha1": None}
+            for i in range(50)
+        ]
+
+    def test_elements_split_across_chunks(self):
+        """Test that any chunking yields the same elements as json.loads."""
+        text = json.dumps(self.artifacts, indent=2)
+
+        for size in (1, 7, 64, len(text)):
+            self.assertEqual(
+                list(iter_json_array(split_every(text, size))), self.artifacts
+            )
+
+    def test_keyed_array(self):
+        """Test extracting the array under a key, as in an AQL response."""
+        text = json.dumps({"results": self.artifacts, "range": {"total": 50}})
+
+        self.assertEqual(
+            list(iter_json_array(split_every(text, 10), key="results")), self.artifacts
+        )
+
+    def test_scalars_split_across_chunks(self):
+        """Test that numbers split across chunks are not cut short."""
+        self.assertEqual(list(iter_json_array(["[12", "34, 5", "6]"])), [1234, 56])
+
+    def test_empty_input(self):
+        """Test that empty output yields nothing."""
+        self.assertEqual(list(iter_json_array([""])), [])
+        self.assertEqual(list(iter_json_array(["[ ]"])), [])
+
+    def test_truncated_input(self):
+        """Test that a truncated array raises ValueError."""
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['[{"path": "a"}, {"pa']))
+
+    def test_stops_reading_when_closed(self):
+        """Test that closing the iterator stops pulling chunks."""
+        pulled = []
+
+        def chunks():
+            yield "["
+            for i in range(1000):
+                pulled.append(i)
+                yield json.dumps({"n": i}) + ","
+
+        elements = iter_json_array(chunks())
+        self.assertEqual(next(elements), {"n": 0})
+        elements.close()
+
+        self.assertLess(len(pulled), 5)
+
+
+class TestIterText(unittest.TestCase):
+    """Test the iter_text function."""
+
+    def test_multibyte_characters_split_across_reads(self):
+        """Test that UTF-8 sequences split between reads decode correctly."""
+        text = "tag-✓-" * 100
+        stream = io.BytesIO(text.encode())
+
+        self.assertEqual("".join(iter_text(stream, chunk_size=5)), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
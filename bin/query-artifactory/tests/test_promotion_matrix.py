@@ -0,0 +1,81 @@
+"""
+Tests for the promotion_matrix module.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_records import ArtifactRecord
+from promotion_matrix import build_promotion_matrix, format_promotion_matrix
+
+
+def record(environment: str, tag: str, sha: str, day: int) -> ArtifactRecord:
+    return ArtifactRecord(
+        created=datetime(2025, 1, day, 10, tzinfo=timezone.utc),
+        repo=f"dexcom-docker-{environment}-virtual",
+        item="test-item",
+        version=tag,
+        sha=sha,
+        path=f"dexcom-docker-{environment}-virtual/test-item/{tag}/manifest.json",
+    )
+
+
+class TestPromotionMatrix(unittest.TestCase):
+    """Test joining per-environment results into a promotion matrix."""
+
+    def setUp(self):
+        """Set up results where one tag was promoted and one rebuilt."""
+        self.results = {
+            "dev": [
+                record("dev", "abc1234", "1111111111", 3),
+                record("dev", "def5678", "2222222222", 2),
+            ],
+            "stage": [record("stage", "def5678", "2222222222", 4)],
+            "prod": [record("prod", "abc1234", "9999999999", 5)],
+        }
+
+    def test_joined_by_tag_and_sha(self):
+        """Test that rows join on tag and sha, newest first."""
+        rows = build_promotion_matrix(self.results)
+
+        self.assertEqual(
+            [(row.version, row.sha) for row in rows],
+            [
+                ("abc1234", "9999999999"),
+                ("def5678", "2222222222"),
+                ("abc1234", "1111111111"),
+            ],
+        )
+        self.assertEqual(set(rows[1].created), {"dev", "stage"})
+        self.assertTrue(rows[1].present_in(["dev", "stage"]))
+        self.assertFalse(rows[1].present_in(["dev", "stage", "prod"]))
+
+    def test_format(self):
+        """Test the rendered matrix lines."""
+        lines = format_promotion_matrix(
+            build_promotion_matrix(self.results), ["dev", "stage", "prod"]
+        )
+
+        self.assertEqual(lines[0].split(), ["version", "sha", "dev", "stage", "prod"])
+        self.assertEqual(
+            lines[2].split(),
+            [
+                "def5678",
+                "22222222",
+                "2025-01-02T10:00:00.000Z",
+                "2025-01-04T10:00:00.000Z",
+                "-",
+            ],
+        )
+        # Columns line up
+        self.assertEqual(lines[2].index("2025-01-04"), lines[0].index("stage"))
+        self.assertEqual(lines[1].index(" - ") + 1, lines[0].index("dev"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,16 @@ these tests focus on unit testing the components that can be
 tested without external dependencies.
 """
 
+import argparse
+import functools
+import io
+import json
+import tempfile
+import threading
+import time
 import unittest
+from contextlib import closing, redirect_stderr, redirect_stdout
+from pathlib import Path
 from unittest.mock import Mock, patch
 import sys
 import os
@@ -14,7 +23,22 @@ import os
 # Add the parent directory to the path so we can import the module
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from query_artifactory import JFrogClient, ArtifactoryQueryTool
+from artifact_cache import ArtifactCache
+from artifactory_http import ArtifactoryHttpError
+from artifact_records import ArtifactRecord
+from digest_index import DigestIndex
+from resilience import JFrogCommandError
+from query_artifactory import (
+    JFrogClient,
+    ArtifactoryQueryTool,
+    adaptive_page_size,
+    format_record,
+    main,
+    parse_batch_spec,
+    read_batch_file,
+    report_stats,
+)
+from query_metrics import Metrics
 
 
 class TestJFrogClient(unittest.TestCase):
@@ -28,45 +52,116 @@ class TestJFrogClient(unittest.TestCase):
         """Test JFrogClient initialization."""
         self.assertEqual(self.client.base_command, ["jf", "rt"])
 
-    @patch("subprocess.run")
-    def test_run_command_success(self, mock_run):
+    def test_run_command_success(self):
         """Test successful command execution."""
-        mock_result = Mock()
-        mock_result.stdout = '{"test": "data"}'
-        mock_run.return_value = mock_result
+        script = 'print(\'{"test": "data"}\')'
 
-        success, output = self.client._run_command(["test", "command"])
+        output = self.client._run_command([sys.executable, "-c", script])
 
-        self.assertTrue(success)
-        self.assertEqual(output, '{"test": "data"}')
-        mock_run.assert_called_once()
+        self.assertEqual(output, '{"test": "data"}\n')
+        # Commands are labelled with their third word, the jf subcommand
+        self.assertIsNotNone(
+            self.client.metrics.quantile("command", 0.5, op=script, outcome="ok")
+        )
+
+    def test_run_command_timeout(self):
+        """Test that a command running past the timeout is killed and reported."""
+        self.client.command_timeout = 0.3
+        self.client.hedge = False
+        start = time.monotonic()
+
+        with self.assertRaises(JFrogCommandError) as raised:
+            self.client._run_command(
+                [sys.executable, "-c", "import time; time.sleep(30)"]
+            )
+
+        self.assertEqual(raised.exception.outcome, "timeout")
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_run_command_file_not_found(self):
+        """Test that a missing jf is reported as such, without retries."""
+        with self.assertRaises(JFrogCommandError) as raised:
+            self.client._run_command(["/nonexistent/jf", "rt", "s"])
+
+        self.assertEqual(raised.exception.outcome, "not_found")
+        self.assertEqual(self.client.metrics.counter("command_retries"), 0)
+        self.assertIsInstance(raised.exception.__cause__, FileNotFoundError)
+        self.assertEqual(self.client.breaker.state, "closed")
+
+    def test_run_command_error(self):
+        """Test that a failing command is retried, then raised with its stderr."""
+        self.client.max_retries = 1
+        script = "import sys; sys.stderr.write('node down'); sys.exit(1)"
 
-    @patch("subprocess.run")
-    def test_run_command_timeout(self, mock_run):
-        """Test command timeout handling."""
-        from subprocess import TimeoutExpired
+        with patch("resilience.random.uniform", return_value=0):
+            with self.assertRaises(JFrogCommandError) as raised:
+                self.client._run_command([sys.executable, "-c", script])
 
-        mock_run.side_effect = TimeoutExpired("cmd", 30)
+        self.assertEqual(raised.exception.outcome, "error")
+        self.assertIn("node down", str(raised.exception))
+        self.assertEqual(self.client.metrics.counter("command_retries"), 1)
 
-        success, output = self.client._run_command(["test", "command"])
+    def test_run_command_retry_succeeds(self):
+        """Test that a retry after a transient failure returns its output."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = os.path.join(tmpdir, "failed-once")
+            script = (
+                "import os, sys\n"
+                f"if not os.path.exists({marker!r}):\n"
+                f"    open({marker!r}, 'w').close()\n"
+                "    sys.exit(1)\n"
+                "print('[]')\n"
+            )
+            with patch("resilience.random.uniform", return_value=0):
+                output = self.client._run_command([sys.executable, "-c", script])
 
-        self.assertFalse(success)
-        self.assertEqual(output, "")
+        self.assertEqual(output, "[]\n")
+        self.assertEqual(self.client.metrics.counter("command_retries"), 1)
 
-    @patch("subprocess.run")
-    def test_run_command_file_not_found(self, mock_run):
-        """Test file not found error handling."""
-        mock_run.side_effect = FileNotFoundError()
+    def test_run_command_hedges_slow_run(self):
+        """Test that a run slower than the p95 is raced by a duplicate."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = os.path.join(tmpdir, "stalled")
+            # The first run stalls, as if it hit a bad node; the hedge doesn't
+            script = (
+                "import os, time\n"
+                f"if not os.path.exists({marker!r}):\n"
+                f"    open({marker!r}, 'w').close()\n"
+                "    time.sleep(30)\n"
+                "print('hedged')\n"
+            )
+            for _ in range(20):
+                self.client.metrics.observe("command", 0.01, op=script, outcome="ok")
+            start = time.monotonic()
+            output = self.client._run_command([sys.executable, "-c", script])
 
-        success, output = self.client._run_command(["test", "command"])
+        self.assertEqual(output, "hedged\n")
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(self.client.metrics.counter("command_hedges"), 1)
+        self.assertIsNotNone(
+            self.client.metrics.quantile("command", 0.5, op=script, outcome="hedged")
+        )
 
-        self.assertFalse(success)
-        self.assertEqual(output, "")
+    def test_circuit_breaker_fails_fast(self):
+        """Test that once jf keeps failing, commands are refused without running."""
+        self.client.max_retries = 0
+        self.client.breaker.failure_threshold = 2
+        command = [sys.executable, "-c", "import sys; sys.exit(1)"]
+        for _ in range(2):
+            with self.assertRaises(JFrogCommandError):
+                self.client._run_command(command)
+
+        with patch("subprocess.Popen") as mock_popen:
+            with self.assertRaises(JFrogCommandError) as raised:
+                self.client.search("repo/item/*")
+
+        self.assertEqual(raised.exception.outcome, "circuit_open")
+        mock_popen.assert_not_called()
 
     def test_curl_command_construction(self):
         """Test curl command construction."""
         with patch.object(self.client, "_run_command") as mock_run:
-            mock_run.return_value = (True, "success")
+            mock_run.return_value = "success"
 
             self.client.curl("/test/endpoint")
 
@@ -76,7 +171,7 @@ class TestJFrogClient(unittest.TestCase):
     def test_search_command_construction(self):
         """Test search command construction."""
         with patch.object(self.client, "_run_command") as mock_run:
-            mock_run.return_value = (True, "[]")
+            mock_run.return_value = "[]"
 
             self.client.search("pattern/*", limit=10)
 
@@ -95,7 +190,7 @@ class TestJFrogClient(unittest.TestCase):
     def test_search_with_offset(self):
         """Test search method with offset parameter."""
         with patch.object(self.client, "_run_command") as mock_run:
-            mock_run.return_value = (True, "[]")
+            mock_run.return_value = "[]"
 
             result = self.client.search("test/*", offset=50)
 
@@ -104,6 +199,132 @@ class TestJFrogClient(unittest.TestCase):
             call_args = mock_run.call_args[0][0]
             self.assertIn("--offset=50", call_args)
 
+    def test_search_uses_http_backend(self):
+        """Test that search goes through the HTTP backend when configured."""
+        backend = Mock()
+        backend.search.return_value = [{"path": "repo/item/file"}]
+        client = JFrogClient(http_backend=backend)
+
+        with patch.object(client, "_run_command") as mock_run:
+            result = client.search("repo/item/*", limit=10, offset=20)
+
+        self.assertEqual(result, [{"path": "repo/item/file"}])
+        backend.search.assert_called_once_with("repo/item/*", "created", "desc", 10, 20)
+        mock_run.assert_not_called()
+
+    def test_search_falls_back_to_cli(self):
+        """Test that a failing HTTP backend falls back to the jf CLI."""
+        backend = Mock()
+        backend.search.side_effect = ArtifactoryHttpError("boom")
+        client = JFrogClient(http_backend=backend)
+
+        with patch.object(client, "_run_command") as mock_run:
+            mock_run.return_value = "[]"
+            result = client.search("repo/item/*")
+
+        self.assertEqual(result, [])
+        mock_run.assert_called_once()
+
+    @patch("artifactory_http.ArtifactoryHttpBackend.from_jf_config")
+    def test_create_backends(self, mock_from_config):
+        """Test backend selection for the client factory."""
+        mock_from_config.return_value = None
+
+        self.assertIsNone(JFrogClient.create("cli").http_backend)
+        self.assertIsNone(JFrogClient.create("auto").http_backend)
+        with self.assertRaises(ArtifactoryHttpError):
+            JFrogClient.create("http")
+
+    def test_aql_via_cli(self):
+        """Test that AQL falls back to jf rt curl without an HTTP backend."""
+        with patch.object(self.client, "_run_command") as mock_run:
+            mock_run.return_value = '{"results": []}'
+            self.assertEqual(self.client.aql("items.find()"), {"results": []})
+            self.assertEqual(
+                mock_run.call_args[0][0][:5],
+                ["jf", "rt", "curl", "-XPOST", "/api/search/aql"],
+            )
+
+            mock_run.return_value = '{"errors": [{"status": 403}]}'
+            self.assertIsNone(self.client.aql("items.find()"))
+
+    def test_aql_command_failure_returns_none(self):
+        """Test that a failing jf rt curl is reported as AQL unavailable."""
+        with patch.object(self.client, "_run_command") as mock_run:
+            mock_run.side_effect = JFrogCommandError("Command failed", "error")
+            with self.assertLogs("query-artifactory", level="WARNING"):
+                self.assertIsNone(self.client.aql("items.find()"))
+
+    def test_stream_command_parses_output(self):
+        """Test that streamed jf output is parsed element by element."""
+        script = "import json; print(json.dumps([{'path': 'a'}, {'path': 'b'}]))"
+
+        artifacts = list(self.client._stream_command([sys.executable, "-c", script]))
+
+        self.assertEqual(artifacts, [{"path": "a"}, {"path": "b"}])
+
+    def test_stream_command_killed_when_closed(self):
+        """Test that abandoning a streamed search kills the process."""
+        # Prints artifacts forever, far beyond the 30 second timeout
+        script = (
+            "import sys, time\n"
+            "sys.stdout.write('[')\n"
+            "while True:\n"
+            '    sys.stdout.write(\'{"path": "repo/item/tag/x"},\')\n'
+            "    sys.stdout.flush()\n"
+            "    time.sleep(0.01)\n"
+        )
+        start = time.monotonic()
+
+        with closing(
+            self.client._stream_command([sys.executable, "-c", script])
+        ) as artifacts:
+            first = next(artifacts)
+
+        self.assertEqual(first, {"path": "repo/item/tag/x"})
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_max_in_flight(self):
+        """Test that concurrent requests are limited once a maximum is set."""
+        self.client.set_max_in_flight(2)
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+
+        def run_command(command):
+            with lock:
+                in_flight.append(command)
+                peak.append(len(in_flight))
+            time.sleep(0.02)
+            with lock:
+                in_flight.remove(command)
+            return "[]"
+
+        with patch.object(self.client, "_run_command", side_effect=run_command):
+            threads = [
+                threading.Thread(target=self.client.search, args=(f"repo/{i}/*",))
+                for i in range(6)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(peak), 6)
+        self.assertLessEqual(max(peak), 2)
+
+    def test_iter_search_uses_http_backend(self):
+        """Test that iter_search streams from the HTTP backend when configured."""
+        backend = Mock()
+        backend.iter_search.return_value = iter([{"path": "repo/item/file"}])
+        client = JFrogClient(http_backend=backend)
+
+        with patch.object(client, "_stream_command") as mock_stream:
+            result = list(client.iter_search("repo/item/*", limit=10))
+
+        self.assertEqual(result, [{"path": "repo/item/file"}])
+        mock_stream.assert_not_called()
+
 
 class TestArtifactoryQueryTool(unittest.TestCase):
     """Test the ArtifactoryQueryTool class."""
@@ -111,6 +332,11 @@ class TestArtifactoryQueryTool(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures."""
         self.tool = ArtifactoryQueryTool()
+        # AQL is unavailable unless a test says otherwise, so the default
+        # paged search path is exercised
+        self.aql_patcher = patch.object(JFrogClient, "aql", return_value=None)
+        self.mock_aql = self.aql_patcher.start()
+        self.addCleanup(self.aql_patcher.stop)
 
     def test_init(self):
         """Test ArtifactoryQueryTool initialization."""
@@ -149,8 +375,8 @@ class TestArtifactoryQueryTool(unittest.TestCase):
 
         self.assertEqual(len(results), 2)
         # Should be sorted by timestamp descending
-        self.assertIn("xyz9876", results[0])
-        self.assertIn("abc1234", results[1])
+        self.assertEqual(results[0].version, "xyz9876")
+        self.assertEqual(results[1].version, "abc1234")
 
     @patch.object(JFrogClient, "search")
     def test_query_helm(self, mock_search):
@@ -167,7 +393,8 @@ class TestArtifactoryQueryTool(unittest.TestCase):
         results = self.tool.query_helm("test-chart")
 
         self.assertEqual(len(results), 1)
-        self.assertIn("test-chart-1.0.0", results[0])
+        self.assertEqual(results[0].version, "1.0.0")
+        self.assertEqual(results[0].filename, "test-chart-1.0.0.tgz")
 
     @patch.object(JFrogClient, "search")
     def test_query_pypi(self, mock_search):
@@ -184,7 +411,212 @@ class TestArtifactoryQueryTool(unittest.TestCase):
         results = self.tool.query_pypi("test-package")
 
         self.assertEqual(len(results), 1)
-        self.assertIn("test_package-1.0.0-py3-none-any.whl", results[0])
+        self.assertEqual(results[0].version, "1.0.0")
+        self.assertEqual(results[0].filename, "test_package-1.0.0-py3-none-any.whl")
+
+    @patch.object(JFrogClient, "search")
+    def test_query_helm_version_scan_cap(self, mock_search):
+        """Test that --version-scan ranks only the newest artifacts, and says so."""
+        # Newest first, with the highest version the oldest upload
+        artifacts = [
+            {
+                "path": f"dexcom-helm-dev-virtual/test-chart/test-chart-1.{i}.0.tgz",
+                "created": f"2025-01-01T{10 - i // 100:02d}:{59 - i % 60:02d}:00.000Z",
+            }
+            for i in range(1000)
+        ] + [
+            {
+                "path": "dexcom-helm-dev-virtual/test-chart/test-chart-9.0.0.tgz",
+                "created": "2024-01-01T10:00:00.000Z",
+            }
+        ]
+        mock_search.side_effect = lambda pattern, limit=5, offset=0: artifacts[
+            offset : offset + limit
+        ]
+        self.tool.version_scan = 250
+
+        with patch("query_artifactory.logger") as mock_logger:
+            capped = self.tool.query_helm("test-chart", limit=1)
+        scanned = sum(call.kwargs["limit"] for call in mock_search.call_args_list)
+        self.tool.version_scan = None
+        full = self.tool.query_helm("test-chart", limit=1)
+
+        self.assertEqual([r.version for r in capped], ["1.249.0"])
+        self.assertEqual(scanned, 250)
+        self.assertIn("--version-scan 250", mock_logger.warning.call_args_list[0][0][0])
+        self.assertEqual([r.version for r in full], ["9.0.0"])
+
+    @patch.object(JFrogClient, "search")
+    def test_query_helm_orders_by_version_across_pages(self, mock_search):
+        """Test that Helm pages through every chart and ranks them by version."""
+        versions = [f"1.{minor}.0" for minor in range(150)]
+
+        def search(pattern, limit=5, offset=0):
+            # Newest upload first: 1.3.0 was re-published most recently
+            ordered = ["1.3.0"] + [v for v in reversed(versions) if v != "1.3.0"]
+            return [
+                {
+                    "path": f"dexcom-helm-dev-virtual/test-chart/test-chart-{version}.tgz",
+                    "created": f"2025-01-01T10:00:{59 - i % 60:02d}.000Z",
+                }
+                for i, version in enumerate(ordered[offset : offset + limit])
+            ]
+
+        mock_search.side_effect = search
+
+        results = self.tool.query_helm("test-chart", limit=3)
+        in_range = self.tool.query_helm("test-chart", limit=2, version_range="<1.10")
+
+        self.assertEqual(
+            [r.version for r in results], ["1.149.0", "1.148.0", "1.147.0"]
+        )
+        self.assertEqual([r.version for r in in_range], ["1.9.0", "1.8.0"])
+        offsets = [call.kwargs["offset"] for call in mock_search.call_args_list]
+        self.assertIn(100, offsets)
+
+    @patch.object(JFrogClient, "search")
+    def test_query_pypi_small_repo_single_request(self, mock_search):
+        """Test that a package whose wheels fit in one page costs one request."""
+        mock_search.return_value = [
+            {
+                "path": f"dexcom-pypi-dev-local/test-package/test_package-{version}-py3-none-any.whl",
+                "created": "2025-01-01T10:00:00.000Z",
+            }
+            for version in ["0.9.1", "0.10.0rc1", "0.10.0", "0.9.2.post1"]
+        ]
+        self.tool.prefetch_depth = 4
+
+        results = self.tool.query_pypi("test-package", limit=2)
+
+        mock_search.assert_called_once()
+        self.assertEqual([r.version for r in results], ["0.10.0", "0.9.2.post1"])
+
+    @patch.object(JFrogClient, "search")
+    def test_find_new_helm(self, mock_search):
+        """Test that --watch polls return everything since the mark, unfiltered."""
+        artifacts = [
+            {
+                "path": f"dexcom-helm-dev-virtual/test-chart/test-chart-{version}.tgz",
+                "created": created,
+            }
+            for version, created in [
+                ("2.0.0-rc.1", "2025-01-03T10:00:00.000Z"),
+                ("1.1.0", "2025-01-02T10:00:00.000Z"),
+                ("1.0.0", "2025-01-01T10:00:00.000Z"),
+            ]
+        ]
+        mock_search.side_effect = lambda pattern, limit=5, offset=0: artifacts[
+            offset : offset + limit
+        ]
+
+        newest = self.tool.find_new("helm", "test-chart", None)
+        new = self.tool.find_new("helm", "test-chart", "2025-01-02T10:00:00.000Z")
+
+        self.assertEqual([r.version for r in newest], ["2.0.0-rc.1"])
+        self.assertEqual(mock_search.call_args_list[0].kwargs["limit"], 1)
+        self.assertEqual([r.version for r in new], ["2.0.0-rc.1", "1.1.0"])
+        self.assertEqual(self.tool.metrics.counter("watch_polls", type="helm"), 2)
+
+    def test_find_new_docker_asks_aql_for_newer_tags(self):
+        """Test that a Docker poll is one AQL request for tags since the mark."""
+        self.mock_aql.return_value = {
+            "results": [
+                {
+                    "repo": "dexcom-docker-dev-virtual",
+                    "path": "test-item/xyz9876",
+                    "name": "manifest.json",
+                    "created": "2025-01-02T10:00:00.000Z",
+                }
+            ]
+        }
+
+        new = self.tool.find_new("docker", "test-item", "2025-01-01T10:00:00.000Z")
+
+        self.mock_aql.assert_called_once()
+        query = self.mock_aql.call_args[0][0]
+        self.assertIn('"created": {"$gte": "2025-01-01T10:00:00.000Z"}', query)
+        self.assertEqual([r.version for r in new], ["xyz9876"])
+
+    @patch.object(JFrogClient, "search")
+    def test_watch_docker_tag_pushed_across_polls(self, mock_search):
+        """Test that a tag whose layers land over two polls is reported once."""
+        from artifact_watch import PollBackoff, watch
+
+        tag_dir = "dexcom-docker-dev-virtual/test-item/abc1234"
+        old = {
+            "path": "dexcom-docker-dev-virtual/test-item/old0001/manifest.json",
+            "created": "2025-01-01T10:00:00.000Z",
+            "sha1": "0000000000000000",
+        }
+        layer = {
+            "path": f"{tag_dir}/sha256__layer",
+            "created": "2025-01-02T10:00:00.000Z",
+            "sha1": "1111111111111111",
+        }
+        manifest = {
+            "path": f"{tag_dir}/manifest.json",
+            "created": "2025-01-02T10:00:05.000Z",
+            "sha1": "2222222222222222",
+        }
+        # What the repo holds (newest first) after each poll's sleep
+        pushes = [[old], [layer, old], [manifest, layer, old]]
+        clock = {"now": 0.0, "polls": 0}
+
+        def sleep(delay):
+            clock["now"] += delay
+            clock["polls"] += 1
+
+        def search(pattern, limit=5, offset=0):
+            artifacts = pushes[min(clock["polls"], len(pushes) - 1)]
+            return artifacts[offset : offset + limit]
+
+        mock_search.side_effect = search
+        self.tool.use_aql = False
+        find_new = functools.partial(self.tool.find_new, "docker", "test-item")
+
+        reported = list(
+            watch(
+                find_new,
+                find_new(None),
+                PollBackoff(interval=1, max_interval=1, jitter=0),
+                timeout=5,
+                sleep=sleep,
+                clock=lambda: clock["now"],
+            )
+        )
+
+        self.assertEqual([record.path for record in reported], [manifest["path"]])
+        self.assertEqual(reported[0].version, "abc1234")
+
+    def test_list_items_with_aql(self):
+        """Test that item names come from one AQL listing of top-level folders."""
+        self.mock_aql.return_value = {
+            "results": [
+                {"name": "api", "created": "2025-01-01T10:00:00.000Z"},
+                {"name": "sre-libs", "created": "2025-01-03T10:00:00.000Z"},
+            ]
+        }
+
+        names, newest = self.tool.list_items("pypi", "2025-01-01T00:00:00.000Z")
+
+        query = self.mock_aql.call_args[0][0]
+        self.assertIn('"repo": "dexcom-pypi-dev-local", "type": "folder"', query)
+        self.assertIn('"created": {"$gte": "2025-01-01T00:00:00.000Z"}', query)
+        self.assertEqual(names, ["api", "sre-libs"])
+        self.assertEqual(newest, "2025-01-03T10:00:00.000Z")
+
+    def test_list_items_without_aql(self):
+        """Test that without AQL the repo root is listed, with no high-water mark."""
+        listing = (
+            '{"children": [{"uri": "/api", "folder": true},'
+            ' {"uri": "/index.yaml", "folder": false}]}'
+        )
+        with patch.object(JFrogClient, "curl", return_value=listing) as curl:
+            names, newest = self.tool.list_items("helm")
+
+        curl.assert_called_once_with("api/storage/dexcom-helm-dev-virtual")
+        self.assertEqual(names, ["api"])
+        self.assertEqual(newest, "")
 
     @patch.object(JFrogClient, "search")
     def test_query_docker_with_custom_tag_length(self, mock_search):
@@ -212,7 +644,7 @@ class TestArtifactoryQueryTool(unittest.TestCase):
         results = self.tool.query_docker("test-item", limit=5, tag_length=8)
 
         self.assertEqual(len(results), 1)
-        self.assertIn("abc12345", results[0])
+        self.assertEqual(results[0].version, "abc12345")
 
     @patch.object(JFrogClient, "search")
     def test_query_docker_recursive_calls(self, mock_search):
@@ -242,6 +674,8 @@ class TestArtifactoryQueryTool(unittest.TestCase):
 
         # Mock search to return different results on subsequent calls
         mock_search.side_effect = [first_batch, second_batch]
+        # Fetch one page at a time so the call count is deterministic
+        self.tool.prefetch_depth = 1
 
         results = self.tool.query_docker("test-item", limit=2, tag_length=7)
 
@@ -249,8 +683,504 @@ class TestArtifactoryQueryTool(unittest.TestCase):
         self.assertEqual(mock_search.call_count, 2)
         # Should find the 2 tags from second batch
         self.assertEqual(len(results), 2)
-        self.assertIn("xyz9876", results[0])  # Most recent first
-        self.assertIn("abc1234", results[1])
+        self.assertEqual(results[0].version, "xyz9876")  # Most recent first
+        self.assertEqual(results[1].version, "abc1234")
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_aql_single_request(self, mock_search):
+        """Test that AQL tag discovery answers in one request without paging."""
+        self.mock_aql.return_value = {
+            "results": [
+                {
+                    "repo": "dexcom-docker-dev-virtual",
+                    "path": "test-item/xyz9876",
+                    "name": "manifest.json",
+                    "created": "2025-01-02T10:00:00.000Z",
+                    "actual_sha1": "1234567890abcdef",
+                },
+                {
+                    "repo": "dexcom-docker-dev-virtual",
+                    "path": "test-item/abc1234",
+                    "name": "list.manifest.json",
+                    "created": "2025-01-01T10:00:00.000Z",
+                    "actual_sha1": "abcdef1234567890",
+                },
+            ]
+        }
+
+        results = self.tool.query_docker("test-item", limit=2, tag_length=7)
+
+        self.mock_aql.assert_called_once()
+        mock_search.assert_not_called()
+        query = self.mock_aql.call_args[0][0]
+        self.assertIn('"path": {"$match": "test-item/???????"}', query)
+        self.assertTrue(query.endswith(".limit(2)"))
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].version, "xyz9876")
+        self.assertEqual(results[0].short_sha, "12345678")
+        self.assertEqual(results[1].version, "abc1234")
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_aql_command_failure_falls_back(self, mock_search):
+        """Test that a failing AQL request falls back to paged searches."""
+        self.aql_patcher.stop()
+        mock_search.return_value = [
+            {
+                "path": "dexcom-docker-dev-virtual/test-item/abc1234/manifest.json",
+                "created": "2025-01-01T10:00:00.000Z",
+                "sha1": "abcdef1234567890",
+            }
+        ]
+
+        with patch.object(JFrogClient, "_run_command") as mock_run:
+            mock_run.side_effect = JFrogCommandError("Command failed", "error")
+            with self.assertLogs("query-artifactory", level="WARNING"):
+                results = self.tool.query_docker("test-item", tag_length=7)
+
+        mock_search.assert_called()
+        self.assertEqual([r.version for r in results], ["abc1234"])
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_aql_disabled(self, mock_search):
+        """Test that use_aql = False goes straight to paging."""
+        mock_search.return_value = []
+        self.tool.use_aql = False
+
+        self.tool.query_docker("test-item")
+
+        self.mock_aql.assert_not_called()
+        mock_search.assert_called()
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_prefetch_merges_in_offset_order(self, mock_search):
+        """Test that prefetched pages are processed in offset order."""
+        release_first_page = threading.Event()
+
+        def search(pattern, limit=5, offset=0):
+            if offset == 0:
+                # The first page answers last, after the prefetched ones
+                release_first_page.wait(timeout=5)
+                tag, created = "old0001", "2025-01-01T10:00:00.000Z"
+            else:
+                if offset == 200:
+                    release_first_page.set()
+                tag, created = f"new{offset:04d}", "2025-01-02T10:00:00.000Z"
+            return [
+                {
+                    "path": f"dexcom-docker-dev-virtual/test-item/{tag}/manifest.json",
+                    "created": created,
+                    "sha1": "abcdef1234567890",
+                }
+            ] + [{"path": "dexcom-docker-dev-virtual/test-item/longertag/x"}] * 99
+
+        mock_search.side_effect = search
+        self.tool.prefetch_depth = 3
+
+        results = self.tool.query_docker("test-item", limit=2, tag_length=7)
+
+        # Pages 0 and 100 are enough; page 200 was only speculative
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].version, "new0100")
+        self.assertEqual(results[1].version, "old0001")
+        offsets = sorted(call.kwargs["offset"] for call in mock_search.call_args_list)
+        self.assertEqual(offsets, [0, 100, 200])
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_prefetch_stops_at_short_page(self, mock_search):
+        """Test that no further pages are requested after a short page."""
+        mock_search.return_value = [
+            {
+                "path": "dexcom-docker-dev-virtual/test-item/abc1234/manifest.json",
+                "created": "2025-01-01T10:00:00.000Z",
+            }
+        ]
+        self.tool.prefetch_depth = 4
+
+        results = self.tool.query_docker("test-item", limit=5)
+
+        self.assertEqual(len(results), 1)
+        self.assertLessEqual(mock_search.call_count, 4)
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_pages_grow_while_matches_are_sparse(self, mock_search):
+        """Test that page sizes adapt to the density of matching tags."""
+
+        def search(pattern, limit=5, offset=0):
+            # One 7-character tag in every 150 artifacts
+            return [
+                {
+                    "path": f"dexcom-docker-dev-virtual/test-item/t{i:06d}/x"
+                    if i % 150 == 149
+                    else "dexcom-docker-dev-virtual/test-item/longertag/x",
+                    "created": "2025-01-01T10:00:00.000Z",
+                }
+                for i in range(offset, offset + limit)
+            ]
+
+        mock_search.side_effect = search
+        self.tool.prefetch_depth = 1
+
+        results = self.tool.query_docker("test-item", limit=9, tag_length=7)
+
+        sizes = [call.kwargs["limit"] for call in mock_search.call_args_list]
+        self.assertEqual(len(results), 9)
+        # Doubles with no match yet, grows to the maximum to fit the sparse
+        # matches, then shrinks to fetch the last missing tag
+        self.assertEqual(sizes, [100, 200, 1000, 204])
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_reports_candidates_while_paging(self, mock_search):
+        """Test that each tag is passed to on_candidate before paging finishes."""
+        candidates = []
+
+        def search(pattern, limit=5, offset=0):
+            if offset == 0:
+                tag = "abc1234"
+            else:
+                # The first page's tag was reported before this page was read
+                self.assertEqual(candidates, [("docker", "abc1234")])
+                tag = "xyz9876"
+            return [
+                {
+                    "path": f"dexcom-docker-dev-virtual/test-item/{tag}/manifest.json",
+                    "created": f"2025-01-0{offset // 100 + 1}T10:00:00.000Z",
+                }
+            ] + [{"path": "dexcom-docker-dev-virtual/test-item/longertag/x"}] * (
+                limit - 1
+            )
+
+        mock_search.side_effect = search
+        self.tool.use_aql = False
+        self.tool.prefetch_depth = 1
+        self.tool.on_candidate = lambda artifact_type, record: candidates.append(
+            (artifact_type, record.version)
+        )
+
+        results = self.tool.query_docker("test-item", limit=2)
+
+        self.assertEqual(candidates, [("docker", "abc1234"), ("docker", "xyz9876")])
+        self.assertEqual([record.version for record in results], ["xyz9876", "abc1234"])
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_reports_scan_cap(self, mock_search):
+        """Test that stopping at the safety cap is reported, not taken as the end."""
+        mock_search.side_effect = lambda pattern, limit=5, offset=0: (
+            [{"path": "dexcom-docker-dev-virtual/test-item/longertag/x"}] * limit
+        )
+        self.tool.prefetch_depth = 2
+        self.tool.max_scan = 1000
+
+        with patch("query_artifactory.logger") as mock_logger:
+            results = self.tool.query_docker("test-item", limit=5)
+
+        self.assertEqual(results, [])
+        offsets = [call.kwargs["offset"] for call in mock_search.call_args_list]
+        limits = [call.kwargs["limit"] for call in mock_search.call_args_list]
+        self.assertEqual(offsets[-1] + limits[-1], 1000)
+        self.assertEqual(self.tool.metrics.counter("scan_capped"), 1)
+        self.assertIn("--max-scan 1000", mock_logger.warning.call_args_list[0][0][0])
+
+    @patch.object(JFrogClient, "search")
+    def test_query_helm_cache_hit(self, mock_search):
+        """Test that a fresh cached result set is served without searching."""
+        mock_search.return_value = [
+            {
+                "path": "dexcom-helm-dev-virtual/test-chart/test-chart-1.0.0.tgz",
+                "created": "2025-01-01T10:00:00.000Z",
+            }
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.tool.cache = ArtifactCache(Path(tmpdir) / "cache.sqlite3", ttl=60)
+
+            first = self.tool.query_helm("test-chart", limit=5)
+            second = self.tool.query_helm("test-chart", limit=5)
+            self.tool.cache.close()
+
+        self.assertEqual(first, second)
+        mock_search.assert_called_once()
+
+    @patch.object(JFrogClient, "search")
+    def test_query_pypi_indexes_digests(self, mock_search):
+        """Test that fetched artifacts are recorded in the digest index."""
+        mock_search.return_value = [
+            {
+                "path": "dexcom-pypi-dev-local/test-package/test_package-1.0.0-py3-none-any.whl",
+                "created": "2025-01-01T10:00:00.000Z",
+                "sha1": "abcdef1234" * 4,
+                "sha256": "fedcba9876" * 6 + "0000",
+            }
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.tool.digest_index = DigestIndex(Path(tmpdir) / "digests.sqlite3")
+            self.tool.query_pypi("test-package", limit=5)
+            by_sha1 = self.tool.digest_index.lookup("abcdef1234")
+            by_sha256 = self.tool.digest_index.lookup("fedcba9876")
+            self.tool.digest_index.close()
+
+        self.assertEqual(len(by_sha1), 1)
+        self.assertEqual(by_sha1[0].artifact_type, "pypi")
+        self.assertEqual(by_sha1[0].version, "1.0.0")
+        self.assertEqual(by_sha256[0].repo, "dexcom-pypi-dev-local")
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_cache_incremental_refresh(self, mock_search):
+        """Test that a stale entry only fetches tags newer than its high-water mark."""
+        self.mock_aql.return_value = {
+            "results": [
+                {
+                    "repo": "dexcom-docker-dev-virtual",
+                    "path": "test-item/abc1234",
+                    "name": "manifest.json",
+                    "created": "2025-01-01T10:00:00.000Z",
+                }
+            ]
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.tool.cache = ArtifactCache(Path(tmpdir) / "cache.sqlite3", ttl=0)
+            self.tool.query_docker("test-item", limit=5)
+
+            self.mock_aql.return_value = {
+                "results": [
+                    {
+                        "repo": "dexcom-docker-dev-virtual",
+                        "path": "test-item/xyz9876",
+                        "name": "manifest.json",
+                        "created": "2025-01-02T10:00:00.000Z",
+                    }
+                ]
+            }
+            results = self.tool.query_docker("test-item", limit=5)
+            self.tool.cache.close()
+
+        query = self.mock_aql.call_args[0][0]
+        self.assertIn('"created": {"$gte": "2025-01-01T10:00:00.000Z"}', query)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].version, "xyz9876")
+        self.assertEqual(results[1].version, "abc1234")
+        mock_search.assert_not_called()
+
+    @patch.object(JFrogClient, "search")
+    def test_query_docker_records_metrics(self, mock_search):
+        """Test that a paged query records its pages and latency."""
+        mock_search.return_value = [
+            {
+                "path": "dexcom-docker-dev-virtual/test-item/abc1234/manifest.json",
+                "created": "2025-01-01T10:00:00.000Z",
+            }
+        ]
+        self.tool.use_aql = False
+
+        self.tool.query_docker("test-item", limit=5)
+
+        metrics = self.tool.metrics
+        self.assertEqual(metrics.counter("pages_fetched", search="docker_paged"), 1)
+        queries = [
+            timer for timer in metrics.snapshot()["timers"] if timer["name"] == "query"
+        ]
+        self.assertEqual(queries[0]["labels"], {"type": "docker"})
+        self.assertEqual(queries[0]["count"], 1)
+
+    def test_query_environments_concurrently(self):
+        """Test that environments are queried at the same time, sharing a client."""
+        started = threading.Barrier(3, timeout=5)
+        tools = []
+
+        def query(tool, artifact_type, item_name, limit, tag_length):
+            tools.append(tool)
+            started.wait()  # Only passes once all three are in flight
+            if tool.environment == "prod":
+                raise RuntimeError("boom")
+            return [Mock(environment=tool.environment)]
+
+        with patch.object(ArtifactoryQueryTool, "query", autospec=True) as mock_query:
+            mock_query.side_effect = query
+            results = self.tool.query_environments(
+                ["dev", "stage", "prod"], "docker", "test-item"
+            )
+
+        self.assertEqual(
+            [result.environment for result in results], ["dev", "stage", "prod"]
+        )
+        self.assertEqual(results[1].results[0].environment, "stage")
+        self.assertEqual(results[2].error, "boom")
+        self.assertIn(self.tool, tools)
+        self.assertEqual({tool.client for tool in tools}, {self.tool.client})
+        self.assertEqual(
+            sorted(tool.docker_repo for tool in tools),
+            [
+                "dexcom-docker-dev-virtual",
+                "dexcom-docker-prod-virtual",
+                "dexcom-docker-stage-virtual",
+            ],
+        )
+
+    @patch.object(JFrogClient, "iter_search")
+    def test_query_docker_stream_stops_early(self, mock_iter_search):
+        """Test that the streamed search is abandoned once enough tags are found."""
+        consumed = []
+
+        def artifacts(pattern, limit=5):
+            for i in range(1000):
+                consumed.append(i)
+                yield {
+                    "path": f"dexcom-docker-dev-virtual/test-item/tag{i:04d}/layer",
+                    "created": f"2025-01-01T10:00:{59 - i % 60:02d}.000Z",
+                }
+
+        mock_iter_search.side_effect = artifacts
+        self.tool.stream_search = True
+
+        results = self.tool.query_docker("test-item", limit=3, tag_length=7)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(consumed), 3)
+        self.assertEqual(mock_iter_search.call_args.kwargs["limit"], self.tool.max_scan)
+
+    def test_query_unsupported_type(self):
+        """Test that an unknown artifact type is rejected."""
+        with self.assertRaises(ValueError):
+            self.tool.query("npm", "test-item")
+
+    def test_query_batch(self):
+        """Test that batch queries run concurrently and report each item."""
+        started = []
+        release = threading.Event()
+
+        def query(
+            artifact_type,
+            item_name,
+            limit=5,
+            tag_length=7,
+            version_range=None,
+            prereleases=False,
+        ):
+            started.append(item_name)
+            if len(started) == 3:
+                release.set()
+            # Only returns once all three queries are running at once
+            release.wait(timeout=5)
+            if item_name == "broken":
+                raise RuntimeError("boom")
+            return [f"{item_name} {artifact_type} {limit}"]
+
+        with patch.object(self.tool, "query", side_effect=query):
+            results = list(
+                self.tool.query_batch(
+                    [("app", "docker"), ("chart", "helm"), ("broken", "pypi")],
+                    limit=3,
+                    concurrency=3,
+                )
+            )
+
+        self.assertTrue(release.is_set())
+        by_item = {result.item_name: result for result in results}
+        self.assertEqual(by_item["app"].results, ["app docker 3"])
+        self.assertEqual(by_item["chart"].results, ["chart helm 3"])
+        self.assertEqual(by_item["broken"].results, [])
+        self.assertEqual(by_item["broken"].error, "boom")
+
+
+class TestAdaptivePageSize(unittest.TestCase):
+    """Test sizing of Docker search pages."""
+
+    def test_doubles_until_first_match(self):
+        """Test that pages double while no matching tag has been seen."""
+        self.assertEqual(adaptive_page_size(0, 5, 100, 100), 200)
+        self.assertEqual(adaptive_page_size(0, 5, 800, 800), 1000)
+
+    def test_sized_from_density(self):
+        """Test that pages are sized to find the remaining tags, with headroom."""
+        # 1 tag per 100 artifacts, 4 still missing
+        self.assertEqual(adaptive_page_size(1, 5, 100, 100), 501)
+        # Nearly there: shrink
+        self.assertEqual(adaptive_page_size(4, 5, 400, 500), 126)
+
+    def test_bounds(self):
+        """Test that page sizes stay within the configured bounds."""
+        self.assertEqual(adaptive_page_size(1, 50, 1000, 100), 1000)
+        self.assertEqual(adaptive_page_size(9, 10, 18, 100), 10)
+        self.assertEqual(adaptive_page_size(9, 10, 18, 100, min_size=1), 3)
+
+
+class TestFormatRecord(unittest.TestCase):
+    """Test rendering of query results."""
+
+    def test_format_record(self):
+        """Test that records render as the original result lines."""
+        record = ArtifactRecord.from_artifact(
+            {
+                "path": "dexcom-helm-dev-virtual/test-chart/test-chart-1.0.0.tgz",
+                "created": "2025-01-01T10:00:00.000Z",
+                "sha1": "abcdef1234567890",
+            },
+            "dexcom-helm-dev-virtual",
+            "test-chart",
+            "1.0.0",
+        )
+
+        self.assertEqual(
+            format_record(record, "helm"),
+            "2025-01-01T10:00:00.000Z test-chart-1.0.0 (JFrog SHA: abcdef12)",
+        )
+        self.assertEqual(
+            format_record(record, "docker"),
+            "2025-01-01T10:00:00.000Z dexcom-helm-dev-virtual/test-chart, Tag: 1.0.0 (JFrog sha: abcdef12)",
+        )
+
+
+class TestBatchSpecs(unittest.TestCase):
+    """Test parsing of batch query entries."""
+
+    def test_parse_batch_spec(self):
+        """Test item:type entries, with docker as the default type."""
+        self.assertEqual(parse_batch_spec("sre-libs:pypi"), ("sre-libs", "pypi"))
+        self.assertEqual(parse_batch_spec(" my-app \n"), ("my-app", "docker"))
+        with self.assertRaises(ValueError):
+            parse_batch_spec("my-app:npm")
+
+    def test_read_batch_file(self):
+        """Test that batch files skip comments and blank lines."""
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as handle:
+            handle.write("# services\nmy-app\n\nmy-chart:helm\n")
+        self.addCleanup(os.unlink, handle.name)
+
+        self.assertEqual(
+            read_batch_file(handle.name), [("my-app", "docker"), ("my-chart", "helm")]
+        )
+
+
+class TestReportStats(unittest.TestCase):
+    """Test where the call metrics are written."""
+
+    def test_stats_json_dash_goes_to_stderr(self):
+        """Test that `--stats-json -` leaves stdout to the results."""
+        metrics = Metrics()
+        metrics.count("pages_fetched", search="docker_paged")
+        args = argparse.Namespace(stats=False, stats_json="-", prometheus_textfile=None)
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            report_stats(metrics, args)
+
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertEqual(json.loads(stderr.getvalue()), json.loads(metrics.to_json()))
+
+    def test_stats_for_daemon_queries(self):
+        """Test that --stats reports the round trip when the daemon answers."""
+        argv = ["query_artifactory.py", "item", "docker", "--daemon", "--stats"]
+        stderr = io.StringIO()
+
+        with (
+            patch.object(sys, "argv", argv),
+            patch("query_daemon.query_daemon", return_value=[]) as mock_query,
+            patch("query_artifactory.build_tool") as mock_build,
+        ):
+            with redirect_stderr(stderr):
+                main()
+
+        mock_query.assert_called_once()
+        mock_build.assert_not_called()
+        self.assertIn("daemon_request{op=query}", stderr.getvalue())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,226 @@
+"""
+Tests for the query_daemon module.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_records import ArtifactRecord
+from query_daemon import (
+    DaemonError,
+    QueryDaemon,
+    default_socket_path,
+    query_daemon,
+    send_request,
+    spawn_daemon,
+)
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def record(version: str) -> ArtifactRecord:
+    return ArtifactRecord.from_artifact(
+        {
+            "path": f"repo/item/{version}/manifest.json",
+            "created": "2025-01-01T10:00:00.000Z",
+            "sha1": "1234567890abcdef",
+        },
+        "repo",
+        "item",
+        version,
+    )
+
+
+def request(**overrides) -> dict:
+    return {
+        "op": "query",
+        "environment": "dev",
+        "artifact_type": "docker",
+        "item_name": "item",
+        "limit": 5,
+        "tag_length": 7,
+        "settings": {"no_cache": False},
+        **overrides,
+    }
+
+
+class TestQueryDaemon(unittest.TestCase):
+    """Test the QueryDaemon server and its client."""
+
+    def setUp(self):
+        """Serve a daemon backed by mock tools from a temporary socket."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = Path(self.tmpdir.name) / "daemon.sock"
+        self.tools = {}
+
+        def tool_factory(environment):
+            tool = Mock()
+            tool.query.return_value = [record("abc1234")]
+            self.tools[environment] = tool
+            return tool
+
+        self.daemon = QueryDaemon(
+            self.socket_path, tool_factory, settings={"no_cache": False}
+        )
+        self.thread = threading.Thread(target=self.daemon.serve, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the daemon and clean up."""
+        send_request({"op": "shutdown"}, self.socket_path)
+        self.thread.join(timeout=5)
+        self.tmpdir.cleanup()
+
+    def test_query_round_trip(self):
+        """Test that records survive the trip through the socket."""
+        results = query_daemon(request(), self.socket_path)
+
+        self.assertEqual(results, [record("abc1234")])
+        self.tools["dev"].query.assert_called_once_with(
+            "docker", "item", 5, 7, None, False
+        )
+
+    def test_repeat_query_answered_from_memory(self):
+        """Test that a repeated query does not reach the tool again."""
+        query_daemon(request(), self.socket_path)
+        query_daemon(request(), self.socket_path)
+        query_daemon(request(refresh=True), self.socket_path)
+
+        self.assertEqual(self.tools["dev"].query.call_count, 2)
+
+    def test_remembered_results_are_bounded(self):
+        """Test that expired results are dropped and the rest capped, LRU first."""
+        self.daemon.max_results = 2
+        for item_name in ("a", "b"):
+            self.daemon.query(request(item_name=item_name))
+        self.daemon.query(request(item_name="a"))  # Now the most recently used
+        self.daemon.query(request(item_name="c"))
+
+        self.assertEqual([key[2] for key in self.daemon._results], ["a", "c"])
+
+        with patch("query_daemon.time.monotonic", return_value=1e12):
+            self.daemon.query(request(item_name="d"))
+
+        self.assertEqual([key[2] for key in self.daemon._results], ["d"])
+
+    def test_one_tool_per_environment(self):
+        """Test that each environment gets its own warm tool."""
+        query_daemon(request(), self.socket_path)
+        query_daemon(request(environment="prod"), self.socket_path)
+        query_daemon(request(item_name="other"), self.socket_path)
+
+        self.assertEqual(sorted(self.tools), ["dev", "prod"])
+        self.assertEqual(self.tools["dev"].query.call_count, 2)
+
+    def test_query_error(self):
+        """Test that a failing query is reported to the client."""
+        query_daemon(request(), self.socket_path)
+        self.tools["dev"].query.side_effect = ValueError("Unsupported artifact type")
+
+        with self.assertRaisesRegex(DaemonError, "Unsupported artifact type"):
+            query_daemon(request(artifact_type="npm"), self.socket_path)
+
+    def test_refuses_query_with_other_settings(self):
+        """Test that a query isn't answered with settings it didn't ask for."""
+        with self.assertRaisesRegex(DaemonError, "no_cache"):
+            query_daemon(request(settings={"no_cache": True}), self.socket_path)
+
+        self.assertEqual(self.tools, {})
+
+    def test_refuses_socket_of_another_user(self):
+        """Test that the client won't talk to a socket someone else owns."""
+        with patch("query_daemon.os.getuid", return_value=os.getuid() + 1):
+            with self.assertRaisesRegex(DaemonError, "another user"):
+                query_daemon(request(), self.socket_path)
+
+    def test_refuses_second_daemon(self):
+        """Test that a live daemon's socket is not taken over."""
+        with self.assertRaises(DaemonError):
+            QueryDaemon(self.socket_path, Mock())
+
+
+class TestQueryDaemonClient(unittest.TestCase):
+    """Test the client when no daemon is running."""
+
+    def setUp(self):
+        """Create a temporary directory for the socket."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = Path(self.tmpdir.name) / "daemon.sock"
+
+    def tearDown(self):
+        """Stop any daemon that was spawned and clean up."""
+        try:
+            send_request({"op": "shutdown"}, self.socket_path)
+        except OSError:
+            pass
+        self.tmpdir.cleanup()
+
+    def test_no_daemon_without_spawn(self):
+        """Test that a missing daemon is an error when it can't be spawned."""
+        with self.assertRaises(DaemonError) as raised:
+            query_daemon(request(), self.socket_path)
+
+        self.assertIsInstance(raised.exception.__cause__, FileNotFoundError)
+
+    def test_spawns_missing_daemon(self):
+        """Test that the client starts a detached daemon and queries it."""
+        script = (
+            "import sys; from unittest.mock import Mock; "
+            "from query_daemon import QueryDaemon; "
+            "tool = Mock(); tool.query.return_value = []; "
+            f"QueryDaemon({str(self.socket_path)!r}, lambda env: tool, "
+            "settings={'no_cache': False}).serve()"
+        )
+        command = [sys.executable, "-c", script]
+
+        results = query_daemon(
+            request(),
+            self.socket_path,
+            spawn=lambda: spawn_daemon(command, self.socket_path, cwd=TOOL_DIR),
+        )
+
+        self.assertEqual(results, [])
+        self.assertTrue(send_request({"op": "ping"}, self.socket_path)["ok"])
+
+
+class TestDefaultSocketPath(unittest.TestCase):
+    """Test where the socket goes without XDG_RUNTIME_DIR."""
+
+    def setUp(self):
+        """Point the temp dir at a scratch directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        for patcher in (
+            patch.dict(os.environ, {"XDG_RUNTIME_DIR": ""}),
+            patch("query_daemon.tempfile.gettempdir", return_value=self.tmpdir.name),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.directory = Path(self.tmpdir.name) / f"query-artifactory-{os.getuid()}"
+
+    def test_private_directory(self):
+        """Test that the socket goes in a per-user directory only they can use."""
+        socket_path = default_socket_path()
+
+        self.assertEqual(socket_path.parent, self.directory)
+        self.assertEqual(self.directory.stat().st_mode & 0o777, 0o700)
+
+    def test_refuses_shared_directory(self):
+        """Test that a directory others can write to isn't used."""
+        self.directory.mkdir()
+        self.directory.chmod(0o777)
+
+        with self.assertRaisesRegex(DaemonError, "not a private directory"):
+            default_socket_path()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests for the query_metrics module.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Test the Metrics registry."""
+
+    def setUp(self):
+        """Create a registry with a few observations."""
+        self.metrics = Metrics()
+        for seconds in (0.001, 0.002, 0.003, 0.2):
+            self.metrics.observe("request", seconds, op="search", backend="http")
+        self.metrics.count("bytes_received", 100, backend="http")
+        self.metrics.count("bytes_received", 50, backend="cli")
+        self.metrics.count("cache_lookups", result="hit")
+
+    def test_timer_records_on_error(self):
+        """Test that the timer context manager records calls that raise."""
+        with self.assertRaises(ValueError):
+            with self.metrics.timer("query", type="docker"):
+                raise ValueError("boom")
+
+        timers = self.metrics.snapshot()["timers"]
+        self.assertIn(
+            {"type": "docker"}, [t["labels"] for t in timers if t["name"] == "query"]
+        )
+
+    def test_counter_sums_over_labels(self):
+        """Test reading counters by name, with and without labels."""
+        self.assertEqual(self.metrics.counter("bytes_received"), 150)
+        self.assertEqual(self.metrics.counter("bytes_received", backend="cli"), 50)
+        self.assertEqual(self.metrics.counter("pages_fetched"), 0)
+
+    def test_snapshot_quantiles(self):
+        """Test count, total and tail latency in the snapshot."""
+        (timer,) = self.metrics.snapshot()["timers"]
+
+        self.assertEqual(timer["count"], 4)
+        self.assertAlmostEqual(timer["total_seconds"], 0.206)
+        self.assertEqual(timer["p50_seconds"], 0.003)
+        self.assertEqual(timer["p95_seconds"], 0.2)
+        self.assertEqual(timer["max_seconds"], 0.2)
+        json.loads(self.metrics.to_json())
+
+    def test_summary(self):
+        """Test the human-readable summary lists timers and counters."""
+        summary = self.metrics.summary()
+
+        self.assertIn("request{backend=http,op=search}", summary)
+        self.assertIn("cache_lookups{result=hit}", summary)
+
+    def test_prometheus(self):
+        """Test the Prometheus text exposition output."""
+        text = self.metrics.to_prometheus()
+
+        self.assertIn("# TYPE query_artifactory_request_seconds histogram", text)
+        self.assertIn(
+            'query_artifactory_request_seconds_bucket{backend="http",op="search",le="0.005"} 3',
+            text,
+        )
+        self.assertIn(
+            'query_artifactory_request_seconds_bucket{backend="http",op="search",le="+Inf"} 4',
+            text,
+        )
+        self.assertIn(
+            'query_artifactory_request_seconds_count{backend="http",op="search"} 4',
+            text,
+        )
+        self.assertIn("# TYPE query_artifactory_bytes_received_total counter", text)
+        self.assertIn('query_artifactory_bytes_received_total{backend="cli"} 50', text)
+        self.assertEqual(text.count("# TYPE query_artifactory_bytes_received_total"), 1)
+
+    def test_large_counters_keep_every_digit(self):
+        """Test that counters past 1e6 aren't rounded in either output."""
+        self.metrics.count("bytes_received", 1234567, backend="http")
+        self.metrics.count("rate_limited_seconds", 1234567.125)
+
+        text = self.metrics.to_prometheus()
+        summary = self.metrics.summary()
+
+        self.assertIn(
+            'query_artifactory_bytes_received_total{backend="http"} 1234667', text
+        )
+        self.assertIn("query_artifactory_rate_limited_seconds_total 1234567.125", text)
+        self.assertNotIn("e+06", text)
+        self.assertIn(" 1234667", summary)
+        self.assertIn(" 1234567.125", summary)
+
+    def test_write_prometheus_textfile(self):
+        """Test that the textfile is written whole, with no temp files left."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "query_artifactory.prom"
+
+            self.metrics.write_prometheus_textfile(path)
+
+            self.assertEqual(path.read_text(), self.metrics.to_prometheus())
+            self.assertEqual(os.listdir(tmpdir), ["query_artifactory.prom"])
+
+
+if __name__ == "__main__":
+    unittest.main()
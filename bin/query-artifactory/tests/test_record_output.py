@@ -0,0 +1,135 @@
+"""
+Tests for the record_output module.
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+from dataclasses import replace
+from datetime import datetime, timezone
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_records import ArtifactRecord
+from record_output import RecordWriter
+
+
+def record(tag: str, day: int) -> ArtifactRecord:
+    return ArtifactRecord(
+        created=datetime(2025, 1, day, 10, tzinfo=timezone.utc),
+        repo="dexcom-docker-dev-virtual",
+        item="test-item",
+        version=tag,
+        sha="1234567890abcdef",
+        path=f"dexcom-docker-dev-virtual/test-item/{tag}/manifest.json",
+    )
+
+
+class TestRecordWriter(unittest.TestCase):
+    """Test the structured output formats."""
+
+    def setUp(self):
+        """Set up an output stream and two records."""
+        self.stream = io.StringIO()
+        self.older = record("abc1234", 1)
+        self.newer = record("xyz9876", 2)
+
+    def lines(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_ndjson_streams_candidates_then_summary(self):
+        """Test that candidates are written once, followed by an ordered summary."""
+        writer = RecordWriter("ndjson", "dev", self.stream)
+
+        writer.candidate("docker", self.older)
+        self.assertEqual(self.lines()[0]["version"], "abc1234")
+
+        writer.finish("docker", "test-item", [self.newer, self.older])
+        writer.close()
+
+        lines = self.lines()
+        self.assertEqual(
+            [(line["record"], line.get("version")) for line in lines],
+            [("artifact", "abc1234"), ("artifact", "xyz9876"), ("summary", None)],
+        )
+        self.assertEqual(lines[0]["artifact_type"], "docker")
+        self.assertEqual(lines[0]["created"], "2025-01-01T10:00:00.000Z")
+        summary = lines[-1]
+        self.assertEqual(summary["count"], 2)
+        self.assertEqual(summary["environment"], "dev")
+        self.assertIsNone(summary["error"])
+        self.assertEqual(
+            [result["version"] for result in summary["results"]],
+            ["xyz9876", "abc1234"],
+        )
+
+    def test_one_artifact_record_per_tag(self):
+        """Test that a tag streamed as a candidate isn't written again with other metadata."""
+        writer = RecordWriter("ndjson", "dev", self.stream)
+        # Paging may see a layer of the tag first, then finish with its manifest
+        layer = replace(
+            record("abc1234", 3),
+            sha="fedcba0987654321",
+            path="dexcom-docker-dev-virtual/test-item/abc1234/sha256__layer",
+        )
+
+        writer.candidate("docker", layer)
+        writer.finish("docker", "test-item", [self.older])
+
+        artifacts = [line for line in self.lines() if line["record"] == "artifact"]
+        self.assertEqual(len(artifacts), 1)
+        self.assertEqual(artifacts[0]["version"], "abc1234")
+        self.assertEqual(self.lines()[-1]["results"][0]["sha"], "1234567890abcdef")
+
+    def test_json_writes_one_document(self):
+        """Test that json holds everything back for one array of summaries."""
+        writer = RecordWriter("json", "dev", self.stream)
+
+        writer.candidate("docker", self.older)
+        writer.finish("docker", "test-item", [self.older])
+        writer.finish("pypi", "sre-libs", [], "boom")
+        self.assertEqual(self.stream.getvalue(), "")
+        writer.close()
+
+        summaries = json.loads(self.stream.getvalue())
+        self.assertEqual(
+            [summary["item"] for summary in summaries], ["test-item", "sre-libs"]
+        )
+        self.assertEqual(summaries[1]["error"], "boom")
+
+    def test_tsv(self):
+        """Test one tab-separated line per artifact, with tabs escaped."""
+        writer = RecordWriter("tsv", "dev", self.stream)
+        odd = ArtifactRecord(
+            self.older.created, "repo", "item", "a\tb", "", "repo/item/a\tb"
+        )
+
+        writer.finish("docker", "test-item", [self.newer, odd])
+
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(
+            lines[0].split("\t"),
+            [
+                "docker",
+                "2025-01-02T10:00:00.000Z",
+                "dexcom-docker-dev-virtual",
+                "test-item",
+                "xyz9876",
+                "1234567890abcdef",
+                "dexcom-docker-dev-virtual/test-item/xyz9876/manifest.json",
+            ],
+        )
+        self.assertEqual(len(lines[1].split("\t")), 7)
+        self.assertIn("a\\tb", lines[1])
+
+    def test_unsupported_format(self):
+        """Test that text isn't a structured format."""
+        with self.assertRaises(ValueError):
+            RecordWriter("text", "dev")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Tests for the resilience module.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resilience import (
+    BACKOFF_CAP,
+    DEFAULT_HEDGE_DELAY,
+    MIN_HEDGE_DELAY,
+    CircuitBreaker,
+    CommandAttempts,
+    JFrogCommandError,
+    backoff_delay,
+    hedge_delay,
+)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test the circuit breaker's state transitions."""
+
+    def setUp(self):
+        """Build a breaker on a fake clock."""
+        self.now = 0.0
+        self.breaker = CircuitBreaker(
+            failure_threshold=3, reset_timeout=10, clock=lambda: self.now
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the circuit opens only after `failure_threshold` failures in a row."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_trial(self):
+        """Test that one trial call goes through after the reset timeout."""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now = 10
+
+        self.assertEqual(self.breaker.state, "half_open")
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed trial call opens the circuit again."""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now = 10
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "open")
+        self.now = 15
+        self.assertFalse(self.breaker.allow())
+
+    def test_release_hands_back_trial(self):
+        """Test that a trial call that never ran lets another one through."""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now = 10
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.release()
+
+        self.assertTrue(self.breaker.allow())
+
+
+class TestCommandAttempts(unittest.TestCase):
+    """Test the retry and breaker decisions for one command."""
+
+    def setUp(self):
+        """Build attempts on a fake clock, with a 10 second deadline."""
+        self.now = 0.0
+        self.breaker = CircuitBreaker(failure_threshold=3, clock=lambda: self.now)
+        self.attempts = CommandAttempts(
+            "jf rt s", self.breaker, max_retries=2, deadline=10, clock=lambda: self.now
+        )
+        self.error = JFrogCommandError("failed", "error")
+
+    def test_retries_then_gives_up(self):
+        """Test that failures are retried `max_retries` times, then re-raised."""
+        with patch("resilience.random.uniform", return_value=0.5):
+            for _ in range(2):
+                self.attempts.begin()
+                self.assertEqual(self.attempts.failed(self.error), 0.5)
+            self.attempts.begin()
+            with self.assertRaises(JFrogCommandError):
+                self.attempts.failed(self.error)
+
+        # Three failures in a row open the circuit for the next command
+        with self.assertRaises(JFrogCommandError) as raised:
+            self.attempts.begin()
+        self.assertEqual(raised.exception.outcome, "circuit_open")
+
+    def test_no_retry_past_deadline(self):
+        """Test that a retry that couldn't start before the deadline isn't made."""
+        self.now = 9.9
+        with patch("resilience.random.uniform", return_value=0.5):
+            with self.assertRaises(JFrogCommandError):
+                self.attempts.failed(self.error)
+
+    def test_not_found_is_not_retried_or_counted(self):
+        """Test that a missing jf is raised at once, without tripping the breaker."""
+        for _ in range(3):
+            with self.assertRaises(JFrogCommandError):
+                self.attempts.failed(JFrogCommandError("no jf", "not_found"))
+
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.attempts.attempt, 0)
+
+    def test_success_closes_the_circuit(self):
+        """Test that a success resets the consecutive failure count."""
+        with patch("resilience.random.uniform", return_value=0):
+            self.attempts.failed(self.error)
+            self.attempts.failed(self.error)
+        self.attempts.succeeded()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "closed")
+
+
+class TestDelays(unittest.TestCase):
+    """Test the hedge and backoff delays."""
+
+    def test_hedge_delay(self):
+        """Test that hedging waits for the p95, within bounds."""
+        self.assertEqual(hedge_delay(None), DEFAULT_HEDGE_DELAY)
+        self.assertEqual(hedge_delay(0.001), MIN_HEDGE_DELAY)
+        self.assertEqual(hedge_delay(1.5), 1.5)
+
+    def test_backoff_grows_and_is_capped(self):
+        """Test that the backoff bound doubles per retry up to the cap."""
+        with patch("resilience.random.uniform", side_effect=lambda low, high: high):
+            delays = [backoff_delay(attempt, base=0.5) for attempt in range(1, 6)]
+
+        self.assertEqual(delays, [0.5, 1.0, 2.0, 4.0, BACKOFF_CAP])
+
+    def test_backoff_is_jittered(self):
+        """Test that delays are spread out rather than identical."""
+        delays = {backoff_delay(3) for _ in range(20)}
+
+        self.assertGreater(len(delays), 1)
+        self.assertTrue(all(0 <= delay <= 0.8 for delay in delays))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests for the startup_benchmark module.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from startup_benchmark import (
+    MODULE,
+    StartupRun,
+    eagerly_imported,
+    measure,
+    median_ms,
+    parse_importtime,
+)
+
+
+class TestStartup(unittest.TestCase):
+    """Test what query_artifactory imports at startup."""
+
+    def test_help_defers_heavy_imports(self):
+        """Test that --help loads none of the lazily imported modules."""
+        runs = measure(runs=1)
+
+        self.assertIn(MODULE, runs[0].modules)
+        self.assertEqual(eagerly_imported(runs), [])
+
+    def test_eagerly_imported(self):
+        """Test that deferred modules loaded in any run are reported."""
+        runs = [
+            StartupRun({}, {MODULE, "argparse"}),
+            StartupRun({}, {MODULE, "sqlite3", "colorama"}),
+        ]
+
+        self.assertEqual(eagerly_imported(runs), ["colorama", "sqlite3"])
+
+    def test_parse_importtime(self):
+        """Test parsing -X importtime output into cumulative times."""
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       123 |        123 |   _typing\n"
+            "import time:      2000 |       3000 | query_artifactory\n"
+        )
+
+        times = parse_importtime(stderr)
+
+        self.assertEqual(times, {"_typing": 123, MODULE: 3000})
+        self.assertEqual(median_ms([StartupRun(times, set())]), 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
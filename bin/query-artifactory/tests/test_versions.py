@@ -0,0 +1,195 @@
+"""
+Tests for the versions module.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_records import ArtifactRecord
+from versions import (
+    VersionRange,
+    parse_pep440,
+    parse_semver,
+    top_records_by_version,
+)
+
+
+def record(version: str, day: int = 1) -> ArtifactRecord:
+    return ArtifactRecord(
+        created=datetime(2025, 1, day, 10, tzinfo=timezone.utc),
+        repo="repo",
+        item="item",
+        version=version,
+        sha="",
+        path=f"repo/item/item-{version}.tgz",
+    )
+
+
+class TestParseVersions(unittest.TestCase):
+    """Test semver and PEP 440 ordering."""
+
+    def assertOrdered(self, parse, versions):
+        keys = [parse(version).key for version in versions]
+        self.assertEqual(keys, sorted(keys), versions)
+        self.assertEqual(len(set(keys)), len(keys), versions)
+
+    def test_semver_order(self):
+        """Test the semver spec's precedence example, and numeric components."""
+        self.assertOrdered(
+            parse_semver,
+            [
+                "1.0.0-alpha",
+                "1.0.0-alpha.1",
+                "1.0.0-alpha.beta",
+                "1.0.0-beta",
+                "1.0.0-beta.2",
+                "1.0.0-beta.11",
+                "1.0.0-rc.1",
+                "1.0.0",
+                "1.2.0",
+                "1.10.0",
+                "2.0.0",
+            ],
+        )
+
+    def test_semver_details(self):
+        """Test build metadata, a v prefix, short versions and invalid input."""
+        self.assertEqual(parse_semver("1.2.3+build.5").key, parse_semver("v1.2.3").key)
+        self.assertEqual(parse_semver("1.2").key, parse_semver("1.2.0").key)
+        self.assertTrue(parse_semver("1.2.3-rc.1").prerelease)
+        self.assertFalse(parse_semver("1.2.3").prerelease)
+        self.assertIsNone(parse_semver("latest"))
+
+    def test_pep440_order(self):
+        """Test PEP 440 ordering of dev, pre, post and local versions."""
+        self.assertOrdered(
+            parse_pep440,
+            [
+                "1.0.dev1",
+                "1.0a1",
+                "1.0a2.dev1",
+                "1.0a2",
+                "1.0b1",
+                "1.0rc1",
+                "1.0",
+                "1.0+local.1",
+                "1.0.post1",
+                "1.1",
+                "1.10",
+                "1!0.1",
+            ],
+        )
+
+    def test_pep440_normalisation(self):
+        """Test that equivalent spellings compare equal."""
+        self.assertEqual(parse_pep440("1.0").key, parse_pep440("1.0.0").key)
+        self.assertEqual(parse_pep440("1.0-alpha1").key, parse_pep440("1.0a1").key)
+        self.assertEqual(parse_pep440("1.0-1").key, parse_pep440("1.0.post1").key)
+        self.assertTrue(parse_pep440("2.0rc1").prerelease)
+        self.assertTrue(parse_pep440("2.0.dev3").prerelease)
+        self.assertIsNone(parse_pep440("not-a-version"))
+
+
+class TestVersionRange(unittest.TestCase):
+    """Test range filters."""
+
+    def test_contains(self):
+        """Test a two-sided range."""
+        versions = VersionRange(">=1.4,<2", "pep440")
+
+        self.assertTrue(versions.contains(parse_pep440("1.4")))
+        self.assertTrue(versions.contains(parse_pep440("1.9.9")))
+        self.assertFalse(versions.contains(parse_pep440("1.3.9")))
+        self.assertFalse(versions.contains(parse_pep440("2.0")))
+
+    def test_operators(self):
+        """Test bare versions and != comparisons."""
+        self.assertTrue(VersionRange("1.2.3", "semver").contains(parse_semver("1.2.3")))
+        self.assertFalse(
+            VersionRange("!=1.2.3", "semver").contains(parse_semver("1.2.3"))
+        )
+
+    def test_invalid(self):
+        """Test that a malformed range is rejected."""
+        with self.assertRaises(ValueError):
+            VersionRange(">=banana", "semver")
+        with self.assertRaises(ValueError):
+            VersionRange("=>1.0", "pep440")
+
+
+class TestTopRecordsByVersion(unittest.TestCase):
+    """Test picking the highest versions."""
+
+    def test_ordered_by_version_not_upload_time(self):
+        """Test that a re-published old version doesn't become the latest."""
+        records = [
+            record("1.2.0", day=1),
+            record("1.10.0", day=2),
+            record("1.9.0", day=5),  # Re-published last
+            record("2.0.0-rc.1", day=6),
+        ]
+
+        top = top_records_by_version(records, 2, "semver")
+
+        self.assertEqual([r.version for r in top], ["1.10.0", "1.9.0"])
+
+    def test_range_and_prereleases(self):
+        """Test range filtering, and pre-releases only when asked for."""
+        records = [record(v) for v in ["1.3.0", "1.4.0", "1.5.0-rc.1", "2.0.0"]]
+
+        self.assertEqual(
+            [
+                r.version
+                for r in top_records_by_version(records, 5, "semver", ">=1.4,<2")
+            ],
+            ["1.4.0"],
+        )
+        self.assertEqual(
+            [
+                r.version
+                for r in top_records_by_version(
+                    records, 5, "semver", ">=1.4,<2", prereleases=True
+                )
+            ],
+            ["1.5.0-rc.1", "1.4.0"],
+        )
+        # A range naming a pre-release lets them in
+        self.assertEqual(
+            [
+                r.version
+                for r in top_records_by_version(records, 5, "semver", ">=1.5.0-rc.0")
+            ],
+            ["2.0.0", "1.5.0-rc.1"],
+        )
+
+    def test_one_record_per_version(self):
+        """Test that several artifacts of one version collapse to the newest."""
+        records = [record("1.0", day=1), record("1.0.0", day=3), record("0.9", day=2)]
+
+        top = top_records_by_version(records, 5, "pep440")
+
+        self.assertEqual(
+            [(r.version, r.created.day) for r in top], [("1.0.0", 3), ("0.9", 2)]
+        )
+
+    def test_unparseable_versions_rank_lowest(self):
+        """Test that odd versions come last, and are dropped by a range."""
+        records = [record("nightly"), record("0.1.0")]
+
+        self.assertEqual(
+            [r.version for r in top_records_by_version(records, 5, "semver")],
+            ["0.1.0", "nightly"],
+        )
+        self.assertEqual(
+            [r.version for r in top_records_by_version(records, 5, "semver", ">=0")],
+            ["0.1.0"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
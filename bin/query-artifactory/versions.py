@@ -0,0 +1,211 @@
+"""
+Version ordering for Helm charts and Python packages.
+
+Chart versions are semver (https://semver.org) and wheel versions PEP 440, so
+"latest" means the highest version rather than the most recent upload: a
+re-published old chart or a backport wheel doesn't displace the newest
+release. Both are parsed into plain tuples that compare correctly, without
+depending on `packaging`.
+
+Ranges are comma-separated comparisons that must all hold, e.g. `>=1.4,<2`,
+using ==, !=, >=, <=, > and <; a bare version means ==. Pre-releases
+(1.5.0-rc.1, 1.5.0rc1) are left out unless asked for, or unless the range
+itself names one, as pip and helm do.
+"""
+
+import heapq
+import re
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from artifact_records import ArtifactRecord
+
+SCHEMES = ("semver", "pep440")
+
+_SEMVER = re.compile(
+    r"^v?(?P<major>0|[1-9]\d*)(?:\.(?P<minor>\d+))?(?:\.(?P<patch>\d+))?"
+    r"(?:-(?P<pre>[0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$"
+)
+
+# From PEP 440, Appendix B
+_PEP440 = re.compile(
+    r"""
+    ^v?
+    (?:(?P<epoch>[0-9]+)!)?
+    (?P<release>[0-9]+(?:\.[0-9]+)*)
+    (?P<pre>[-_.]?(?P<pre_l>alpha|a|beta|b|preview|pre|c|rc)[-_.]?(?P<pre_n>[0-9]+)?)?
+    (?P<post>(?:-(?P<post_n1>[0-9]+))|(?:[-_.]?(?P<post_l>post|rev|r)[-_.]?(?P<post_n2>[0-9]+)?))?
+    (?P<dev>[-_.]?(?P<dev_l>dev)[-_.]?(?P<dev_n>[0-9]+)?)?
+    (?:\+(?P<local>[a-z0-9]+(?:[-_.][a-z0-9]+)*))?
+    $
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+_PRE_ORDER = {"a": 0, "alpha": 0, "b": 1, "beta": 1}  # Everything else is rc
+
+_COMPARISON = re.compile(r"^\s*(==|!=|>=|<=|>|<)?\s*(\S+?)\s*$")
+_OPERATORS: Dict[str, Callable[[Tuple, Tuple], bool]] = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+}
+
+
+class Version(NamedTuple):
+    """A parsed version: a sortable key, and whether it's a pre-release."""
+
+    key: Tuple
+    prerelease: bool
+
+
+def parse_semver(text: str) -> Optional[Version]:
+    """Parse a semver version (minor and patch may be left out); None if invalid."""
+    match = _SEMVER.match(text.strip())
+    if match is None:
+        return None
+    release = tuple(int(match.group(part) or 0) for part in ("major", "minor", "patch"))
+    pre = match.group("pre")
+    if pre is None:
+        # A release sorts after all of its pre-releases
+        return Version(release + ((1,),), False)
+    # Numeric identifiers sort numerically and before alphanumeric ones
+    identifiers = tuple(
+        (0, int(part), "") if part.isdigit() else (1, 0, part)
+        for part in pre.split(".")
+    )
+    return Version(release + ((0, identifiers),), True)
+
+
+def parse_pep440(text: str) -> Optional[Version]:
+    """Parse a PEP 440 version into a key ordered the way pip orders them."""
+    match = _PEP440.match(text.strip())
+    if match is None:
+        return None
+    release = [int(part) for part in match.group("release").split(".")]
+    while len(release) > 1 and release[-1] == 0:
+        release.pop()  # 1.0 == 1.0.0
+
+    if match.group("pre"):
+        pre = (
+            0,
+            _PRE_ORDER.get(match.group("pre_l").lower(), 2),
+            int(match.group("pre_n") or 0),
+        )
+    elif match.group("dev") and not match.group("post"):
+        pre = (-1,)  # 1.0.dev1 sorts before 1.0a1
+    else:
+        pre = (1,)
+    if match.group("post"):
+        post = (0, int(match.group("post_n1") or match.group("post_n2") or 0))
+    else:
+        post = (-1,)
+    dev = (0, int(match.group("dev_n") or 0)) if match.group("dev") else (1,)
+    local = tuple(
+        (1, int(part), "") if part.isdigit() else (0, 0, part.lower())
+        for part in re.split(r"[-_.]", match.group("local") or "")
+        if part
+    )
+    key = (int(match.group("epoch") or 0), tuple(release), pre, post, dev, local)
+    return Version(key, bool(match.group("pre") or match.group("dev")))
+
+
+_PARSERS = {"semver": parse_semver, "pep440": parse_pep440}
+
+
+def parse_version(text: str, scheme: str) -> Optional[Version]:
+    """Parse a version with the given scheme ("semver" or "pep440")."""
+    return _PARSERS[scheme](text)
+
+
+class VersionRange:
+    """A set of comparisons, all of which a version must satisfy."""
+
+    def __init__(self, spec: str, scheme: str):
+        self.spec = spec
+        self.scheme = scheme
+        self.comparisons: List[Tuple[str, Version]] = []
+        for clause in spec.split(","):
+            if not clause.strip():
+                continue
+            match = _COMPARISON.match(clause)
+            bound = parse_version(match.group(2), scheme) if match else None
+            if bound is None:
+                raise ValueError(f"Invalid {scheme} version range: {spec!r}")
+            self.comparisons.append((match.group(1) or "==", bound))
+
+    @property
+    def names_prerelease(self) -> bool:
+        """Whether any bound is itself a pre-release."""
+        return any(bound.prerelease for _, bound in self.comparisons)
+
+    def contains(self, version: Version) -> bool:
+        return all(
+            _OPERATORS[operator](version.key, bound.key)
+            for operator, bound in self.comparisons
+        )
+
+
+def top_records_by_version(
+    records: Iterable[ArtifactRecord],
+    limit: int,
+    scheme: str,
+    version_range: Optional[str] = None,
+    prereleases: bool = False,
+) -> List[ArtifactRecord]:
+    """
+    Return the records with the `limit` highest versions, highest first.
+
+    Each version appears once, as its most recently created artifact (e.g.
+    the newest of several wheels for different platforms). Versions that
+    don't parse are only returned when no range is given, ranked lowest.
+    """
+    wanted = VersionRange(version_range, scheme) if version_range else None
+    allow_pre = prereleases or (wanted is not None and wanted.names_prerelease)
+
+    best: Dict[object, Tuple[Tuple, ArtifactRecord]] = {}
+    for record in records:
+        version = parse_version(record.version, scheme)
+        rank = _rank(version, wanted, allow_pre)
+        if rank is None:
+            continue
+        # 1.0 and 1.0.0 are the same version
+        identity = record.version if version is None else version.key
+        current = best.get(identity)
+        if current is None or record.created > current[1].created:
+            best[identity] = (rank, record)
+
+    top = heapq.nlargest(
+        limit, best.values(), key=lambda ranked: (ranked[0], ranked[1].created)
+    )
+    return [record for _, record in top]
+
+
+def version_matcher(
+    scheme: str, version_range: Optional[str] = None, prereleases: bool = False
+) -> Callable[[ArtifactRecord], bool]:
+    """
+    Return a test for whether a record's version is wanted.
+
+    Uses the same rules as `top_records_by_version`, for callers that look at
+    records one at a time (e.g. as they are created) rather than ranking a set.
+    """
+    wanted = VersionRange(version_range, scheme) if version_range else None
+    allow_pre = prereleases or (wanted is not None and wanted.names_prerelease)
+    return lambda record: (
+        _rank(parse_version(record.version, scheme), wanted, allow_pre) is not None
+    )
+
+
+def _rank(
+    version: Optional[Version], wanted: Optional[VersionRange], allow_pre: bool
+) -> Optional[Tuple]:
+    # Sort key for a wanted version, or None if it's filtered out
+    if version is None:
+        return None if wanted is not None else (0, ())
+    if version.prerelease and not allow_pre:
+        return None
+    if wanted is not None and not wanted.contains(version):
+        return None
+    return (1, version.key)